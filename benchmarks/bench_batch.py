@@ -0,0 +1,49 @@
+"""Compare ranking Tweet objects in Python with ranking a columnar TweetBatch.
+
+Usage: python -m benchmarks.bench_batch [num_tweets]
+"""
+import datetime
+import random
+import sys
+import time
+
+import tweepy
+
+from benchmarks.bench_tweet_memory import synthetic_status_json
+from top_tweets.batch import TweetBatch
+from top_tweets.get_tweets import Tweet
+
+NUM_ACCOUNTS = 20
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(num_tweets=300000):
+    created_at = datetime.datetime(2021, 7, 1)
+    accounts = [object() for _ in range(NUM_ACCOUNTS)]
+    tweets = [Tweet(tweepy.models.Status.parse(None, synthetic_status_json(i, created_at)),
+                    random.choice(accounts)) for i in range(num_tweets)]
+
+    def sort_objects():
+        return {m: sorted(tweets, key=lambda t: getattr(t, m), reverse=True)
+                for m in ("likes", "retweets", "likes_retweets_combined")}
+
+    batch, build_seconds = timed(lambda: TweetBatch.from_tweets(tweets))
+    _, sort_seconds = timed(sort_objects)
+    _, rank_seconds = timed(batch.rank_all)
+    _, top_seconds = timed(lambda: batch.top(batch.score(weights={"likes": 1, "retweets": 3},
+                                                         half_life=7), top_num=100))
+
+    print("{} Tweets from {} accounts".format(num_tweets, NUM_ACCOUNTS))
+    print("sorted() by 3 metrics:          {:8.1f} ms".format(sort_seconds * 1000))
+    print("TweetBatch.from_tweets():       {:8.1f} ms".format(build_seconds * 1000))
+    print("TweetBatch.rank_all():          {:8.1f} ms".format(rank_seconds * 1000))
+    print("TweetBatch.top() (decayed):     {:8.1f} ms".format(top_seconds * 1000))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
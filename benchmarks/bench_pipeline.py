@@ -0,0 +1,91 @@
+"""Benchmark the fetch/rank/share pipeline against the offline fake API.
+
+Measures API requests, timeline pages, wall time and peak (traced) memory for
+`Account.get_top_tweets_num()`, `Account.get_top_tweets_percent()` and
+`Bot.share_from_random_user()` over synthetic timelines of each size.
+
+Usage: python -m benchmarks.bench_pipeline [--json PATH] [size ...]
+    (sizes default to 1000 and 100000 Tweets; e.g. add 1000000 for a 1M Tweet timeline)
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+
+DEFAULT_SIZES = [1000, 100000]
+DAYS = 30
+NUM_DAYS = DAYS + 1
+
+
+def scenarios():
+    """Return a list of (name, function(api)) benchmark scenarios."""
+    def top_num(api):
+        Account(username="source", api=api).get_top_tweets_num(NUM_DAYS, "likes", 10)
+
+    def top_percent(api):
+        Account(username="source", api=api).get_top_tweets_percent(NUM_DAYS, "likes", 10)
+
+    def share(api):
+        Bot(usernames=["source"], api=api).share_from_random_user(NUM_DAYS)
+
+    return [("get_top_tweets_num", top_num), ("get_top_tweets_percent", top_percent),
+            ("share_from_random_user", share)]
+
+
+def measure(size, name, function, trace_memory):
+    """Run a scenario against a new fake API, returning a dict of measurements."""
+    api = FakeAPI({"source": size}, days=DAYS)
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(api)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {"size": size, "scenario": name, "requests": api.requests,
+            "pages": api.calls["user_timeline"], "seconds": seconds, "peak_bytes": peak}
+
+
+def run(sizes):
+    """Return a list of results (dicts) for every scenario and size."""
+    results = []
+    for size in sizes:
+        for name, function in scenarios():
+            # Time and memory are measured in separate runs, as tracing slows execution
+            result = measure(size, name, function, trace_memory=False)
+            result["peak_bytes"] = measure(size, name, function, trace_memory=True)["peak_bytes"]
+            results.append(result)
+            print("{size:>9} {scenario:<24} {requests:>8} {pages:>8} {seconds:>9.3f} "
+                  "{peak:>10.1f}".format(peak=result["peak_bytes"] / 2 ** 20, **result))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    json_path = None
+    if argv[:1] == ["--json"]:
+        json_path, argv = argv[1], argv[2:]
+
+    sizes = [int(s) for s in argv] or DEFAULT_SIZES
+    print("{:>9} {:<24} {:>8} {:>8} {:>9} {:>10}".format("tweets", "scenario", "requests",
+                                                       "pages", "seconds", "peak_mb"))
+    results = run(sizes)
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
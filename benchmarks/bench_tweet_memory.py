@@ -0,0 +1,66 @@
+"""Measure the memory retained by Tweet objects, with and without the raw Tweepy Status.
+
+Usage: python -m benchmarks.bench_tweet_memory [num_tweets]
+"""
+import datetime
+import random
+import sys
+import tracemalloc
+
+import tweepy
+
+from top_tweets.get_tweets import Tweet
+
+
+def synthetic_status_json(id, created_at):
+    """Return a v1.1 Tweet JSON dict of a typical size (including entities and user)."""
+    return {
+        "id": id,
+        "id_str": str(id),
+        "created_at": created_at.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        "full_text": "Synthetic Tweet {} ".format(id) + "lorem ipsum " * 18,
+        "is_quote_status": False,
+        "entities": {
+            "hashtags": [{"text": "hashtag{}".format(i), "indices": [0, 8]} for i in range(2)],
+            "urls": [], "user_mentions": [], "symbols": [],
+        },
+        "favorite_count": random.randint(0, 10000),
+        "retweet_count": random.randint(0, 1000),
+        "retweeted": False,
+        "favorited": False,
+        "lang": "en",
+        "source": "<a href=\"https://example.com\">Example</a>",
+        "user": {"id": 1, "id_str": "1", "screen_name": "example", "name": "Example",
+                 "description": "An example account " * 4, "followers_count": 1000},
+    }
+
+
+def retained_bytes(num_tweets, keep_status):
+    """Return the bytes retained by `num_tweets` Tweets once their source Statuses are dropped."""
+    created_at = datetime.datetime(2021, 7, 1)
+    tracemalloc.start()
+    tweets = []
+    for i in range(num_tweets):
+        status = tweepy.models.Status.parse(None, synthetic_status_json(i, created_at))
+        tweets.append(Tweet(status, None, keep_status=keep_status))
+        del status
+
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    num_tweets = int(argv[0]) if argv else 10000
+    compact = retained_bytes(num_tweets, keep_status=False)
+    full = retained_bytes(num_tweets, keep_status=True)
+    print("Tweets: {}".format(num_tweets))
+    print("keep_status=True:  {:>12,} bytes ({:,.0f} per Tweet)".format(full, full / num_tweets))
+    print("keep_status=False: {:>12,} bytes ({:,.0f} per Tweet)".format(compact,
+                                                                        compact / num_tweets))
+    print("Saving: {:.1f}x".format(full / compact))
+
+
+if __name__ == "__main__":
+    main()
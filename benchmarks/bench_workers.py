@@ -0,0 +1,89 @@
+"""Benchmark sharded fetch workers (`top_tweets.workers`) against the offline fake API.
+
+Fetches the top Tweets of every account in a synthetic account list via a SQLite work queue,
+with each number of worker processes (each with its own fake API, i.e. its own client and rate
+limit budget), and reports the wall time and speedup relative to a single worker. Each worker
+fetches one account at a time, so the speedup is due to the worker processes alone. The fake
+API's `latency` simulates the network time of each request.
+
+Usage: python -m benchmarks.bench_workers [--json PATH] [--accounts N] [--latency SECONDS]
+           [num_workers ...]
+    (defaults to 200 accounts of 100-400 Tweets, a 10ms latency, and 1, 2, 4 and 8 workers)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from top_tweets import workers
+from top_tweets.fake_api import FakeAPI
+
+DEFAULT_WORKERS = [1, 2, 4, 8]
+DEFAULT_ACCOUNTS = 200
+DEFAULT_LATENCY = 0.01
+DAYS = 7
+
+_settings = {"accounts": DEFAULT_ACCOUNTS, "latency": DEFAULT_LATENCY}
+
+
+def fake_api(index):
+    """Return a worker's fake API (created in the worker's process)."""
+    users = {"user{}".format(i): 100 + 100 * (i % 4) for i in range(_settings["accounts"])}
+    return FakeAPI(users, days=DAYS, latency=_settings["latency"])
+
+
+def measure(num_workers):
+    """Fetch every account with `num_workers` workers, returning a dict of measurements."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "work.sqlite3")
+        queue = workers.WorkQueue(path)
+        queue.submit(["user{}".format(i) for i in range(_settings["accounts"])], DAYS, "likes", 10)
+
+        start = time.perf_counter()
+        progress = workers.run(path, num_workers, api_factory=fake_api, batch_size=10,
+                               max_workers=1)
+        seconds = time.perf_counter() - start
+
+        merge_start = time.perf_counter()
+        queue.leaderboard(100, per_account=2)
+        merge_seconds = time.perf_counter() - merge_start
+        queue.close()
+
+    return {"workers": num_workers, "accounts": progress.get(workers.DONE, 0),
+            "seconds": seconds, "merge_seconds": merge_seconds}
+
+
+def run(worker_counts):
+    """Return a list of results (dicts) for every number of workers."""
+    results = []
+    for num_workers in worker_counts:
+        result = measure(num_workers)
+        result["speedup"] = results[0]["seconds"] / result["seconds"] if results else 1.0
+        results.append(result)
+        print("{workers:>8} {accounts:>9} {seconds:>9.3f} {speedup:>8.2f} "
+              "{merge_seconds:>8.3f}".format(**result))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    json_path = None
+    while argv[:1] and argv[0].startswith("--"):
+        option, value, argv = argv[0], argv[1], argv[2:]
+        if option == "--json":
+            json_path = value
+        else:
+            _settings[option[2:]] = (int if option == "--accounts" else float)(value)
+
+    worker_counts = [int(n) for n in argv] or DEFAULT_WORKERS
+    print("{:>8} {:>9} {:>9} {:>8} {:>8}".format("workers", "accounts", "seconds", "speedup",
+                                                 "merge_s"))
+    results = run(worker_counts)
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
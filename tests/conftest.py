@@ -0,0 +1,13 @@
+import pytest
+import tweepy
+
+from top_tweets import twitter_auth
+
+
+@pytest.fixture(autouse=True)
+def offline_api():
+    """Use an unauthenticated API by default, so tests don't require `config.py` credentials."""
+    api = tweepy.API()
+    twitter_auth.set_api(api)
+    yield api
+    twitter_auth.set_api(None)
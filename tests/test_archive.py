@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from top_tweets import twitter_auth
+from top_tweets.archive import TweetArchive
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+
+
+class OfflineAPI:
+    def __getattr__(self, name):
+        raise AssertionError("Unexpected API request: {}".format(name))
+
+
+@pytest.fixture
+def api():
+    return FakeAPI({"user1": 500, "user2": 30}, days=20)
+
+
+@pytest.fixture
+def archive(api, tmp_path):
+    archive = TweetArchive(str(tmp_path / "archive"))
+    archive.update(Account(username="user1", api=api))
+    return archive
+
+
+class TestTweetArchive:
+    def test_offline_top_tweets(self, api, archive):
+        online = Account(username="user1", api=api)
+        twitter_auth.set_api(OfflineAPI())
+        offline = archive.account(username="USER1")
+        assert offline.user_id == online.user_id
+
+        for num_days in (1, 7, 30):
+            expected = online.get_top_tweets_num(num_days, "likes", 10)
+            tweets = offline.get_top_tweets_num(num_days, "likes", 10)
+            assert [t.id for t in tweets] == [t.id for t in expected]
+            assert [t.rank for t in tweets] == list(range(1, len(expected) + 1))
+
+        expected = online.get_top_tweets_percent(30, "retweets", 10, max_tweets=100)
+        tweets = offline.get_top_tweets_percent(30, "retweets", 10, max_tweets=100)
+        assert [t.id for t in tweets] == [t.id for t in expected]
+        # Tweets are parsed from the archive, so their text doesn't require a request
+        assert tweets[0].text.startswith("Synthetic Tweet")
+
+    def test_offline_iter_tweets(self, api, archive):
+        expected = list(Account(username="user1", api=api).iter_tweets(30, include_quotes=True))
+        tweets = list(archive.account(username="user1").iter_tweets(30, include_quotes=True))
+        assert [t.id for t in tweets] == [t.id for t in expected]
+        tweets = archive.account(username="user1").iter_tweets(30, max_tweets=5)
+        assert len(list(tweets)) == 5
+
+    def test_partitioned_by_day(self, api, archive):
+        user = api.users["user1"]
+        days = {user.publish_time(i).date() for i in range(user.num_tweets)}
+        assert archive.days(str(user.id)) == sorted(days)
+
+    def test_window_maps_only_needed_partitions(self, archive, monkeypatch):
+        mapped = []
+        records = archive._records
+
+        def spy(user_id, day):
+            mapped.append(day)
+            return records(user_id, day)
+
+        monkeypatch.setattr(archive, "_records", spy)
+        archive.account(username="user1").get_top_tweets_num(3, "likes", 5)
+        first_date = datetime.date.today() - datetime.timedelta(days=2)
+        assert mapped and all(day >= first_date for day in mapped)
+
+    def test_update_appends_new_tweets(self, api, archive):
+        account = Account(username="user1", api=api)
+        assert archive.update(account) == 0
+        assert archive.update(Account(username="user2", api=api)) == 30
+        assert archive.account(username="user2").username == "user2"
+
+    def test_latest_record_used(self, api, archive):
+        account = Account(username="user1", api=api)
+        user = api.users["user1"]
+        top = archive.account(username="user1").get_top_tweets_num(30, "likes", 1)[0]
+        index = user.index(int(top.id))
+        # Re-archiving Tweets (with updated engagement) appends records
+        user.likes[index] = 0
+        archive.update(account, num_days=30)
+        records = archive.records(account.user_id, 30)
+        assert len(records) == len(np.unique(records["id"]))
+        assert archive.account(username="user1").get_top_tweets_num(30, "likes", 1)[0].id != top.id
+
+    def test_backtest(self, archive):
+        account = archive.account(username="user1")
+        latest_date = datetime.date.today() - datetime.timedelta(days=10)
+        tweets = archive.top_tweets(account, 5, "likes", top_num=3, latest_date=latest_date)
+        cut_off = Account.cut_off_time(latest_date, 5)
+        assert all(cut_off <= t.publish_time < cut_off + datetime.timedelta(days=5)
+                   for t in tweets)
+
+    def test_missing_user(self, archive):
+        with pytest.raises(ValueError):
+            archive.account(username="missing")
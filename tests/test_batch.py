@@ -0,0 +1,117 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from top_tweets.batch import TweetBatch
+from top_tweets.get_tweets import Tweet
+
+
+class MockTweet:
+    def __init__(self, id, likes, retweets, publish_time=datetime.datetime(2021, 7, 1),
+                 account=None):
+        self.id = str(id)
+        self.likes = likes
+        self.retweets = retweets
+        self.likes_retweets_combined = likes + retweets
+        self.publish_time = publish_time
+        self.account = account
+        self.rank = None
+
+
+@pytest.fixture
+def tweets():
+    likes = [5, 10, 5, 0, 10, 7, 5, 2]
+    retweets = [1, 0, 3, 9, 0, 1, 1, 2]
+    return [MockTweet(i, l, r) for i, (l, r) in enumerate(zip(likes, retweets))]
+
+
+class TestTweetBatch:
+    @pytest.mark.parametrize("metric", ["likes", "retweets", "likes_retweets_combined"])
+    def test_order_matches_sorted(self, tweets, metric):
+        batch = TweetBatch.from_tweets(tweets)
+        expected = sorted(tweets, key=lambda t: getattr(t, metric), reverse=True)
+        assert batch.tweets(batch.order(batch.score(metric))) == expected
+
+    @pytest.mark.parametrize("top_num", [0, 1, 3, 4, 8, 20])
+    def test_top_num_matches_sorted(self, tweets, top_num):
+        batch = TweetBatch.from_tweets(tweets)
+        expected = sorted(tweets, key=lambda t: t.likes, reverse=True)[:top_num]
+        assert batch.tweets(batch.top(batch.score("likes"), top_num=top_num)) == expected
+
+    def test_top_percent(self, tweets):
+        batch = TweetBatch.from_tweets(tweets)
+        top = batch.tweets(batch.top(batch.score("likes"), top_percent=50))
+        assert [t.id for t in top] == ["1", "4", "5", "0"]
+
+    def test_top_random_ties(self):
+        rng = np.random.default_rng(0)
+        likes = rng.integers(0, 20, 1000)
+        tweets = [MockTweet(i, int(l), 0) for i, l in enumerate(likes)]
+        batch = TweetBatch.from_tweets(tweets)
+        expected = sorted(tweets, key=lambda t: t.likes, reverse=True)[:100]
+        assert batch.tweets(batch.top(batch.likes, top_num=100)) == expected
+
+    def test_rank_all(self, tweets):
+        batch = TweetBatch.from_tweets(tweets)
+        rankings = batch.rank_all()
+        ranks, percentiles = rankings["likes"]
+        assert list(ranks) == [4, 1, 5, 8, 2, 3, 6, 7]
+        assert percentiles[1] == 100
+        assert percentiles[3] == 12.5
+        assert list(rankings["retweets"][0]) == [4, 7, 2, 1, 8, 5, 6, 3]
+        assert list(batch.ranks(batch.likes)) == list(ranks)
+
+    def test_weighted_score(self, tweets):
+        batch = TweetBatch.from_tweets(tweets)
+        score = batch.score(weights={"likes": 1, "retweets": 2})
+        assert list(score) == [t.likes + 2 * t.retweets for t in tweets]
+
+    def test_custom_score(self, tweets):
+        batch = TweetBatch.from_tweets(tweets)
+        assert list(batch.score(lambda b: b.likes * b.retweets)) == [5, 0, 15, 0, 0, 7, 5, 4]
+
+    def test_invalid_metric(self, tweets):
+        with pytest.raises(AssertionError):
+            TweetBatch.from_tweets(tweets).score("replies")
+
+    def test_time_decay(self):
+        now = datetime.datetime(2021, 7, 10)
+        tweets = [MockTweet(1, 100, 0, now - datetime.timedelta(days=2)),
+                  MockTweet(2, 60, 0, now)]
+        batch = TweetBatch.from_tweets(tweets)
+        score = batch.score("likes", half_life=1, now=now)
+        assert list(score) == [25, 60]
+        assert batch.tweets(batch.order(score))[0].id == "2"
+
+    def test_concatenate(self):
+        account1, account2 = object(), object()
+        batch1 = TweetBatch.from_tweets([MockTweet(1, 3, 0, account=account1)])
+        batch2 = TweetBatch.from_tweets([MockTweet(2, 5, 0, account=account2),
+                                         MockTweet(3, 1, 0, account=account2)])
+        batch = TweetBatch.concatenate([batch1, batch2])
+        assert len(batch) == 3
+        assert [batch.accounts[i] for i in batch.account_index] == [account1, account2, account2]
+        assert [t.id for t in batch.tweets(batch.order(batch.likes))] == ["2", "1", "3"]
+
+    def test_select(self, tweets):
+        batch = TweetBatch.from_tweets(tweets)
+        top = batch.select(batch.top(batch.likes, top_num=2))
+        assert list(top.ids) == [1, 4]
+        assert top.tweets()[0] is tweets[1]
+
+    def test_from_tweet_objects(self):
+        class MockStatus:
+            id_str = "1409254810116345858"
+            created_at = datetime.datetime(2021, 6, 27, 20, 20, 1)
+            is_quote_status = False
+            entities = {}
+            favorite_count = 10
+            retweet_count = 2
+            retweeted = False
+
+        batch = TweetBatch.from_tweets([Tweet(MockStatus(), None)])
+        assert batch.ids[0] == 1409254810116345858
+        assert batch.timestamps[0] == datetime.datetime(
+            2021, 6, 27, 20, 20, 1, tzinfo=datetime.timezone.utc).timestamp()
+        assert list(batch.likes_retweets_combined) == [12]
@@ -3,8 +3,12 @@ import datetime
 import pytest
 import tweepy
 
+from top_tweets import get_tweets
 from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
 from top_tweets.get_tweets import Tweet
+from top_tweets.ledger import QUOTE, RETWEET, ShareLedger
+from top_tweets.selection import ROUND_ROBIN, AccountSelector
 
 
 class MockStatus:
@@ -15,16 +19,16 @@ class MockStatus:
 
 
 @pytest.fixture
-def mock_tweepy_cursor_items(monkeypatch):
-    """Monkeypatch tweepy.Cursor.items()."""
-    def mock_items(self):
-        print("Mocking tweepy.Cursor.items()")
+def mock_timeline_pages(monkeypatch):
+    """Monkeypatch get_tweets.timeline_pages()."""
+    def mock_pages(method, since_id=None, max_id=None, budget=None, **kwargs):
+        print("Mocking get_tweets.timeline_pages()")
         s1 = MockStatus(None, None, datetime.datetime(2021, 1, 1))
         s2 = MockStatus(None, "quoted_tweet_id", datetime.datetime(2021, 1, 1))
         s3 = MockStatus(None, None, datetime.datetime(2021, 1, 1))
-        return [s1, s2, s3]
+        return iter([[s1, s2, s3]])
 
-    monkeypatch.setattr(tweepy.Cursor, "items", mock_items)
+    monkeypatch.setattr(get_tweets, "timeline_pages", mock_pages)
 
 
 @pytest.fixture
@@ -41,9 +45,9 @@ def mock_tweet_prev_quoted(monkeypatch):
 @pytest.fixture
 def mock_tweet_share_attrs(monkeypatch):
     """Monkeypatch Tweepy object attrs with manual attr assignment in __init__."""
-    def mock_init(self, retweeted, mock_quoted):
+    def mock_init(self, id, retweeted):
+        self.id = id
         self.retweeted = retweeted
-        self.mock_quoted = mock_quoted
 
     monkeypatch.setattr(Tweet, "__init__", mock_init)
 
@@ -53,60 +57,183 @@ class TestBot:
         with pytest.raises(AssertionError):
             Bot(usernames=["test"], user_ids=["test"])
 
-    def test_previously_quoted_false(self, mock_tweet_prev_quoted, mock_tweepy_cursor_items):
+    def test_previously_quoted_false(self, mock_tweet_prev_quoted, mock_timeline_pages):
         status = MockStatus("not_quoted_id", None, None)
         tweet = Tweet(status, None)
         assert not Bot.previously_quoted(tweet, 9999)
 
-    def test_previously_quoted_true(self, mock_tweet_prev_quoted, mock_tweepy_cursor_items):
+    def test_previously_quoted_true(self, mock_tweet_prev_quoted, mock_timeline_pages):
         status = MockStatus("quoted_tweet_id", None, None)
         tweet = Tweet(status, None)
         assert Bot.previously_quoted(tweet, 9999)
 
-    def test_previously_quoted_false_date(self, mock_tweet_prev_quoted, mock_tweepy_cursor_items):
+    def test_previously_quoted_false_date(self, mock_tweet_prev_quoted, mock_timeline_pages):
         status = MockStatus("quoted_tweet_id", None, None)
         tweet = Tweet(status, None)
         assert not Bot.previously_quoted(tweet, 30)
 
+    def test_quoted_tweet_ids(self, mock_tweet_prev_quoted, mock_timeline_pages):
+        assert Bot.quoted_tweet_ids(9999) == {"quoted_tweet_id"}
+
+    def test_previously_quoted_index(self, mock_tweet_prev_quoted):
+        status = MockStatus("quoted_tweet_id", None, None)
+        tweet = Tweet(status, None)
+        assert Bot.previously_quoted(tweet, 9999, {"quoted_tweet_id"})
+        assert not Bot.previously_quoted(tweet, 9999, set())
+
     @pytest.fixture
-    def mock_previously_quoted(self, monkeypatch):
-        def mock_prev_quoted(tweet, num_days):
-            return tweet.mock_quoted
+    def mock_quoted_tweet_ids(self, monkeypatch):
+        calls = []
+
+        def mock_quoted_ids(num_days, api=None):
+            calls.append(num_days)
+            return {"quoted"}
 
-        monkeypatch.setattr(Bot, "previously_quoted", mock_prev_quoted)
+        monkeypatch.setattr(Bot, "quoted_tweet_ids", mock_quoted_ids)
+        return calls
 
-    def test_select_tweet_not_shared(self, mock_previously_quoted, mock_tweet_share_attrs):
-        t1 = Tweet(False, False)
-        t2 = Tweet(False, False)
+    def test_select_tweet_not_shared(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        t1 = Tweet("1", False)
+        t2 = Tweet("2", False)
         assert Bot._select_tweet([t1, t2], 99) == t1
 
-    def test_select_tweet_retweeted(self, mock_previously_quoted, mock_tweet_share_attrs):
-        t1 = Tweet(True, False)
-        t2 = Tweet(False, False)
+    def test_select_tweet_retweeted(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        t1 = Tweet("1", True)
+        t2 = Tweet("2", False)
         assert Bot._select_tweet([t1, t2], 99) == t2
 
-    def test_select_tweet_quoted(self, mock_previously_quoted, mock_tweet_share_attrs):
-        t1 = Tweet(False, True)
-        t2 = Tweet(False, False)
+    def test_select_tweet_quoted(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        t1 = Tweet("quoted", False)
+        t2 = Tweet("2", False)
         assert Bot._select_tweet([t1, t2], 99) == t2
 
-    def test_select_tweet_retweeted_quoted(self, mock_previously_quoted, mock_tweet_share_attrs):
-        t1 = Tweet(True, True)
-        t2 = Tweet(False, False)
+    def test_select_tweet_retweeted_quoted(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        t1 = Tweet("quoted", True)
+        t2 = Tweet("2", False)
         assert Bot._select_tweet([t1, t2], 99) == t2
 
-    def test_select_tweet_all_shared(self, mock_previously_quoted, mock_tweet_share_attrs):
-        t1 = Tweet(False, True)
-        t2 = Tweet(True, False)
+    def test_select_tweet_all_shared(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        t1 = Tweet("quoted", False)
+        t2 = Tweet("2", True)
         with pytest.raises(ValueError):
             Bot._select_tweet([t1, t2], 99)
 
-    def test_get_random_user_assert(self):
-        bot = Bot()
-        with pytest.raises(AssertionError):
-            bot._get_random_user([])
+    def test_select_tweet_single_index(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        tweets = [Tweet("quoted", False) for _ in range(5)] + [Tweet("2", False)]
+        assert Bot._select_tweet(tweets, 99) == tweets[-1]
+        assert mock_quoted_tweet_ids == [99]
 
-    def test_get_random_user(self):
+    def test_select_tweet_all_retweeted_no_index(self, mock_quoted_tweet_ids,
+                                                 mock_tweet_share_attrs):
+        with pytest.raises(ValueError):
+            Bot._select_tweet([Tweet("1", True), Tweet("2", True)], 99)
+        assert mock_quoted_tweet_ids == []
+
+    def test_select_tweet_ledger(self, mock_quoted_tweet_ids, mock_tweet_share_attrs):
+        share_ledger = ShareLedger(":memory:")
+        share_ledger.record("1", RETWEET)
+        share_ledger.record("2", QUOTE)
+        tweets = [Tweet("1", False), Tweet("2", False), Tweet("3", False)]
+        assert Bot._select_tweet(tweets, 99, share_ledger) == tweets[2]
+        assert mock_quoted_tweet_ids == []
+
+    def test_share_from_random_user_assert(self):
         bot = Bot()
-        test_list = ["user1", "user2", "user3"]
-        assert bot._get_random_user(test_list) in test_list
+        with pytest.raises(AssertionError):
+            bot.share_from_random_user(7, usernames=[])
+
+    def test_share_from_random_user_fallback(self, monkeypatch):
+        api = FakeAPI({"user1": 2, "user2": 40, "missing": 0}, days=5)
+        del api.users["missing"]
+        selector = AccountSelector(strategy=ROUND_ROBIN)
+        bot = Bot(usernames=["user1", "missing", "user2"], api=api, selector=selector)
+        for tweet in bot._get_top_tweets(7, bot.metric, username="user1"):
+            Bot._retweet(tweet, api=api)
+        num_tweets = len(bot._get_top_tweets(7, bot.metric, username="user2"))
+
+        # user1 has nothing to share, so user2 is shared from (whichever is tried first)
+        for _ in range(3):
+            bot.share_from_random_user(7, quote=False)
+            assert api.user_timeline()[0].retweeted_status.user.screen_name == "user2"
+        user1, user2 = api.users["user1"], api.users["user2"]
+        assert selector.stats(str(user1.id)).num_eligible == 0
+        assert selector.stats(str(user2.id)).num_eligible == num_tweets - 3
+        # Exhausted users are skipped without fetching their Tweets
+        fetched = []
+        get_top_tweets = bot._get_top_tweets
+
+        def spy(num_days, metric, username=None, user_id=None):
+            fetched.append(user_id)
+            return get_top_tweets(num_days, metric, username=username, user_id=user_id)
+
+        monkeypatch.setattr(bot, "_get_top_tweets", spy)
+        bot.share_from_random_user(7, quote=False)
+        assert fetched == [str(user2.id)]
+
+    def test_share_from_random_user_no_tweets(self):
+        api = FakeAPI({"empty": 0, "user2": 40}, days=5)
+        selector = AccountSelector(strategy=ROUND_ROBIN)
+        bot = Bot(usernames=["empty", "user2"], api=api, selector=selector)
+        for _ in range(2):
+            bot.share_from_random_user(7, quote=False)
+            assert api.user_timeline()[0].retweeted_status.user.screen_name == "user2"
+        stats = selector.stats(str(api.users["empty"].id))
+        assert (stats.num_tweets, stats.num_eligible) == (0, 0)
+
+    def test_share_from_random_user_unresolved(self, monkeypatch):
+        api = FakeAPI({"user1": 40}, days=5)
+
+        def lookup_users(*args, **kwargs):
+            raise tweepy.TweepError("No user matches for specified terms.", api_code=17)
+
+        monkeypatch.setattr(api, "lookup_users", lookup_users)
+        with pytest.raises(ValueError):
+            Bot(usernames=["user1"], api=api).share_from_random_user(7)
+
+    def test_prefetch_candidates(self):
+        api = FakeAPI({"user1": 300, "user2": 40}, days=5)
+        # With a ledger, candidates are re-validated locally
+        bot = Bot(usernames=["user1", "user2", "missing"], api=api, ledger=ShareLedger(":memory:"))
+        assert len(bot.prefetch(7, max_candidates=3)) == 2
+        assert len(bot.candidates) == 6
+        top = bot._get_top_tweets(7, bot.metric, username="user1")
+        calls = api.calls["user_timeline"]
+
+        bot.share_from_user(7, username="user1", quote=False)
+        bot.share_from_user(7, username="user1")
+        # Shares use the prefetched candidates, so only publish
+        assert api.calls["user_timeline"] == calls
+        assert api.calls["retweet"] == api.calls["update_status"] == 1
+        quote, retweet = api.user_timeline()
+        assert retweet.retweeted_status.id_str == top[0].id
+        assert quote.quoted_status_id_str == top[1].id
+        assert len(bot.candidates) == 4
+
+    def test_prefetch_excludes_shared(self):
+        api = FakeAPI({"user1": 300}, days=5)
+        bot = Bot(usernames=["user1"], api=api)
+        top = bot._get_top_tweets(7, bot.metric, username="user1")
+        Bot._quote_tweet(top[0], "Quote", api=api)
+        bot.prefetch(7, max_candidates=2)
+        assert bot._get_top_tweet(7, bot.metric, username="user1").id == top[1].id
+
+    def test_candidates_revalidated(self, tmp_path):
+        api = FakeAPI({"user1": 300}, days=5)
+        bot = Bot(usernames=["user1"], api=api, ledger=ShareLedger(str(tmp_path / "db")))
+        bot.prefetch(7, max_candidates=2)
+        top = bot._get_top_tweets(7, bot.metric, username="user1")
+        # Shared (e.g. by another process) after the candidates were built
+        bot.ledger.record(top[0].id, RETWEET)
+        assert bot._get_top_tweet(7, bot.metric, username="user1").id == top[1].id
+        assert len(bot.candidates) == 0
+
+    def test_candidates_revalidated_without_ledger(self):
+        api = FakeAPI({"user1": 300}, days=5)
+        bot = Bot(usernames=["user1"], api=api)
+        bot.prefetch(7, max_candidates=3)
+        top = bot._get_top_tweets(7, bot.metric, username="user1")
+        # Shared (e.g. by another process) after the candidates were built
+        api.retweet(top[0].id)
+        Bot._quote_tweet(top[1], "Quote", api=api)
+        assert bot._get_top_tweet(7, bot.metric, username="user1").id == top[2].id
+        assert api.calls["get_status"] == 3
@@ -0,0 +1,182 @@
+import concurrent.futures
+import datetime
+import time
+
+import pytest
+import tweepy
+
+from top_tweets.cache import TweetCache
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account, cut_off_since_id, snowflake_id
+
+
+def make_status(number, days_ago, is_quote_status=False):
+    """Return a Tweepy Status published `days_ago` days before now, with `number` Likes."""
+    created_at = datetime.datetime.utcnow() - datetime.timedelta(days=days_ago)
+    id = snowflake_id(created_at) | number
+    return tweepy.models.Status.parse(None, {
+        "id": id,
+        "id_str": str(id),
+        "created_at": created_at.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        "is_quote_status": is_quote_status,
+        "quoted_status_id_str": "1" if is_quote_status else None,
+        "full_text": "Tweet {}".format(number),
+        "entities": {"hashtags": []},
+        "favorite_count": number,
+        "retweet_count": 0,
+        "retweeted": False,
+    })
+
+
+class MockAccount:
+    """An account whose timeline is a list of Tweepy Status (newest first)."""
+    def __init__(self, statuses):
+        self.user_id = "user_id"
+        self.statuses = statuses
+        self.since_ids = []
+
+    def __str__(self):
+        return "MockAccount"
+
+    def _timeline(self, since_id=None, budget=None):
+        self.since_ids.append(since_id)
+        for s in self.statuses:
+            if since_id is not None and s.id <= int(since_id):
+                return
+            yield s
+
+
+def cut_off_id(num_days):
+    return cut_off_since_id(Account.cut_off_time(datetime.date.today(), num_days))
+
+
+def numbers(statuses):
+    return [s.favorite_count for s in statuses]
+
+
+@pytest.fixture
+def timeline():
+    return [make_status(i, 10 - i) for i in range(10, 0, -1)]
+
+
+class TestTweetCache:
+    def test_statuses_initial_fetch(self, timeline):
+        account = MockAccount(timeline)
+        statuses = TweetCache().statuses(account, 5)
+        assert numbers(statuses) == [10, 9, 8, 7, 6]
+        assert account.since_ids == [cut_off_id(5)]
+
+    def test_statuses_since_id(self, timeline):
+        account = MockAccount(timeline)
+        cache = TweetCache()
+        cache.statuses(account, 5)
+        account.statuses = [make_status(11, 0)] + timeline
+        statuses = cache.statuses(account, 3)
+        assert account.since_ids == [cut_off_id(5), timeline[0].id_str]
+        assert numbers(statuses)[:4] == [11, 10, 9, 8]
+
+    def test_statuses_concurrent(self, timeline, monkeypatch):
+        account = MockAccount(timeline)
+        cache = TweetCache()
+        cache.statuses(account, 5)
+        account.statuses = [make_status(11, 0)] + timeline
+        timeline_statuses = account._timeline
+
+        def slow_timeline(since_id=None, budget=None):
+            time.sleep(0.05)
+            return timeline_statuses(since_id, budget)
+
+        monkeypatch.setattr(account, "_timeline", slow_timeline)
+        with concurrent.futures.ThreadPoolExecutor(3) as executor:
+            results = list(executor.map(lambda _: cache.statuses(account, 5), range(3)))
+        # The new Tweet is only cached once
+        for statuses in results:
+            assert numbers(statuses)[:3] == [11, 10, 9]
+            assert len({s.id for s in statuses}) == len(statuses)
+
+    def test_statuses_larger_window_refetches(self, timeline):
+        account = MockAccount(timeline)
+        cache = TweetCache()
+        cache.statuses(account, 3)
+        statuses = cache.statuses(account, 7)
+        assert account.since_ids == [cut_off_id(3), cut_off_id(7)]
+        assert numbers(statuses) == [10, 9, 8, 7, 6, 5, 4]
+
+    def test_statuses_evicts_beyond_largest_window(self, timeline):
+        account = MockAccount(timeline)
+        cache = TweetCache()
+        cache.statuses(account, 7)
+        statuses = cache.statuses(account, 3)
+        assert numbers(statuses) == [10, 9, 8, 7, 6, 5, 4]
+
+    def test_statuses_max_tweets(self, timeline):
+        account = MockAccount(timeline)
+        cache = TweetCache()
+        assert numbers(cache.statuses(account, 9999, max_tweets=3)) == [10, 9, 8]
+        cache.statuses(account, 9999, max_tweets=2)
+        cache.statuses(account, 9999, max_tweets=5)
+        # The cut-off predates Snowflake IDs, so the initial fetches can't be bounded by ID
+        assert account.since_ids == [None, timeline[0].id_str, None]
+
+    def test_statuses_persisted(self, timeline, tmp_path):
+        account = MockAccount(timeline)
+        TweetCache(str(tmp_path)).statuses(account, 5)
+        statuses = TweetCache(str(tmp_path)).statuses(account, 5)
+        assert account.since_ids == [cut_off_id(5), timeline[0].id_str]
+        assert numbers(statuses) == [10, 9, 8, 7, 6]
+
+    def test_clear(self, timeline, tmp_path):
+        account = MockAccount(timeline)
+        cache = TweetCache(str(tmp_path))
+        cache.statuses(account, 5)
+        cache.clear()
+        cache.statuses(account, 5)
+        assert account.since_ids == [cut_off_id(5), cut_off_id(5)]
+
+    def test_fetch_tweets_excludes_quotes(self, monkeypatch, timeline):
+        def mock_init(self):
+            self.name = "name"
+            self.username = "username"
+            self.user_id = "user_id"
+            self.cache = TweetCache()
+
+        monkeypatch.setattr(Account, "__init__", mock_init)
+        timeline.insert(0, make_status(11, 0, is_quote_status=True))
+        monkeypatch.setattr(Account, "_timeline", MockAccount(timeline)._timeline)
+        tweets = Account()._fetch_tweets(3, None)
+        assert [t.likes for t in tweets] == [10, 9, 8]
+
+    def test_refresh(self):
+        api = FakeAPI({"user1": 300}, days=5)
+        account = Account(username="user1", api=api, cache=TweetCache())
+        tweets = list(account.iter_tweets(7, include_quotes=True))
+        user = api.users["user1"]
+        user.likes[user.index(int(tweets[0].id))] += 1000
+        api.destroy_status(tweets[1].id)
+        timeline_calls = api.calls["user_timeline"]
+
+        assert account.cache.refresh(account) == 1
+        assert api.calls["statuses_lookup"] == 3
+        refreshed = list(account.iter_tweets(7, include_quotes=True))
+        assert [t.id for t in refreshed] == [t.id for t in tweets if t is not tweets[1]]
+        assert refreshed[0].likes == tweets[0].likes + 1000
+        # Only new Tweets are requested from the timeline
+        assert api.calls["user_timeline"] == timeline_calls + 1
+
+    def test_statuses_refresh_interval(self):
+        api = FakeAPI({"user1": 300}, days=5)
+        clock = [1000.0]
+        account = Account(username="user1", api=api,
+                          cache=TweetCache(refresh_interval=60, clock=lambda: clock[0]))
+        top, second = account.get_top_tweets_num(7, "likes", 2)
+        user = api.users["user1"]
+        user.likes[user.index(int(second.id))] = top.likes + 1
+
+        # The cached engagement is used until it's `refresh_interval` seconds old
+        assert account.get_top_tweets_num(7, "likes", 1)[0].id == top.id
+        assert api.calls["statuses_lookup"] == 0
+        clock[0] += 60
+        assert account.get_top_tweets_num(7, "likes", 1)[0].id == second.id
+        assert api.calls["statuses_lookup"] == 3
+        account.get_top_tweets_num(7, "likes", 1)
+        assert api.calls["statuses_lookup"] == 3
@@ -0,0 +1,61 @@
+import pytest
+
+from top_tweets.candidates import CandidateQueue
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+class MockTweet:
+    def __init__(self, id):
+        self.id = id
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def queue(clock):
+    queue = CandidateQueue(max_age=60, clock=clock)
+    queue.put("1", 7, "likes", [MockTweet("a"), MockTweet("b"), MockTweet("c")])
+    queue.put("2", 7, "likes", [MockTweet("b"), MockTweet("d")])
+    return queue
+
+
+class TestCandidateQueue:
+    def test_pop(self, queue):
+        assert queue.pop("1", 7, "likes").id == "a"
+        assert queue.pop("1", 7, "likes").id == "b"
+        assert len(queue) == 3
+        assert queue.pop("3", 7, "likes") is None
+
+    def test_pop_mismatch(self, queue):
+        assert queue.pop("1", 3, "likes") is None
+        assert queue.pop("1", 7, "retweets") is None
+        assert len(queue) == 5
+
+    def test_pop_revalidated(self, queue):
+        assert queue.pop("1", 7, "likes", lambda t: t.id == "c").id == "c"
+        assert queue.pop("1", 7, "likes") is None
+
+    def test_stale(self, queue, clock):
+        clock.time += 30
+        assert queue.age("1") == 30
+        clock.time += 31
+        assert queue.pop("1", 7, "likes") is None
+        assert queue.age("1") is None
+        assert queue.age("2") == 61
+
+    def test_discard(self, queue):
+        queue.discard("b")
+        assert len(queue) == 3
+        assert queue.pop("2", 7, "likes").id == "d"
+        queue.clear()
+        assert len(queue) == 0
@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+from top_tweets import daemon
+from top_tweets.cache import TweetCache
+from top_tweets.daemon import CronSchedule, Scheduler
+from top_tweets.fake_api import FakeAPI
+
+
+class TestCronSchedule:
+    @pytest.mark.parametrize("expression, after, expected", [
+        ("* * * * *", datetime.datetime(2021, 7, 1, 9, 30, 15),
+         datetime.datetime(2021, 7, 1, 9, 31)),
+        ("0 9 * * *", datetime.datetime(2021, 7, 1, 9, 0),
+         datetime.datetime(2021, 7, 2, 9, 0)),
+        ("*/15 * * * *", datetime.datetime(2021, 7, 1, 9, 46),
+         datetime.datetime(2021, 7, 1, 10, 0)),
+        # 2021-07-03 is a Saturday
+        ("30 8 * * 1-5", datetime.datetime(2021, 7, 2, 9, 0),
+         datetime.datetime(2021, 7, 5, 8, 30)),
+        ("0 0 1 1 *", datetime.datetime(2021, 7, 1),
+         datetime.datetime(2022, 1, 1)),
+        ("0 12 13 * 5", datetime.datetime(2021, 7, 1),
+         datetime.datetime(2021, 7, 2, 12, 0)),
+        ("0 0 * * 7", datetime.datetime(2021, 7, 1),
+         datetime.datetime(2021, 7, 4)),
+    ])
+    def test_next_time(self, expression, after, expected):
+        assert CronSchedule(expression).next_time(after) == expected
+
+    @pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "5-1 * * * *", "a * * * *"])
+    def test_invalid(self, expression):
+        with pytest.raises(ValueError):
+            CronSchedule(expression)
+
+    def test_never_matches(self):
+        with pytest.raises(ValueError):
+            CronSchedule("0 0 31 2 *").next_time(datetime.datetime(2021, 7, 1))
+
+
+class TestScheduler:
+    @pytest.fixture
+    def scheduler(self):
+        """A scheduler whose clock only advances while it waits."""
+        now = [0]
+
+        def wait(seconds):
+            now[0] += seconds
+            return False
+
+        return Scheduler(clock=lambda: now[0], wait=wait)
+
+    def test_run_order(self, scheduler):
+        calls = []
+        scheduler.add_job(lambda: calls.append("a"), interval=15, name="a")
+        scheduler.add_job(lambda: calls.append("b"), interval=50, name="b")
+        scheduler.run(max_runs=4)
+        assert calls == ["a", "a", "a", "b"]
+
+    def test_job_error(self, scheduler):
+        def fail():
+            raise ValueError("No eligible Tweets to share")
+
+        job = scheduler.add_job(fail, interval=1, run_immediately=True)
+        scheduler.run(max_runs=3)
+        assert job.runs == 3
+
+    def test_stop(self, scheduler):
+        job = scheduler.add_job(scheduler.stop, interval=1)
+        scheduler.run()
+        assert job.runs == 1
+
+    def test_job_assert(self):
+        with pytest.raises(AssertionError):
+            Scheduler().add_job(print)
+
+
+class TestDaemon:
+    def test_share_jobs_warm(self):
+        api = FakeAPI({"user1": 200}, days=5)
+        share_bot = daemon.create_bot(["user1"], tweet_cache=TweetCache(), backfill_days=7,
+                                      api=api)
+        scheduler = Scheduler(wait=lambda seconds: False)
+        scheduler.add_job(daemon.share_job(share_bot, num_days=7), interval=1)
+        scheduler.run(max_runs=1)
+        requests = api.requests
+        scheduler.run(max_runs=1)
+        assert api.calls["update_status"] == 2
+        assert api.calls["lookup_users"] == 1
+        # The second share only requests new Tweets (a single page) and publishes the Quote Tweet
+        assert api.requests - requests == 2
+        assert len(share_bot.ledger.quoted_tweet_ids(datetime.datetime(2000, 1, 1))) == 2
+
+    def test_create_bot_uncached(self):
+        # Tweets are only cached (with their engagement at the time) if a cache is provided
+        share_bot = daemon.create_bot(["user1"], backfill_days=7,
+                                      api=FakeAPI({"user1": 200}, days=5))
+        assert share_bot.cache is None
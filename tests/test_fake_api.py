@@ -0,0 +1,110 @@
+import datetime
+
+import pytest
+import tweepy
+
+from top_tweets import get_tweets
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI, snowflake_id
+from top_tweets.get_tweets import Account
+
+
+@pytest.fixture
+def api():
+    return FakeAPI({"user1": 300, "user2": 40}, days=10)
+
+
+class TestFakeAPI:
+    def test_user_timeline_pagination(self, api):
+        first = api.user_timeline(id="user1", count=200)
+        second = api.user_timeline(id="user1", count=200, max_id=first[-1].id - 1)
+        ids = [s.id for s in first + second]
+        assert len(ids) == 300
+        assert ids == sorted(ids, reverse=True)
+
+    def test_user_timeline_since_id(self, api):
+        statuses = api.user_timeline(id="user1", count=200)
+        assert len(api.user_timeline(id="user1", since_id=statuses[5].id)) == 5
+
+    def test_get_user_missing(self, api):
+        with pytest.raises(tweepy.TweepError):
+            api.get_user(screen_name="missing")
+
+    def test_lookup_users(self, api):
+        users = api.lookup_users(screen_names=["user2", "missing", "USER1"])
+        assert [u.screen_name for u in users] == ["user2", "user1"]
+
+    def test_snowflake_id_ordering(self):
+        time = datetime.datetime(2021, 7, 1)
+        assert snowflake_id(time) < snowflake_id(time + datetime.timedelta(milliseconds=1))
+
+
+class TestTimelinePages:
+    def test_snowflake_id(self):
+        # Tweet 1409254810116345858 was published at 2021-06-27 20:58:24.076 UTC
+        time = datetime.datetime(2021, 6, 27, 20, 58, 24, 76000)
+        assert get_tweets.snowflake_id(time) <= 1409254810116345858 < get_tweets.snowflake_id(
+            time + datetime.timedelta(milliseconds=1))
+        aware = time.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+        assert get_tweets.snowflake_id(aware) == get_tweets.snowflake_id(
+            time - datetime.timedelta(hours=2))
+
+    def test_cut_off_since_id_before_snowflake(self):
+        assert get_tweets.cut_off_since_id(datetime.datetime(2009, 1, 1)) is None
+
+    def test_timeline_pages(self, api):
+        pages = list(get_tweets.timeline_pages(api.user_timeline, screen_name="user1"))
+        assert [len(p) for p in pages] == [200, 100]
+        # The final (empty) page marks the end of the timeline
+        assert api.calls["user_timeline"] == 3
+
+    def test_timeline_pages_lazy(self, api):
+        next(get_tweets.timeline_pages(api.user_timeline, screen_name="user1"))
+        assert api.calls["user_timeline"] == 1
+
+    def test_iter_tweets_bounded_by_since_id(self, api):
+        user = api.users["user1"]
+        account = Account(username="user1", api=api)
+        tweets = list(account.iter_tweets(1, include_quotes=True))
+        cut_off = Account.cut_off_time(datetime.date.today(), 1)
+        assert len(tweets) == sum(1 for i in range(user.num_tweets)
+                                  if user.publish_time(i) >= cut_off)
+        # Only Tweets since the cut-off are requested, in a single page (and the empty last page)
+        assert api.calls["user_timeline"] == 2
+
+
+class TestPipeline:
+    def test_fetch_tweets_cut_off(self, api):
+        account = Account(username="user1", api=api)
+        tweets = account._fetch_tweets(5, None)
+        cut_off = Account.cut_off_time(datetime.date.today(), 5)
+        assert all(not t.published_before(cut_off) and not t.is_quote_tweet for t in tweets)
+        user = api.users["user1"]
+        expected = sum(1 for i in range(user.num_tweets)
+                       if user.publish_time(i) >= cut_off and not user.quotes[i])
+        assert len(tweets) == expected
+
+    def test_get_top_tweets_num(self, api):
+        account = Account(username="user1", api=api)
+        tweets = account.get_top_tweets_num(11, "likes", 5)
+        user = api.users["user1"]
+        expected = sorted((user.likes[i] for i in range(user.num_tweets) if not user.quotes[i]),
+                          reverse=True)[:5]
+        assert [t.likes for t in tweets] == expected
+
+    def test_share_from_random_user(self, api):
+        bot = Bot(usernames=["user2"], api=api)
+        bot.share_from_random_user(11)
+        bot.share_from_random_user(11)
+        bot.share_from_random_user(11, quote=False)
+        bot_timeline = api.user_timeline()
+        assert api.calls["update_status"] == 2
+        assert api.calls["retweet"] == 1
+        shared_ids = [s.quoted_status_id_str for s in bot_timeline if s.is_quote_status]
+        shared_ids += [s.retweeted_status.id_str for s in bot_timeline
+                       if hasattr(s, "retweeted_status")]
+        assert len(set(shared_ids)) == 3
+
+        # The Retweeted Tweet is no longer eligible for sharing
+        tweets = Account(username="user2", api=api).get_top_tweets_percent(11, "likes", 100)
+        assert sum(t.retweeted for t in tweets) == 1
@@ -1,8 +1,12 @@
 import datetime
 
 import pytest
+import tweepy
 
-from top_tweets.get_tweets import Account, Tweet
+from top_tweets import twitter_auth
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import (Account, NoTweetsError, Rankings, RequestBudget, Tweet,
+                                   fetch_top_tweets_many, lookup_statuses, refresh_tweets)
 
 
 @pytest.fixture
@@ -32,6 +36,22 @@ class TestAccount:
         with pytest.raises(ValueError):
             Account()
 
+    def test_account_init_resolver(self):
+        class MockUser:
+            screen_name = "username"
+            id_str = "1"
+            name = "name"
+            statuses_count = 10
+            followers_count = 100
+
+        class MockResolver:
+            def get(self, username=None, user_id=None):
+                return MockUser()
+
+        acc = Account(user_id="1", resolver=MockResolver())
+        assert acc.username == "username"
+        assert acc.statuses_count == 10
+
     def test_cut_off_time_curr_day(self):
         latest_date = datetime.date(2021, 7, 1)
         assert Account.cut_off_time(latest_date, 1) == datetime.datetime(2021, 7, 1, 0, 0, 0)
@@ -91,6 +111,95 @@ class TestAccount:
         sorted_tweets = [l10, l5, l0]
         assert acc._filter_tweets(sorted_tweets, 5) == [l10, l5, l0]
 
+    @pytest.fixture
+    def mock_timeline(self, mock_account, monkeypatch):
+        """Monkeypatch iter_tweets() to yield Tweets with tied and distinct metrics."""
+        tweets = [Tweet(i % 7, i % 3, i % 7 + i % 3) for i in range(50)]
+        for i, t in enumerate(tweets):
+            t.id = i
+
+        def mock_iter_tweets(self, num_days, max_tweets, include_quotes=False, budget=None):
+            return iter(tweets[:max_tweets])
+
+        def mock_lookup_tweets(self, tweet_ids, budget=None):
+            return [tweets[i] for i in tweet_ids]
+
+        monkeypatch.setattr(Account, "iter_tweets", mock_iter_tweets)
+        monkeypatch.setattr(Account, "_lookup_tweets", mock_lookup_tweets)
+        return tweets
+
+    @pytest.mark.parametrize("metric", ["likes", "retweets", "likes_retweets_combined"])
+    @pytest.mark.parametrize("top_num", [0, 1, 10, 49, 100])
+    def test_get_top_tweets_num_matches_sort(self, mock_tweet, mock_timeline, metric, top_num):
+        acc = Account()
+        expected = [t.id for t in acc._sort_tweets(list(mock_timeline), metric)[:top_num]]
+        top_tweets = acc.get_top_tweets_num(7, metric, top_num)
+        assert [t.id for t in top_tweets] == expected
+        assert [t.rank for t in top_tweets] == list(range(1, len(expected) + 1))
+
+    @pytest.mark.parametrize("statuses_count", [None, 10, 50, 1000])
+    @pytest.mark.parametrize("top_percent", [1, 10, 33, 100])
+    def test_get_top_tweets_percent_matches_sort(self, mock_tweet, mock_timeline, top_percent,
+                                                 statuses_count):
+        acc = Account()
+        acc.statuses_count = statuses_count
+        sorted_tweets = acc._sort_tweets(list(mock_timeline), "likes")
+        expected = [t.id for t in sorted_tweets[:round((top_percent/100) * len(sorted_tweets))]]
+        assert [t.id for t in acc.get_top_tweets_percent(7, "likes", top_percent)] == expected
+
+    def test_get_top_tweets_percent_max_tweets(self, mock_tweet, mock_timeline):
+        acc = Account()
+        assert len(acc.get_top_tweets_percent(7, "likes", 50, max_tweets=20)) == 10
+
+    def test_get_top_tweets_no_tweets(self, mock_tweet, mock_timeline):
+        acc = Account()
+        with pytest.raises(NoTweetsError):
+            acc.get_top_tweets_num(7, "likes", 10, max_tweets=0)
+
+    def test_get_top_tweets_invalid_metric(self, mock_tweet, mock_timeline):
+        with pytest.raises(AssertionError):
+            Account().get_top_tweets_num(7, "invalid_metric", 10)
+
+
+class TestRankings:
+    @pytest.fixture
+    def tweets(self, mock_tweet):
+        tweets = [Tweet(i % 7, i % 3, i % 7 + i % 3) for i in range(20)]
+        for i, t in enumerate(tweets):
+            t.id = str(i)
+        return tweets
+
+    def test_get_rankings_single_fetch(self, tweets, monkeypatch):
+        fetches = []
+
+        def mock_fetch_tweets(self, num_days, max_tweets, budget=None):
+            fetches.append(num_days)
+            return tweets
+
+        monkeypatch.setattr(Account, "__init__", lambda self: None)
+        monkeypatch.setattr(Account, "_fetch_tweets", mock_fetch_tweets)
+        rankings = Account().get_rankings(7)
+        for metric in ["likes", "retweets", "likes_retweets_combined"]:
+            expected = sorted(tweets, key=lambda t: getattr(t, metric), reverse=True)
+            assert rankings.ranked(metric) == expected
+            assert rankings.top_num(metric, 5) == expected[:5]
+            assert rankings.top_percent(metric, 10) == expected[:2]
+        assert fetches == [7]
+
+    def test_independent_ranks(self, tweets):
+        rankings = Rankings(tweets)
+        assert rankings.rank(tweets[6], "likes") == 1
+        assert rankings.rank(tweets[2], "retweets") == 1
+        assert rankings.rank("6", "retweets") == 16
+        assert all(t.rank is None for t in tweets)
+
+    def test_invalid_metric(self, tweets):
+        rankings = Rankings(tweets, metrics=["likes"])
+        with pytest.raises(AssertionError):
+            rankings.top_num("retweets", 5)
+        with pytest.raises(AssertionError):
+            Rankings(tweets, metrics=["invalid_metric"])
+
 
 class TestTweet:
     @pytest.fixture
@@ -112,3 +221,163 @@ class TestTweet:
     def test_published_before_false(self, mock_dated_tweet, time):
         tweet = Tweet(datetime.datetime(2021, 6, 1, 12, 0, 0))
         assert not tweet.published_before(time)
+
+
+class TestFetchTopTweetsMany:
+    @pytest.fixture
+    def mock_accounts(self, monkeypatch):
+        """Monkeypatch Account to return a page of Tweets (or raise) without API calls."""
+        def mock_init(self, username):
+            self.name = username
+            self.username = username
+
+        def mock_iter_tweets(self, num_days, max_tweets, include_quotes=False, budget=None):
+            budget.acquire()
+            if self.username == "error":
+                raise ValueError("Mock fetch error")
+            return iter([Tweet(0, 5, 5), Tweet(5, 15, 20), Tweet(10, 0, 10)])
+
+        monkeypatch.setattr(Account, "__init__", mock_init)
+        monkeypatch.setattr(Account, "iter_tweets", mock_iter_tweets)
+
+    def test_fetch_top_tweets_many(self, mock_accounts, mock_tweet):
+        accounts = [Account("user1"), Account("error"), Account("user2")]
+        results = fetch_top_tweets_many(accounts, 7, "likes", top_num=2)
+        assert [r.account for r in results] == accounts
+        assert [r.ok for r in results] == [True, False, True]
+        assert [t.likes for t in results[0].tweets] == [10, 5]
+        assert isinstance(results[1].error, ValueError)
+
+    def test_fetch_top_tweets_many_percent(self, mock_accounts, mock_tweet):
+        results = fetch_top_tweets_many([Account("user1")], 7, "retweets")
+        assert [t.retweets for t in results[0].tweets] == [15, 5, 0]
+
+    def test_fetch_top_tweets_many_budget(self, mock_accounts, mock_tweet):
+        accounts = [Account("user{}".format(i)) for i in range(5)]
+        results = fetch_top_tweets_many(accounts, 7, "likes", max_workers=2, max_requests=3)
+        assert sum(r.ok for r in results) == 3
+        assert all(isinstance(r.error, RuntimeError) for r in results if not r.ok)
+
+    def test_fetch_top_tweets_many_assert(self):
+        with pytest.raises(AssertionError):
+            fetch_top_tweets_many([], 7, "likes", top_num=1, top_percent=1)
+
+
+class TestRefresh:
+    @pytest.fixture
+    def api(self):
+        return FakeAPI({"user1": 250, "user2": 60}, days=5)
+
+    def test_lookup_statuses_batched(self, api):
+        ids = [t.id for name in ("user1", "user2")
+               for t in Account(username=name, api=api).iter_tweets(7, include_quotes=True)]
+        statuses = lookup_statuses(ids, api=api)
+        assert list(statuses) == ids
+        assert all(statuses[i].id_str == i for i in ids)
+        assert api.calls["statuses_lookup"] == 4
+
+    def test_refresh_tweets(self, api):
+        tweets = list(Account(username="user1", api=api).iter_tweets(7))
+        user = api.users["user1"]
+        index = user.index(int(tweets[3].id))
+        user.likes[index] += 1000
+        api.retweet(tweets[3].id)
+        api.destroy_status(tweets[5].id)
+
+        deleted = refresh_tweets(tweets, api=api)
+        assert deleted == [tweets[5]]
+        assert tweets[3].likes == user.likes[index]
+        assert tweets[3].likes_retweets_combined == tweets[3].likes + tweets[3].retweets
+        assert tweets[3].retweeted
+        assert api.calls["statuses_lookup"] == 3
+
+    def test_get_top_tweets_percent_lookup(self, api):
+        account = Account(username="user1", api=api)
+        sorted_tweets = account._sort_tweets(list(account.iter_tweets(7)), "likes")
+        timeline_requests = api.calls["user_timeline"]
+        expected = [t.id for t in sorted_tweets[:round(0.1 * len(sorted_tweets))]]
+        top_tweets = account.get_top_tweets_percent(7, "likes", 10)
+        assert [t.id for t in top_tweets] == expected
+        assert [t.rank for t in top_tweets] == list(range(1, len(expected) + 1))
+        # The top 10% are looked up in a single request after a single timeline fetch
+        assert api.calls["user_timeline"] == 2 * timeline_requests
+        assert api.calls["statuses_lookup"] == 1
+
+    def test_rankings_refresh(self, api):
+        account = Account(username="user2", api=api)
+        rankings = account.get_rankings(7)
+        top = rankings.top_num("likes", 1)[0]
+        second = rankings.top_num("likes", 2)[1]
+        api.users["user2"].likes[api.users["user2"].index(int(second.id))] = top.likes + 1
+        api.destroy_status(rankings.ranked("likes")[-1].id)
+        num_tweets = len(rankings)
+
+        deleted = rankings.refresh()
+        assert len(deleted) == 1 and deleted[0] not in rankings.tweets
+        assert len(rankings) == num_tweets - 1
+        assert rankings.top_num("likes", 1)[0] is second
+        assert rankings.rank(second, "likes") == 1
+        assert api.calls["statuses_lookup"] == 1
+
+
+class TestRequestBudget:
+    def test_acquire_max_requests(self):
+        budget = RequestBudget(max_requests=2)
+        budget.acquire()
+        budget.acquire()
+        with pytest.raises(RuntimeError):
+            budget.acquire()
+
+    def test_acquire_deadline(self):
+        budget = RequestBudget(timeout=-1)
+        with pytest.raises(RuntimeError):
+            budget.acquire()
+
+
+class TestTweetInit:
+    @pytest.fixture
+    def status(self):
+        return tweepy.models.Status.parse(None, {
+            "id": 1,
+            "id_str": "1",
+            "created_at": "Thu Jul 01 12:00:00 +0000 2021",
+            "is_quote_status": False,
+            "full_text": "Text #hashtag1 #hashtag2",
+            "entities": {"hashtags": [{"text": "hashtag1"}, {"text": "hashtag2"}]},
+            "favorite_count": 5,
+            "retweet_count": 10,
+            "retweeted": False,
+        })
+
+    def test_tweet_init(self, status):
+        tweet = Tweet(status, None)
+        assert tweet.id == "1"
+        assert tweet.publish_time == datetime.datetime(2021, 7, 1, 12, 0, 0)
+        assert tweet.hashtags == ("hashtag1", "hashtag2")
+        assert tweet.likes_retweets_combined == 15
+        assert not tweet.is_retweet
+
+    def test_tweet_slots(self, status):
+        tweet = Tweet(status, None)
+        assert not hasattr(tweet, "__dict__")
+        with pytest.raises(AttributeError):
+            tweet.extra_attr = None
+
+    def test_tweet_keep_status(self, status):
+        tweet = Tweet(status, None, keep_status=True)
+        assert tweet.status is status
+        assert tweet.text == "Text #hashtag1 #hashtag2"
+
+    def test_tweet_lazy_status(self, status, monkeypatch):
+        calls = []
+
+        class MockAPI:
+            def get_status(self, id, tweet_mode):
+                calls.append(id)
+                return status
+
+        twitter_auth.set_api(MockAPI())
+        tweet = Tweet(status, None)
+        assert tweet.text == "Text #hashtag1 #hashtag2"
+        assert tweet.status is status
+        assert calls == ["1"]
@@ -0,0 +1,77 @@
+import pytest
+
+from top_tweets import leaderboard
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+
+
+class MockAccount:
+    def __init__(self, followers_count):
+        self.followers_count = followers_count
+
+
+class MockTweet:
+    def __init__(self, id, likes, account):
+        self.id = id
+        self.likes = likes
+        self.account = account
+
+
+@pytest.fixture
+def ranked_tweets():
+    large, small = MockAccount(10000), MockAccount(100)
+    return [[MockTweet("a1", 500, large), MockTweet("a2", 300, large), MockTweet("a3", 30, large)],
+            [MockTweet("b1", 300, small), MockTweet("b2", 20, small)]]
+
+
+class TestMerge:
+    def test_merge(self, ranked_tweets):
+        ids = [t.id for t in leaderboard.merge(ranked_tweets, "likes")]
+        assert ids == ["a1", "a2", "b1", "a3", "b2"]
+
+    def test_merge_top_num(self, ranked_tweets):
+        assert [t.id for t in leaderboard.merge(ranked_tweets, "likes", 2)] == ["a1", "a2"]
+
+    def test_merge_per_account(self, ranked_tweets):
+        ids = [t.id for t in leaderboard.merge(ranked_tweets, "likes", per_account=1)]
+        assert ids == ["a1", "b1"]
+
+    def test_merge_normalise(self, ranked_tweets):
+        ids = [t.id for t in leaderboard.merge(ranked_tweets, "likes", normalise=True)]
+        assert ids == ["b1", "b2", "a1", "a2", "a3"]
+
+    def test_merge_matches_sorted(self):
+        accounts = [MockAccount(100) for _ in range(5)]
+        tweets = [MockTweet(i, (i * 37) % 11, accounts[i % 5]) for i in range(100)]
+        ranked = [sorted([t for t in tweets if t.account is a], key=lambda t: t.likes,
+                         reverse=True) for a in accounts]
+        expected = sorted([t for r in ranked for t in r], key=lambda t: t.likes, reverse=True)
+        assert list(leaderboard.merge(ranked, "likes", 20)) == expected[:20]
+
+    def test_merge_invalid_metric(self, ranked_tweets):
+        with pytest.raises(AssertionError):
+            leaderboard.merge(ranked_tweets, "invalid_metric")
+
+
+class TestFetchLeaderboard:
+    @pytest.fixture
+    def api(self):
+        return FakeAPI({"user1": 100, "user2": 100, "user3": 100}, days=5)
+
+    def test_fetch_leaderboard(self, api):
+        accounts = [Account(username=u, api=api) for u in ["user1", "user2", "user3"]]
+        tweets = leaderboard.fetch_leaderboard(accounts, 6, "likes", 10, per_account=4)
+        all_tweets = [t for a in accounts for t in a._fetch_tweets(6, None)]
+        assert len(tweets) == 10
+        assert [t.likes for t in tweets] == sorted([t.likes for t in tweets], reverse=True)
+        assert max(sum(t.account is a for t in tweets) for a in accounts) <= 4
+        assert tweets[0].likes == max(t.likes for t in all_tweets)
+
+    def test_share_from_leaderboard(self, api):
+        bot = Bot(usernames=["user1", "user2", "user3"], metric="likes", api=api)
+        bot.share_from_leaderboard(6)
+        bot.share_from_leaderboard(6)
+        quotes = [s for s in api.user_timeline() if s.is_quote_status]
+        assert quotes[1].full_text.startswith("Number 1 most liked Tweet in the previous 6 days")
+        assert quotes[0].full_text.startswith("Number 2 most liked Tweet in the previous 6 days")
@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+
+from top_tweets import get_tweets
+from top_tweets.get_tweets import Tweet
+from top_tweets.ledger import QUOTE, RETWEET, ShareLedger
+
+
+class MockStatus:
+    def __init__(self, id, quoted_tweet_id, retweeted_id, publish_time):
+        self.id = id
+        self.quoted_tweet_id = quoted_tweet_id
+        self.retweeted_id = retweeted_id
+        self.publish_time = publish_time
+
+
+@pytest.fixture
+def mock_bot_timeline(monkeypatch):
+    """Monkeypatch get_tweets.timeline_pages() and Tweet.__init__ to return a mock bot timeline."""
+    now = datetime.datetime.utcnow()
+
+    def mock_pages(method, since_id=None, max_id=None, budget=None, **kwargs):
+        return iter([[
+            MockStatus("s1", "quoted_1", None, now),
+            MockStatus("s2", None, "retweeted_1", now),
+            MockStatus("s3", None, None, now),
+            MockStatus("s4", "quoted_old", None, datetime.datetime(2001, 1, 1)),
+        ]])
+
+    def mock_init(self, status, account):
+        self.id = status.id
+        self.quoted_tweet_id = status.quoted_tweet_id
+        self.retweeted_tweet_id = status.retweeted_id
+        self.publish_time = status.publish_time
+
+    monkeypatch.setattr(get_tweets, "timeline_pages", mock_pages)
+    monkeypatch.setattr(Tweet, "__init__", mock_init)
+
+
+@pytest.fixture
+def ledger():
+    ledger = ShareLedger(":memory:")
+    yield ledger
+    ledger.close()
+
+
+class TestShareLedger:
+    def test_record_invalid_share_type(self, ledger):
+        with pytest.raises(AssertionError):
+            ledger.record("1", "invalid_share_type")
+
+    def test_has_retweeted(self, ledger):
+        ledger.record("1", RETWEET)
+        assert ledger.has_retweeted("1")
+        assert not ledger.has_retweeted("2")
+        assert ledger.retweeted_tweet_ids() == {"1"}
+
+    def test_has_quoted_cut_off(self, ledger):
+        ledger.record("1", QUOTE, shared_at=datetime.datetime(2021, 6, 1))
+        assert ledger.has_quoted("1", datetime.datetime(2021, 5, 1))
+        assert not ledger.has_quoted("1", datetime.datetime(2021, 7, 1))
+        assert ledger.quoted_tweet_ids(datetime.datetime(2021, 5, 1)) == {"1"}
+
+    def test_has_quoted_offset_aware(self, ledger):
+        shared_at = datetime.datetime(2021, 6, 1, 12, tzinfo=datetime.timezone.utc)
+        ledger.record("1", QUOTE, shared_at=shared_at)
+        assert ledger.has_quoted("1", datetime.datetime(2021, 6, 1, 11))
+        assert not ledger.has_quoted("1", datetime.datetime(2021, 6, 1, 13))
+
+    def test_record_duplicate_share_id(self, ledger):
+        ledger.record("1", QUOTE, share_id="s1")
+        ledger.record("1", QUOTE, share_id="s1")
+        assert len(ledger.entries()) == 1
+
+    def test_backfill(self, ledger, mock_bot_timeline):
+        assert ledger.backfill(30) == 2
+        assert ledger.has_retweeted("retweeted_1")
+        assert ledger.quoted_tweet_ids(datetime.datetime(2001, 1, 1)) == {"quoted_1"}
+
+    def test_reconcile(self, ledger, mock_bot_timeline):
+        ledger.record("quoted_1", QUOTE, share_id="s1")
+        ledger.record("deleted", QUOTE, share_id="s_deleted")
+        result = ledger.reconcile(30)
+        assert result["missing"] == [("retweeted_1", RETWEET, "s2")]
+        assert result["stale"] == [("deleted", QUOTE, "s_deleted")]
+        assert not ledger.has_retweeted("retweeted_1")
+
+    def test_reconcile_fix(self, ledger, mock_bot_timeline):
+        ledger.record("deleted", QUOTE, share_id="s_deleted")
+        ledger.reconcile(30, fix=True)
+        assert ledger.has_retweeted("retweeted_1")
+        assert {e[2] for e in ledger.entries()} == {"s1", "s2"}
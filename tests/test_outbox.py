@@ -0,0 +1,178 @@
+import concurrent.futures
+import datetime
+import threading
+
+import pytest
+import tweepy
+
+from top_tweets import outbox
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
+from top_tweets.ledger import QUOTE, RETWEET, ShareLedger
+from top_tweets.outbox import FAILED, PENDING, SENDING, SENT, ShareOutbox
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+    def sleep(self, seconds):
+        self.time += seconds
+
+
+@pytest.fixture
+def api():
+    return FakeAPI({"user1": 100, "user2": 100, "user3": 5}, days=5)
+
+
+@pytest.fixture
+def bot(api):
+    return Bot(usernames=["user1", "user2", "user3"], api=api)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def share_outbox(clock):
+    return ShareOutbox(":memory:", clock=clock, sleep=clock.sleep)
+
+
+def fail(api, method, error, times=1):
+    """Make `times` requests to an API method raise `error`."""
+    publish = getattr(api, method)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= times:
+            raise error
+        return publish(*args, **kwargs)
+
+    setattr(api, method, failing)
+
+
+class TestPlanShares:
+    def test_plan(self, api, bot):
+        plan = bot.plan_shares(7, 3, extra_hashtags=["tag"])
+        assert len(plan) == 3
+        assert sorted(s.username for s in plan) == ["user1", "user2", "user3"]
+        assert len({s.key for s in plan}) == 3
+        assert all(s.share_type == QUOTE and " #tag" in s.content for s in plan)
+        assert api.calls["update_status"] == api.calls["retweet"] == 0
+
+    def test_plan_per_account(self, bot):
+        plan = bot.plan_shares(7, 6, usernames=["user1", "user2"], per_account=3, quote=False)
+        assert len(plan) == 6
+        assert [s.username for s in plan].count("user1") == 3
+        assert all(s.share_type == RETWEET and s.content is None for s in plan)
+
+    def test_plan_excludes_shared(self, api, bot):
+        top = bot.plan_shares(7, 1, usernames=["user1"], quote=False)[0]
+        api.retweet(top.tweet_id)
+        plan = bot.plan_shares(7, 2, usernames=["user1"], per_account=None, quote=False)
+        assert top.tweet_id not in [s.tweet_id for s in plan]
+
+    def test_format_plan(self, bot):
+        plan = bot.plan_shares(7, 2)
+        text = outbox.format_plan(plan)
+        assert plan[0].content in text and plan[1].tweet_id in text
+
+
+class TestShareOutbox:
+    def test_drain(self, api, bot, share_outbox, clock):
+        share_ledger = ShareLedger(":memory:")
+        plan = bot.plan_shares(7, 3)
+        assert share_outbox.enqueue(plan) == 3
+        # Planned shares are only added once
+        assert share_outbox.enqueue(plan) == 0
+        assert share_outbox.drain(api, share_ledger, spacing=60) == 3
+        assert clock.time == 1120
+        assert api.calls["update_status"] == 3
+        assert all(e[1] == SENT for e in share_outbox.entries())
+        cut_off = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        assert all(share_ledger.has_quoted(s.tweet_id, cut_off) for s in plan)
+        assert share_outbox.drain(api) == 0
+
+    def test_max_shares(self, api, bot, share_outbox):
+        share_outbox.enqueue(bot.plan_shares(7, 3, quote=False))
+        assert share_outbox.drain(api, max_shares=2) == 2
+        assert len(share_outbox.entries(PENDING)) == 1
+
+    def test_retry(self, api, bot, share_outbox, clock):
+        share_outbox.enqueue(bot.plan_shares(7, 2, quote=False))
+        fail(api, "retweet", tweepy.TweepError("Internal error", api_code=131))
+        # The first share is retried later; the second is still published
+        assert share_outbox.drain(api, spacing=0, retry_delay=30) == 1
+        assert [e[1:3] for e in share_outbox.entries()] == [(PENDING, 1), (SENT, 1)]
+        assert share_outbox.drain(api) == 0
+        clock.time += 30
+        assert share_outbox.drain(api) == 1
+        assert api.calls["retweet"] == 2
+
+    def test_max_attempts(self, api, bot, share_outbox, clock):
+        share_outbox.enqueue(bot.plan_shares(7, 1))
+        fail(api, "update_status", tweepy.TweepError("Internal error", api_code=131), times=2)
+        for _ in range(2):
+            share_outbox.drain(api, max_attempts=2, retry_delay=1)
+            clock.time += 10
+        assert share_outbox.entries()[0][1:3] == (FAILED, 2)
+
+    def test_already_published(self, api, bot, share_outbox):
+        share_outbox.enqueue(bot.plan_shares(7, 1, quote=False))
+        fail(api, "retweet", tweepy.TweepError("Already retweeted", api_code=327))
+        assert share_outbox.drain(api) == 0
+        assert share_outbox.entries()[0][1] == SENT
+
+    def test_rate_limited(self, api, bot, share_outbox):
+        share_outbox.enqueue(bot.plan_shares(7, 2))
+        fail(api, "update_status", tweepy.RateLimitError("Rate limit exceeded", api_code=88))
+        assert share_outbox.drain(api) == 0
+        assert [e[1:3] for e in share_outbox.entries()] == [(PENDING, 0), (PENDING, 0)]
+
+    def test_concurrent_drains(self, api, bot, tmp_path):
+        path = str(tmp_path / "outbox.sqlite3")
+        ShareOutbox(path).enqueue(bot.plan_shares(7, 3, quote=False))
+        share_outboxes = [ShareOutbox(path) for _ in range(2)]
+        # Both drains read the first share before either claims it
+        barrier = threading.Barrier(2, timeout=5)
+        for share_outbox in share_outboxes:
+            def next_share(next_share=share_outbox._next, calls=[]):
+                row = next_share()
+                calls.append(row)
+                if len(calls) == 1:
+                    barrier.wait()
+                return row
+            share_outbox._next = next_share
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            sent = list(executor.map(lambda o: o.drain(api, spacing=0), share_outboxes))
+        assert sum(sent) == api.calls["retweet"] == 3
+        assert all(e[1] == SENT for e in share_outboxes[0].entries())
+
+    def test_interrupted(self, api, bot, clock, tmp_path):
+        path = str(tmp_path / "outbox.sqlite3")
+        share_ledger = ShareLedger(":memory:")
+        share_outbox = ShareOutbox(path, clock=clock)
+        share_outbox.enqueue(bot.plan_shares(7, 2, quote=False))
+        fail(api, "retweet", KeyboardInterrupt())
+        with pytest.raises(KeyboardInterrupt):
+            share_outbox.drain(api, share_ledger)
+
+        # The interrupted share is left "sending" until its claim times out
+        share_outbox = ShareOutbox(path, clock=clock, sleep=clock.sleep)
+        assert share_outbox.drain(api, share_ledger) == 1
+        assert [e[1] for e in share_outbox.entries()] == [SENDING, SENT]
+        clock.time += 5 * 60
+
+        # The interrupted share was recorded (e.g. published before the interrupt), so isn't
+        # published again
+        share_ledger.record(share_outbox._next()[1], RETWEET)
+        assert share_outbox.drain(api, share_ledger) == 0
+        assert api.calls["retweet"] == 1
+        assert [e[1] for e in share_outbox.entries()] == [SENT, SENT]
@@ -0,0 +1,139 @@
+import pytest
+import tweepy
+
+from top_tweets.ratelimit import RateLimitScheduler
+
+
+class MockResponse:
+    def __init__(self, status_code, headers, url=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+
+
+class MockAPI:
+    """Respond to `user_timeline` requests with the rate limit headers of a 3 request window."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.remaining = 3
+        self.reset = clock.time + 60
+        self.requests = 0
+        self.last_response = None
+
+    def user_timeline(self, **kwargs):
+        if self.clock.time >= self.reset:
+            self.remaining, self.reset = 3, self.clock.time + 60
+
+        headers = {"x-rate-limit-limit": "3", "x-rate-limit-reset": str(self.reset)}
+        if self.remaining == 0:
+            headers["x-rate-limit-remaining"] = "0"
+            response = MockResponse(429, headers)
+            self.last_response = response
+            raise tweepy.RateLimitError("Rate limit exceeded", response)
+
+        self.remaining -= 1
+        self.requests += 1
+        headers["x-rate-limit-remaining"] = str(self.remaining)
+        self.last_response = MockResponse(200, headers)
+        return ["page"]
+
+    user_timeline.pagination_mode = "id"
+
+    def other_method(self):
+        return "other"
+
+
+class MockClock:
+    def __init__(self):
+        self.time = 1000.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.time
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.time += seconds
+
+
+@pytest.fixture
+def clock():
+    return MockClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return RateLimitScheduler(MockAPI(clock), clock=clock.clock, sleep=clock.sleep)
+
+
+class TestRateLimitScheduler:
+    def test_pass_through(self, scheduler):
+        assert scheduler.other_method() == "other"
+
+    def test_pagination_mode(self, scheduler):
+        assert scheduler.user_timeline.pagination_mode == "id"
+
+    def test_waits_for_reset(self, scheduler, clock):
+        for _ in range(5):
+            assert scheduler.user_timeline() == ["page"]
+        assert clock.sleeps == [60]
+        assert scheduler.api.requests == 5
+
+    def test_headers_tracked(self, scheduler):
+        scheduler.user_timeline()
+        assert scheduler.limits["user_timeline"].limit == 3
+        assert scheduler.limits["user_timeline"].remaining == 2
+        assert scheduler.limits["user_timeline"].reset == 1060
+
+    def test_other_endpoint_response(self, scheduler):
+        # e.g. the response to a concurrent request (in another thread) to another endpoint
+        scheduler.api.get_user = lambda **kwargs: "user"
+        scheduler.api.last_response = MockResponse(
+            200, {"x-rate-limit-limit": "3", "x-rate-limit-remaining": "0"},
+            url="https://api.twitter.com/1.1/statuses/user_timeline.json?user_id=1")
+        assert scheduler.get_user(user_id=1) == "user"
+        assert scheduler.limits["get_user"].limit == 900
+        assert scheduler.limits["get_user"].remaining == 899
+
+    def test_out_of_order_response(self, scheduler):
+        scheduler.user_timeline()
+        limit = scheduler.limits["user_timeline"]
+        # An earlier response of the same window doesn't increase the remaining quota
+        limit.update({"x-rate-limit-remaining": "2", "x-rate-limit-reset": str(limit.reset)})
+        assert limit.remaining == 2
+        limit.remaining = 1
+        limit.update({"x-rate-limit-remaining": "2", "x-rate-limit-reset": str(limit.reset)})
+        assert limit.remaining == 1
+
+    def test_rate_limited_retry(self, scheduler, clock):
+        # Quota used by another client
+        scheduler.api.remaining = 0
+        assert scheduler.user_timeline() == ["page"]
+        assert clock.sleeps == [60]
+
+    def test_rate_limited_max_retries(self, clock):
+        scheduler = RateLimitScheduler(MockAPI(clock), max_retries=0, clock=clock.clock,
+                                       sleep=clock.sleep)
+        scheduler.api.remaining = 0
+        with pytest.raises(tweepy.RateLimitError):
+            scheduler.user_timeline()
+
+    def test_expected_wait(self, scheduler):
+        scheduler.user_timeline()
+        assert scheduler.expected_wait({"user_timeline": 2}) == 0
+        assert scheduler.expected_wait({"user_timeline": 3}) == 60
+        # The window length isn't included in the headers; the default (15 minutes) is used
+        assert scheduler.expected_wait({"user_timeline": 6}) == 60 + 15 * 60
+
+    def test_expected_wait_unknown_reset(self, scheduler):
+        assert scheduler.expected_wait({"update_status": 300}) == 0
+        assert scheduler.expected_wait({"update_status": 301}) == 3 * 60 * 60
+
+    def test_refresh(self, scheduler):
+        def mock_rate_limit_status(resources):
+            return {"resources": {"statuses": {
+                "/statuses/user_timeline": {"limit": 900, "remaining": 0, "reset": 2000}}}}
+
+        scheduler.api.rate_limit_status = mock_rate_limit_status
+        scheduler.refresh()
+        assert scheduler.expected_wait({"user_timeline": 1}) == 1000
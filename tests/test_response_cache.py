@@ -0,0 +1,135 @@
+import pytest
+
+from top_tweets import get_tweets
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+from top_tweets.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture
+def api():
+    return FakeAPI({"user1": 300, "user2": 40, "user3": 10}, days=10)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+class TestResponseCache:
+    def test_cached(self, api, clock):
+        cached = ResponseCache(api, clock=clock)
+        first = cached.user_timeline(screen_name="user1", count=200)
+        second = cached.user_timeline(count=200, screen_name="USER1")
+        assert second is first
+        assert api.calls["user_timeline"] == 1
+        cached.user_timeline(screen_name="user1", count=200, max_id=first[-1].id - 1)
+        assert api.calls["user_timeline"] == 2
+
+    def test_ttl(self, api, clock):
+        cached = ResponseCache(api, ttls={"get_user": 60}, clock=clock)
+        cached.get_user(screen_name="user1")
+        clock.time += 59
+        cached.get_user(screen_name="user1")
+        assert api.calls["get_user"] == 1
+        clock.time += 1
+        cached.get_user(screen_name="user1")
+        assert api.calls["get_user"] == 2
+        # Endpoints without a TTL aren't cached
+        cached.user_timeline(screen_name="user1")
+        cached.user_timeline(screen_name="user1")
+        assert api.calls["user_timeline"] == 2
+
+    def test_lru_entries(self, api, clock):
+        cached = ResponseCache(api, max_entries=2, clock=clock)
+        cached.get_user(screen_name="user1")
+        cached.get_user(screen_name="user2")
+        cached.get_user(screen_name="user1")
+        cached.get_user(screen_name="user3")
+        assert cached.num_entries == 2
+        cached.get_user(screen_name="user1")
+        assert api.calls["get_user"] == 3
+        cached.get_user(screen_name="user2")
+        assert api.calls["get_user"] == 4
+
+    def test_lru_bytes(self, api, clock):
+        cached = ResponseCache(api, max_entries=None, clock=clock)
+        cached.get_user(screen_name="user1")
+        cached.max_bytes = 2 * cached.size
+        cached.get_user(screen_name="user2")
+        cached.get_user(screen_name="user3")
+        assert cached.num_entries == 2
+        assert cached.size <= cached.max_bytes
+
+    def test_disk(self, api, clock, tmp_path):
+        path = str(tmp_path / "responses.sqlite3")
+        cached = ResponseCache(api, path=path, clock=clock)
+        page = cached.user_timeline(screen_name="user1", count=200)
+        cached.close()
+
+        # A new process shares the responses
+        cached = ResponseCache(api, path=path, clock=clock)
+        assert [s.id for s in cached.user_timeline(screen_name="user1", count=200)] == \
+            [s.id for s in page]
+        assert cached.get_user(screen_name="user1").screen_name == "user1"
+        assert api.calls["user_timeline"] == 1
+        cached.close()
+
+        clock.time += 60 * 60
+        cached = ResponseCache(api, path=path, clock=clock)
+        cached.user_timeline(screen_name="user1", count=200)
+        assert api.calls["user_timeline"] == 2
+
+    def test_write_invalidates_bot_timeline(self, api, clock, tmp_path):
+        cached = ResponseCache(api, path=str(tmp_path / "responses.sqlite3"), clock=clock)
+        cached.user_timeline(screen_name="user1")
+        assert len(cached.user_timeline()) == 0
+        tweet = Account(username="user1", api=cached).get_top_tweets_num(10, "likes", 1)[0]
+
+        cached.user_timeline(screen_name="user2")
+        Bot._quote_tweet(tweet, "Quote", api=cached)
+        assert len(cached.user_timeline()) == 1
+        # Other users' timelines are still cached
+        calls = api.calls["user_timeline"]
+        cached.user_timeline(screen_name="user2")
+        assert api.calls["user_timeline"] == calls
+
+    def test_write_invalidates_shared_status(self, api, clock, tmp_path):
+        path = str(tmp_path / "responses.sqlite3")
+        cached = ResponseCache(api, path=path, clock=clock)
+        tweet = Account(username="user1", api=cached).get_top_tweets_num(10, "likes", 1)[0]
+        assert not cached.get_status(tweet.id).retweeted
+        Bot._retweet(tweet, api=cached)
+
+        # The source Tweet's status and timeline pages (including in the database) are requested
+        # again, so it's no longer eligible
+        for cache in (cached, ResponseCache(api, path=path, clock=clock)):
+            assert cache.get_status(tweet.id).retweeted
+            account = Account(username="user1", api=cache)
+            with pytest.raises(ValueError):
+                Bot._select_tweet(account.get_top_tweets_num(10, "likes", 1), 7, api=cache)
+
+    def test_eligibility_after_share(self, api, clock):
+        cached = ResponseCache(api, clock=clock)
+        tweets = Account(username="user1", api=cached).get_top_tweets_num(10, "likes", 2)
+        assert Bot._select_tweet(tweets, 7, api=cached) is tweets[0]
+        Bot._quote_tweet(tweets[0], "Quote", api=cached)
+        assert Bot._select_tweet(tweets, 7, api=cached) is tweets[1]
+
+    def test_repeated_account_fetches(self, api, clock):
+        cached = ResponseCache(api, clock=clock)
+        for _ in range(3):
+            Account(username="user2", api=cached).get_top_tweets_num(10, "likes", 5)
+        assert api.calls["get_user"] == 1
+        assert api.calls["user_timeline"] == 2
+        pages = list(get_tweets.timeline_pages(cached.user_timeline, screen_name="user2"))
+        assert sum(len(p) for p in pages) == 40
@@ -0,0 +1,96 @@
+import concurrent.futures
+import logging
+import random
+
+import pytest
+
+from top_tweets.selection import ROUND_ROBIN, AccountSelector
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+class TestAccountSelector:
+    def test_stats(self, clock):
+        selector = AccountSelector(clock=clock)
+        assert selector.stats("1").last_fetch is None
+        selector.record_fetch("1", 20, 7, 3)
+        clock.time += 10
+        selector.record_share("1")
+        stats = selector.stats("1")
+        assert (stats.last_fetch, stats.last_share) == (1000, 1010)
+        assert (stats.num_tweets, stats.num_days, stats.num_eligible) == (20, 7, 2)
+
+    def test_skip_exhausted(self, clock):
+        selector = AccountSelector(max_skip=60 * 60, clock=clock)
+        # One Tweet a day: skipped for up to `max_skip`
+        selector.record_fetch("1", 7, 7, 0)
+        # 48 Tweets a day: skipped for 30 minutes
+        selector.record_fetch("2", 48 * 7, 7, 0)
+        selector.record_fetch("3", 10, 7, 4)
+        assert selector.order(["1", "2", "3", "4"]) in (["3", "4"], ["4", "3"])
+        clock.time += 30 * 60
+        assert sorted(selector.order(["1", "2", "3", "4"])) == ["2", "3", "4"]
+        clock.time += 30 * 60
+        assert len(selector.order(["1", "2", "3", "4"])) == 4
+
+    def test_failure_backoff(self, clock):
+        selector = AccountSelector(failure_backoff=60, clock=clock)
+        selector.record_failure("1")
+        assert selector.order(["1", "2"]) == ["2"]
+        clock.time += 60
+        assert sorted(selector.order(["1", "2"])) == ["1", "2"]
+        selector.record_fetch("1", 10, 7, 2)
+        assert selector.stats("1").last_failure is None
+
+    def test_skip_reason(self, clock, caplog):
+        selector = AccountSelector(failure_backoff=60, clock=clock)
+        selector.record_failure("1")
+        selector.record_fetch("2", 7, 7, 0)
+        with caplog.at_level(logging.INFO, logger="top_tweets.selection"):
+            assert selector.order(["1", "2"]) == []
+        messages = [r.getMessage() for r in caplog.records]
+        assert "(fetch failed)" in messages[0]
+        assert "(nothing to share)" in messages[1]
+
+    def test_concurrent_shares(self, clock, tmp_path):
+        path = str(tmp_path / "stats.sqlite3")
+        selectors = [AccountSelector(path, clock=clock) for _ in range(2)]
+        selectors[0].record_fetch("1", 100, 7, 50)
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda i: selectors[i % 2].record_share("1"), range(40)))
+        stats = selectors[0].stats("1")
+        assert (stats.num_tweets, stats.num_eligible) == (100, 10)
+
+    def test_weighted(self, clock):
+        selector = AccountSelector(clock=clock, rng=random.Random(0))
+        selector.record_fetch("1", 100, 7, 90)
+        selector.record_fetch("2", 100, 7, 10)
+        first = [selector.order(["1", "2"])[0] for _ in range(200)]
+        assert 150 < first.count("1") < 200
+
+    def test_round_robin(self, clock):
+        selector = AccountSelector(strategy=ROUND_ROBIN, clock=clock)
+        for user_id in ("1", "2", "3"):
+            clock.time += 1
+            selector.record_share(user_id)
+        clock.time += 1
+        selector.record_share("1")
+        assert selector.order(["1", "2", "3", "4"]) == ["4", "2", "3", "1"]
+
+    def test_persisted(self, clock, tmp_path):
+        path = str(tmp_path / "stats.sqlite3")
+        selector = AccountSelector(path, clock=clock)
+        selector.record_fetch("1", 10, 7, 0)
+        selector.close()
+        assert AccountSelector(path, clock=clock).order(["1", "2"]) == ["2"]
@@ -0,0 +1,168 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from top_tweets import get_tweets, singleflight
+from top_tweets.bot import Bot
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+
+
+def run_concurrently(*functions):
+    """Call each function in its own thread at (almost) the same time, returning the results."""
+    barrier = threading.Barrier(len(functions))
+
+    def call(function):
+        barrier.wait()
+        return function()
+
+    with concurrent.futures.ThreadPoolExecutor(len(functions)) as executor:
+        return list(executor.map(call, functions))
+
+
+class TestGroup:
+    def test_join(self):
+        group = singleflight.Group("test")
+        starts = []
+
+        def start(window):
+            starts.append(window)
+            return singleflight.Once(lambda: window)
+
+        with group.join("key", 5, start) as first:
+            with group.join("key", 7, start) as second:
+                assert first() == second() == 5
+            # An in-flight value covering a smaller window isn't shared
+            with group.join("key", 3, start) as third:
+                assert third() == 3
+            with group.join("other", 5, start):
+                pass
+        with group.join("key", 7, start) as fourth:
+            assert fourth() == 7
+        assert starts == [5, 3, 5, 7]
+
+    def test_shared_iterator(self):
+        requested = []
+
+        def source():
+            for i in range(3):
+                requested.append(i)
+                yield i
+
+        shared = singleflight.SharedIterator(source())
+        budget = get_tweets.RequestBudget(max_requests=3)
+        first, second = shared.attach(), shared.attach()
+        first_items = first.iterate()
+        assert next(first_items) == 0
+        assert list(second.iterate(budget)) == [0, 1, 2]
+        assert list(first_items) == [1, 2]
+        assert requested == [0, 1, 2]
+        # Only the requests made by the caller advancing the source (including the request that
+        # ends it) are acquired
+        assert budget.requests == 3
+
+    def test_items_dropped(self):
+        shared = singleflight.SharedIterator(iter(range(3)))
+        first, second = shared.attach(), shared.attach()
+        first_items = first.iterate()
+        assert next(first_items) == 0
+        # Items are kept until every attached caller has read them
+        assert list(second.iterate()) == [0, 1, 2]
+        assert list(first_items) == [1, 2]
+
+        shared = singleflight.SharedIterator(iter(range(3)))
+        only = shared.attach()
+        items = only.iterate()
+        assert next(items) == 0
+        # With a single caller, read items are dropped (so later callers can't attach)
+        assert shared.attach() is None
+        assert list(items) == [1, 2]
+
+    def test_budget_exhausted(self):
+        shared = singleflight.SharedIterator(iter(range(3)))
+        first, second = shared.attach(), shared.attach()
+        exhausted = get_tweets.RequestBudget(max_requests=1)
+        first_items = first.iterate(exhausted)
+        assert next(first_items) == 0
+        with pytest.raises(RuntimeError):
+            next(first_items)
+        # The other caller can still advance the source
+        assert list(second.iterate()) == [0, 1, 2]
+
+    def test_shared_error(self):
+        def source():
+            yield 1
+            raise ValueError("Failed")
+
+        shared = singleflight.SharedIterator(source())
+        readers = [shared.attach(), shared.attach()]
+        for reader in readers:
+            iterator = reader.iterate()
+            assert next(iterator) == 1
+            with pytest.raises(ValueError):
+                next(iterator)
+
+    def test_once(self):
+        calls = []
+        once = singleflight.Once(lambda: calls.append(1) or len(calls))
+        assert once() == once() == 1
+
+
+class TestCoalescing:
+    @pytest.fixture
+    def api(self):
+        return FakeAPI({"user1": 500, "user2": 50}, days=10, latency=0.05)
+
+    def test_concurrent_users(self, api):
+        accounts = run_concurrently(*[lambda: Account(username="user1", api=api)] * 4)
+        assert len({a.user_id for a in accounts}) == 1
+        assert api.calls["get_user"] == 1
+
+    def test_concurrent_fetches(self, api):
+        account = Account(username="user1", api=api)
+        expected = [account.get_top_tweets_num(10, "likes", 5)]
+        widest_calls = api.calls["user_timeline"]
+        expected += [account.get_top_tweets_num(d, m, 5, n)
+                     for d, m, n in ((10, "retweets", None), (3, "likes", None), (10, "likes", 50))]
+        calls = api.calls["user_timeline"]
+
+        # The other fetches start once the widest fetch is in flight
+        in_flight = threading.Event()
+        user_timeline = api.user_timeline
+
+        def signalling_user_timeline(*args, **kwargs):
+            in_flight.set()
+            return user_timeline(*args, **kwargs)
+
+        api.user_timeline = signalling_user_timeline
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(account.get_top_tweets_num, 10, "likes", 5)]
+            in_flight.wait()
+            futures += [executor.submit(account.get_top_tweets_num, d, m, 5, n)
+                        for d, m, n in ((10, "retweets", None), (3, "likes", None),
+                                        (10, "likes", 50))]
+            results = [f.result() for f in futures]
+
+        # The timeline is requested once, as for a single fetch
+        assert api.calls["user_timeline"] == calls + widest_calls
+        for tweets, expected_tweets in zip(results, expected):
+            assert [t.id for t in tweets] == [t.id for t in expected_tweets]
+
+    def test_sequential_fetches(self, api):
+        account = Account(username="user2", api=api)
+        account.get_top_tweets_num(10, "likes", 5)
+        calls = api.calls["user_timeline"]
+        account.get_top_tweets_num(10, "likes", 5)
+        # Completed fetches aren't reused
+        assert api.calls["user_timeline"] == 2 * calls
+
+    def test_concurrent_quote_scans(self, api):
+        tweets = Account(username="user2", api=api).get_top_tweets_num(10, "likes", 2)
+        Bot._quote_tweet(tweets[0], "Quote", api=api)
+        calls = api.calls["user_timeline"]
+        assert Bot.quoted_tweet_ids(7, api) == {tweets[0].id}
+        scan_calls = api.calls["user_timeline"] - calls
+        results = run_concurrently(*[lambda: Bot.quoted_tweet_ids(7, api)] * 3)
+        assert results == [{tweets[0].id}] * 3
+        assert api.calls["user_timeline"] == calls + 2 * scan_calls
@@ -0,0 +1,78 @@
+import pytest
+
+from top_tweets import streams
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+
+
+class MockTweet:
+    def __init__(self, id, likes, hashtags=()):
+        self.id = id
+        self.likes = likes
+        self.hashtags = hashtags
+
+
+@pytest.fixture
+def tweets():
+    return [MockTweet(0, 5, ("Python",)), MockTweet(1, 50), MockTweet(2, 20, ("python", "data")),
+            MockTweet(3, 50, ("data",)), MockTweet(4, 1)]
+
+
+class TestStreams:
+    def test_min_engagement(self, tweets):
+        result = streams.pipeline(tweets, streams.min_engagement(20, "likes"))
+        assert [t.id for t in result] == [1, 2, 3]
+
+    def test_hashtags(self, tweets):
+        assert [t.id for t in streams.hashtags(["#python"])(tweets)] == [0, 2]
+        assert [t.id for t in streams.hashtags(["data", "PYTHON"], match_all=True)(tweets)] == [2]
+
+    def test_pipeline(self, tweets):
+        result = streams.pipeline(tweets, streams.where(lambda t: t.id != 1),
+                                  streams.min_engagement(10, "likes"), streams.limit(1))
+        assert [t.id for t in result] == [2]
+
+    def test_pipeline_lazy(self, tweets):
+        consumed = []
+
+        def source():
+            for t in tweets:
+                consumed.append(t.id)
+                yield t
+
+        result = streams.pipeline(source(), streams.min_engagement(10, "likes"))
+        assert next(result).id == 1
+        assert consumed == [0, 1]
+
+    @pytest.mark.parametrize("k", [0, 1, 2, 5, 10])
+    def test_running_top_k(self, tweets, k):
+        expected = sorted(tweets, key=lambda t: t.likes, reverse=True)[:k]
+        top = streams.RunningTopK(k, "likes")
+        assert list(top(tweets)) == tweets
+        assert top.tweets == expected
+        assert top.count == len(tweets)
+        assert streams.RunningTopK(k, "likes").consume(tweets) == expected
+
+    def test_invalid_metric(self):
+        with pytest.raises(AssertionError):
+            streams.min_engagement(10, "invalid_metric")
+
+
+class TestIterTweets:
+    @pytest.fixture
+    def api(self):
+        return FakeAPI({"user1": 1000}, days=10, quote_ratio=0.2)
+
+    def test_early_termination(self, api):
+        account = Account(username="user1", api=api)
+        tweets = streams.pipeline(account.iter_tweets(11), streams.limit(30))
+        assert len(list(tweets)) == 30
+        # 20 Tweets per page, some of which are Quote Tweets
+        assert api.calls["user_timeline"] <= 3
+
+    def test_include_quotes(self, api):
+        account = Account(username="user1", api=api)
+        tweets = list(account.iter_tweets(11, max_tweets=100, include_quotes=True))
+        assert len(tweets) == 100
+        assert any(t.is_quote_tweet for t in tweets)
+        assert not any(t.is_quote_tweet for t in account.iter_tweets(11, max_tweets=100))
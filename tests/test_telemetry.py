@@ -0,0 +1,120 @@
+import json
+import logging
+import urllib.request
+
+import pytest
+
+from top_tweets import telemetry
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+from top_tweets.ratelimit import RateLimitScheduler
+from top_tweets.telemetry import JSONFormatter, Registry
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    telemetry.REGISTRY.reset()
+    yield telemetry.REGISTRY
+    telemetry.REGISTRY.reset()
+
+
+class TestRegistry:
+    def test_counter(self):
+        registry = Registry()
+        registry.inc("requests", endpoint="a")
+        registry.inc("requests", 2, endpoint="a")
+        registry.inc("requests", endpoint="b")
+        assert registry.counter("requests", endpoint="a") == 3
+        assert registry.counter("requests", endpoint="b") == 1
+        assert registry.counter("requests", endpoint="c") == 0
+
+    def test_histogram(self):
+        registry = Registry(buckets=(1, 5))
+        for value in (0.5, 1, 3, 10):
+            registry.observe("seconds", value)
+        histogram = registry.histogram("seconds")
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == 14.5
+        assert registry.histogram("missing") is None
+
+    def test_timer(self):
+        registry = Registry()
+        with pytest.raises(ValueError):
+            with registry.timer("seconds", stage="fetch"):
+                raise ValueError
+        assert registry.histogram("seconds", stage="fetch").count == 1
+
+    def test_hooks(self):
+        registry = Registry()
+        calls = []
+        hook = lambda *args: calls.append(args)  # noqa: E731
+        registry.add_hook(hook)
+        registry.inc("requests", endpoint="a")
+        registry.observe("seconds", 2)
+        registry.remove_hook(hook)
+        registry.inc("requests")
+        assert calls == [("counter", "requests", 1, {"endpoint": "a"}),
+                         ("histogram", "seconds", 2, {})]
+
+    def test_prometheus(self):
+        registry = Registry(buckets=(1, 5))
+        registry.inc("requests_total", endpoint='a"b')
+        registry.observe("seconds", 3, stage="rank")
+        assert registry.prometheus().splitlines() == [
+            "# TYPE top_tweets_requests_total counter",
+            'top_tweets_requests_total{endpoint="a\\"b"} 1',
+            "# TYPE top_tweets_seconds histogram",
+            'top_tweets_seconds_bucket{stage="rank",le="1"} 0',
+            'top_tweets_seconds_bucket{stage="rank",le="5"} 1',
+            'top_tweets_seconds_bucket{stage="rank",le="+Inf"} 1',
+            'top_tweets_seconds_sum{stage="rank"} 3.0',
+            'top_tweets_seconds_count{stage="rank"} 1',
+        ]
+
+    def test_write_textfile(self, tmp_path):
+        registry = Registry()
+        registry.inc("requests_total")
+        path = str(tmp_path / "metrics.prom")
+        telemetry.write_textfile(path, registry)
+        with open(path) as f:
+            assert f.read() == registry.prometheus()
+
+    def test_http_server(self):
+        registry = Registry()
+        registry.inc("requests_total")
+        server = telemetry.start_http_server(0, "127.0.0.1", registry)
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            with urllib.request.urlopen(url) as response:
+                assert response.read().decode() == registry.prometheus()
+        finally:
+            server.shutdown()
+
+
+class TestJSONFormatter:
+    def test_format(self):
+        record = logging.makeLogRecord({"name": "top_tweets.cache", "levelname": "INFO",
+                                        "msg": "Fetched %d Tweets", "args": (5,),
+                                        "account": "user1"})
+        data = json.loads(JSONFormatter().format(record))
+        assert data["message"] == "Fetched 5 Tweets"
+        assert data["level"] == "INFO"
+        assert data["logger"] == "top_tweets.cache"
+        assert data["account"] == "user1"
+        assert "args" not in data
+
+
+class TestInstrumentation:
+    def test_timeline_pages(self, registry):
+        api = FakeAPI({"user1": 300}, days=5)
+        account = Account(username="user1", api=RateLimitScheduler(api))
+        tweets = account.get_top_tweets_num(10, "likes", 5, max_tweets=250)
+        assert len(tweets) == 5
+        # Both pages are needed for 250 Tweets; the timeline isn't paged to its end
+        assert api.calls["user_timeline"] == 2
+        assert registry.counter("timeline_pages_total", account="user1") == 2
+        assert registry.counter("tweets_fetched_total", account="user1") == 300
+        assert registry.counter("api_requests_total", endpoint="user_timeline") == 2
+        assert registry.histogram("api_request_seconds", endpoint="user_timeline").count == 2
+        assert registry.histogram("stage_seconds", stage="fetch").count == 1
@@ -0,0 +1,31 @@
+import tweepy
+
+from top_tweets import twitter_auth
+from top_tweets.ratelimit import RateLimitScheduler
+
+
+class TestTwitterAuth:
+    def test_tweepy_auth_credentials(self):
+        api = twitter_auth.tweepy_auth("key", "secret", "token", "token_secret")
+        assert isinstance(api, tweepy.API)
+        assert api.auth.access_token == "token"
+
+    def test_get_api_default(self, offline_api):
+        assert twitter_auth.get_api() is offline_api
+        assert twitter_auth.API is offline_api
+
+    def test_get_api_lazy(self, monkeypatch):
+        calls = []
+
+        def mock_tweepy_auth():
+            calls.append(None)
+            return "api"
+
+        monkeypatch.setattr(twitter_auth, "tweepy_auth", mock_tweepy_auth)
+        twitter_auth.set_api(None)
+        assert calls == []
+        api = twitter_auth.get_api()
+        assert isinstance(api, RateLimitScheduler)
+        assert api.api == "api"
+        assert twitter_auth.get_api() is api
+        assert calls == [None]
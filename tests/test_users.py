@@ -0,0 +1,72 @@
+import pytest
+
+from top_tweets import twitter_auth
+from top_tweets.users import UserResolver
+
+
+class MockUser:
+    def __init__(self, id_str, screen_name):
+        self.id_str = id_str
+        self.screen_name = screen_name
+
+
+class MockAPI:
+    """Look up users named after their IDs ("user<id>"), recording each request."""
+    def __init__(self):
+        self.calls = []
+
+    def lookup_users(self, user_ids=None, screen_names=None):
+        self.calls.append(user_ids or screen_names)
+        if user_ids is not None:
+            return [MockUser(u, "User" + u) for u in user_ids if u != "missing"]
+        return [MockUser(s[4:], s) for s in screen_names if s != "missing"]
+
+
+@pytest.fixture
+def mock_lookup_users():
+    """Use a `MockAPI` as the default API, returning its list of requests."""
+    api = MockAPI()
+    twitter_auth.set_api(api)
+    return api.calls
+
+
+class TestUserResolver:
+    def test_resolve_batches(self, mock_lookup_users):
+        user_ids = [str(i) for i in range(250)]
+        users = UserResolver().resolve(user_ids=user_ids)
+        assert [u.id_str for u in users] == user_ids
+        assert [len(c) for c in mock_lookup_users] == [100, 100, 50]
+
+    def test_resolve_cached(self, mock_lookup_users):
+        resolver = UserResolver()
+        resolver.resolve(usernames=["user1", "user2"])
+        users = resolver.resolve(user_ids=["1", "2"])
+        assert [u.screen_name for u in users] == ["user1", "user2"]
+        assert resolver.get(username="@USER1").id_str == "1"
+        assert len(mock_lookup_users) == 1
+
+    def test_resolve_expired(self, mock_lookup_users):
+        resolver = UserResolver(ttl=0)
+        resolver.get(user_id="1")
+        resolver.get(user_id="1")
+        assert len(mock_lookup_users) == 2
+
+    def test_resolve_missing(self, mock_lookup_users):
+        assert UserResolver().resolve(user_ids=["1", "missing"])[1] is None
+
+    def test_get_missing(self, mock_lookup_users):
+        with pytest.raises(ValueError):
+            UserResolver().get(username="missing")
+
+    def test_resolve_api(self):
+        api = MockAPI()
+        UserResolver(api=api).resolve(user_ids=["1"])
+        assert api.calls == [["1"]]
+
+    def test_get_assert(self):
+        with pytest.raises(ValueError):
+            UserResolver().get()
+
+    def test_resolve_assert(self):
+        with pytest.raises(AssertionError):
+            UserResolver().resolve(usernames=["user1"], user_ids=["1"])
@@ -0,0 +1,92 @@
+import pytest
+import tweepy
+
+from top_tweets import leaderboard, workers
+from top_tweets.fake_api import FakeAPI
+from top_tweets.get_tweets import Account
+from top_tweets.workers import DONE, FAILED, PENDING, WorkQueue
+
+USERS = {"user{}".format(i): 20 + 10 * i for i in range(12)}
+
+
+def fake_api(index):
+    return FakeAPI(USERS, days=5)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "work.sqlite3")
+
+
+@pytest.fixture
+def queue(path):
+    queue = WorkQueue(path)
+    queue.submit(list(USERS) + ["missing"], 7, "likes", 3)
+    return queue
+
+
+def expected_leaderboard(api, top_num, per_account=None):
+    accounts = [Account(username=u, api=api) for u in USERS]
+    return leaderboard.fetch_leaderboard(accounts, 7, "likes", top_num, per_account)
+
+
+class TestWorkQueue:
+    def test_claim(self, queue):
+        first = queue.claim("a", 5)
+        second = WorkQueue(queue.path).claim("b", 20)
+        assert len(first) == 5 and len(second) == 8
+        assert not set(first) & set(second)
+        assert queue.claim("c", 5) == []
+
+    def test_stale_claims(self, path, queue):
+        queue = WorkQueue(path, claim_timeout=-1, max_attempts=2)
+        assert len(queue.claim("a", 20)) == 13
+        # The worker didn't complete its claims in time
+        assert len(queue.claim("b", 20)) == 13
+        assert queue.claim("c", 20) == []
+        assert queue.progress() == {FAILED: 13}
+
+    def test_fail(self, queue):
+        username = queue.claim("a", 1)[0]
+        queue.fail(username, "Error")
+        assert queue.claim("b", 1) == [username]
+        queue.fail(username, "Error", retry=False)
+        assert queue.progress() == {PENDING: 12, FAILED: 1}
+
+    def test_work(self, queue):
+        api = fake_api(0)
+        assert workers.work(queue.path, "worker", api=api, batch_size=5) == 12
+        assert queue.progress() == {DONE: 12, FAILED: 1}
+        # Merging requires no requests
+        requests = api.requests
+        tweets = queue.leaderboard(10, per_account=2)
+        assert api.requests == requests
+        expected = expected_leaderboard(api, 10, per_account=2)
+        assert [t.id for t in tweets] == [t.id for t in expected]
+        assert [t.account.username for t in tweets] == [t.account.username for t in expected]
+        assert [t.rank for t in tweets] == [t.rank for t in expected]
+
+    def test_work_lookup_error(self, queue):
+        api = fake_api(0)
+        lookup_users = api.lookup_users
+
+        def lookup_missing(**kwargs):
+            # Like the API, an error is returned if none of the users exist
+            users = lookup_users(**kwargs)
+            if not users:
+                raise tweepy.TweepError("No user matches for specified terms.", api_code=17)
+            return users
+
+        api.lookup_users = lookup_missing
+        # The last batch is only the missing user
+        assert workers.work(queue.path, "worker", api=api, batch_size=4) == 12
+        assert queue.progress() == {DONE: 12, FAILED: 1}
+
+    def test_run(self, queue):
+        assert workers.run(queue.path, 3, api_factory=fake_api, batch_size=2) == \
+            {DONE: 12, FAILED: 1}
+        tweets = queue.leaderboard(20, per_account=3)
+        # Each process has its own fake API, so compare the Tweets' authors and engagement
+        expected = expected_leaderboard(fake_api(0), 20, per_account=3)
+        assert [(t.account.username, t.likes) for t in tweets] == \
+            [(t.account.username, t.likes) for t in expected]
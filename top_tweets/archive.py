@@ -0,0 +1,298 @@
+"""An append-only on-disk archive of fetched Tweets, for ranking over long histories offline.
+
+Usage: python -m top_tweets.archive [num_days]
+
+Archives the Tweets of every account in `SOURCE_USERNAMES` to `TWEET_ARCHIVE_DIR` (see
+`config_sample.py`): those published since each account's newest archived Tweet, or (if
+`num_days` is provided) every Tweet from the previous `num_days`, updating their engagement.
+"""
+import datetime
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import tweepy
+
+from top_tweets import get_tweets
+from top_tweets.batch import TweetBatch
+
+# The fixed-size record of each archived Tweet: the fields used to select and rank Tweets, and
+# the location of the Tweet's JSON in the partition's JSON Lines file
+RECORD_DTYPE = np.dtype([("id", "<i8"), ("timestamp", "<f8"), ("likes", "<i8"),
+                         ("retweets", "<i8"), ("is_quote", "?"), ("offset", "<i8"),
+                         ("length", "<i4")])
+# Records as returned by queries, with the (proleptic Gregorian ordinal) day of their partition
+_DAY_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr + [("day", "<i8")])
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class TweetArchive:
+    """An append-only store of each account's Tweets, partitioned by (UTC) publish day.
+
+    Each account has a directory holding its user's JSON and, for each day it published Tweets,
+    a binary file of fixed-size records (`RECORD_DTYPE`) and a JSON Lines file of the Tweets'
+    JSON. A query for a `num_days` window memory-maps only the record files of the days in the
+    window (the file names are the publish-time index), and selects and ranks Tweets via NumPy
+    without parsing any JSON; only the Tweets returned are parsed.
+
+    Tweets are never modified in place: re-archiving a Tweet (e.g. to update its engagement)
+    appends a new record, and queries use the latest record of each Tweet.
+
+    The archive can be queried with no network at all, via an `Account` created by `account()`,
+    e.g. archive.account(username="user").get_top_tweets_num(365, "likes", 10). It can also be
+    passed as `resolver` (it implements `users.UserResolver.get()`) and `archive` to `Account`.
+
+    Attributes:
+        directory (str): the archive's root directory.
+
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def account(self, username=None, user_id=None):
+        """Return a `get_tweets.Account` whose user and Tweets are read from the archive."""
+        return get_tweets.Account(username=username, user_id=user_id, resolver=self, archive=self)
+
+    def get(self, username=None, user_id=None):
+        """Return the archived Tweepy User for a screen name (without "@") or unique identifier.
+
+        Raises:
+            ValueError: if the user isn't in the archive.
+
+        """
+        if user_id is None and username is not None:
+            user_id = self._user_ids().get(username.lower())
+        path = self._path(user_id, "user.json") if user_id is not None else None
+        if path is None or not os.path.exists(path):
+            raise ValueError("User '{}' isn't in the archive.".format(username or user_id))
+
+        with open(path) as f:
+            return tweepy.models.User.parse(None, json.load(f))
+
+    def add(self, user, statuses):
+        """Append Tweepy Status objects (e.g. from `Account._timeline()`) to a user's archive.
+
+        Args:
+            user (tweepy.User): the user who published the Tweets.
+            statuses (iterable of tweepy.Status): the Tweets to archive.
+
+        Returns:
+            int: the number of Tweets appended.
+
+        """
+        partitions = {}
+        for status in statuses:
+            time = get_tweets.utc_naive(status.created_at)
+            partitions.setdefault(time.date(), []).append((status, time))
+
+        with self._lock:
+            os.makedirs(self._path(user.id_str), exist_ok=True)
+            with open(self._path(user.id_str, "user.json"), "w") as f:
+                json.dump(user._json, f)
+
+            for day, day_statuses in partitions.items():
+                self._append(user.id_str, day, day_statuses)
+
+        return sum(len(s) for s in partitions.values())
+
+    def update(self, account, num_days=None, budget=None):
+        """Archive an account's Tweets published since its newest archived Tweet.
+
+        Args:
+            account (get_tweets.Account): the (online) account to archive.
+            num_days (int or None): if provided, every Tweet from the previous `num_days` is
+                archived again (updating their engagement), rather than only newer Tweets.
+            budget (get_tweets.RequestBudget or None): a request budget to acquire before each
+                page is requested, or None.
+
+        Returns:
+            int: the number of Tweets appended.
+
+        """
+        if num_days is not None:
+            cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+            since_id = get_tweets.cut_off_since_id(cut_off)
+        else:
+            cut_off = None
+            since_id = self._newest_id(account.user_id)
+
+        statuses = []
+        for status in account._timeline(since_id, budget):
+            if cut_off is not None and get_tweets.utc_naive(status.created_at) < cut_off:
+                break
+            statuses.append(status)
+
+        return self.add(account.user, statuses)
+
+    def days(self, user_id):
+        """Return a sorted list of the days (datetime.date) a user has archived Tweets from."""
+        path = self._path(user_id)
+        if not os.path.isdir(path):
+            return []
+        return sorted(datetime.date.fromisoformat(name[:-len(".bin")])
+                      for name in os.listdir(path) if name.endswith(".bin"))
+
+    def records(self, user_id, num_days, latest_date=None):
+        """Return the latest record of each archived Tweet from a `num_days` window.
+
+        Args:
+            user_id (str): the user's unique identifier.
+            num_days (int): the window's length in days, including `latest_date`.
+            latest_date (datetime.date or None): the window's last day (defaults to the current
+                day), e.g. to backtest rankings as of an earlier day.
+
+        Returns:
+            numpy.ndarray of RECORD_DTYPE: the records, newest Tweet first, with a "day" field.
+
+        """
+        latest_date = latest_date or datetime.date.today()
+        first_date = get_tweets.Account.cut_off_time(latest_date, num_days).date()
+        parts = []
+        for day in self.days(user_id):
+            if first_date <= day <= latest_date:
+                records = self._records(user_id, day)
+                if records is not None:
+                    part = np.empty(len(records), dtype=_DAY_RECORD_DTYPE)
+                    for name in RECORD_DTYPE.names:
+                        part[name] = records[name]
+                    part["day"] = day.toordinal()
+                    parts.append(part)
+
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=_DAY_RECORD_DTYPE)
+        # The latest record of each Tweet, ordered by ID (i.e. publish time), newest first
+        latest = len(records) - 1 - np.unique(records["id"][::-1], return_index=True)[1]
+        return records[latest][::-1]
+
+    def iter_tweets(self, account, num_days, max_tweets=None, include_quotes=False,
+                    latest_date=None):
+        """Yield an account's archived Tweets from the previous `num_days`, newest first.
+
+        As per `Account.iter_tweets()`, but read from the archive (see `records()`).
+
+        """
+        records = self.records(account.user_id, num_days, latest_date)
+        if not include_quotes:
+            records = records[~records["is_quote"]]
+        records = records[:max_tweets]
+        # Tweets are parsed a page at a time, as they're consumed
+        for start in range(0, len(records), get_tweets.TIMELINE_PAGE_SIZE):
+            yield from self._tweets(account, records[start:start + get_tweets.TIMELINE_PAGE_SIZE])
+
+    def top_tweets(self, account, num_days, metric, top_num=None, top_percent=None,
+                   max_tweets=None, latest_date=None):
+        """Return an account's top archived Tweets, as per `Account.get_top_tweets_num()`.
+
+        Tweets (excluding Quote Tweets) are selected and ranked via `batch.TweetBatch`, and only
+        the returned Tweets are parsed. Either `top_num` or `top_percent` must be provided.
+
+        Args:
+            account (get_tweets.Account): the account.
+            num_days (int): the historic Tweet collection period in days, including `latest_date`.
+            metric (str): the metric to sort Tweets by (see `get_tweets.METRICS`).
+            top_num (int or None): the top number of Tweets to return.
+            top_percent (int or None): the top percentage (1-100) of Tweets to return.
+            max_tweets (int or None): the maximum number of (the most recent) Tweets to rank.
+            latest_date (datetime.date or None): the last day of the collection period (defaults
+                to the current day).
+
+        Returns:
+            list of get_tweets.Tweet: ranked (see `Tweet.rank`) from highest to lowest `metric`.
+
+        """
+        metric = get_tweets.Account._check_metric(metric)
+        records = self.records(account.user_id, num_days, latest_date)
+        records = records[~records["is_quote"]][:max_tweets]
+        account._check_tweets_fetched(len(records), num_days)
+
+        batch = TweetBatch(records["id"], records["timestamp"], records["likes"],
+                           records["retweets"])
+        top = batch.top(batch.score(metric), top_num, top_percent)
+        tweets = self._tweets(account, records[top])
+        for rank, tweet in enumerate(tweets, 1):
+            tweet.rank = rank
+        return tweets
+
+    def _append(self, user_id, day, statuses):
+        json_path = self._path(user_id, "{}.jsonl".format(day.isoformat()))
+        records = np.zeros(len(statuses), dtype=RECORD_DTYPE)
+        with open(json_path, "ab") as f:
+            offset = f.tell()
+            for record, (status, time) in zip(records, statuses):
+                line = json.dumps(status._json).encode() + b"\n"
+                f.write(line)
+                record["id"] = status.id
+                record["timestamp"] = (time - _EPOCH).total_seconds()
+                record["likes"] = status.favorite_count
+                record["retweets"] = status.retweet_count
+                record["is_quote"] = status.is_quote_status
+                record["offset"] = offset
+                record["length"] = len(line)
+                offset += len(line)
+
+        # Records are written after the JSON they locate, so are always complete
+        with open(self._path(user_id, "{}.bin".format(day.isoformat())), "ab") as f:
+            f.write(records.tobytes())
+
+    def _records(self, user_id, day):
+        path = self._path(user_id, "{}.bin".format(day.isoformat()))
+        num_records = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if num_records == 0:
+            return None
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(num_records,))
+
+    def _tweets(self, account, records):
+        """Return a list of `get_tweets.Tweet` (with their Status) of records, in order."""
+        statuses = {}
+        for day in np.unique(records["day"]):
+            day_records = records[records["day"] == day]
+            path = "{}.jsonl".format(datetime.date.fromordinal(int(day)).isoformat())
+            with open(self._path(account.user_id, path), "rb") as f:
+                for record in np.sort(day_records, order="offset"):
+                    f.seek(record["offset"])
+                    status_json = json.loads(f.read(record["length"]))
+                    statuses[int(record["id"])] = tweepy.models.Status.parse(None, status_json)
+
+        return [get_tweets.Tweet(statuses[int(i)], account, keep_status=True)
+                for i in records["id"]]
+
+    def _newest_id(self, user_id):
+        for day in reversed(self.days(user_id)):
+            records = self._records(user_id, day)
+            if records is not None:
+                return str(records["id"].max())
+        return None
+
+    def _user_ids(self):
+        user_ids = {}
+        for user_id in os.listdir(self.directory):
+            path = self._path(user_id, "user.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    user_ids[json.load(f)["screen_name"].lower()] = user_id
+        return user_ids
+
+    def _path(self, user_id, *names):
+        return os.path.join(self.directory, str(user_id), *names)
+
+
+def main(argv=None):
+    """Archive the Tweets of every account in `SOURCE_USERNAMES` (see the module docstring)."""
+    from top_tweets import config, telemetry, users
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    argv = sys.argv[1:] if argv is None else argv
+    num_days = int(argv[0]) if argv else None
+    archive = TweetArchive(config.TWEET_ARCHIVE_DIR)
+    resolver = users.UserResolver()
+    resolver.resolve(usernames=config.SOURCE_USERNAMES)
+    for username in config.SOURCE_USERNAMES:
+        archive.update(get_tweets.Account(username=username, resolver=resolver), num_days)
+
+
+if __name__ == "__main__":
+    main()
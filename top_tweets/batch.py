@@ -0,0 +1,210 @@
+import datetime
+
+import numpy as np
+
+from top_tweets import get_tweets
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=datetime.timezone.utc)
+
+
+class TweetBatch:
+    """A columnar batch of Tweets (from one or more accounts), ranked with vectorized operations.
+
+    Each Tweet's ID, publish time, and engagement metrics are stored in NumPy arrays, so that
+    scores, ranks, and percentiles of hundreds of thousands of Tweets can be computed in a single
+    pass (via `argsort`/`partition`) rather than by sorting Python objects. Tweets are ordered
+    exactly as by `sorted(..., reverse=True)`, i.e. Tweets with equal scores keep the batch's order.
+
+    The batch holds a reference to each source Tweet, returned by `tweets()` only when needed.
+
+    Attributes:
+        ids (numpy.ndarray of int64): the Tweets' unique identifiers.
+        timestamps (numpy.ndarray of float64): the Tweets' publish times (UTC epoch seconds).
+        likes (numpy.ndarray of int64): how many times each Tweet has been Liked.
+        retweets (numpy.ndarray of int64): how many times each Tweet has been Retweeted.
+        account_index (numpy.ndarray of int64): the index (in `accounts`) of the account which
+            published each Tweet.
+        accounts (list of get_tweets.Account or None): the accounts which published the Tweets.
+
+    """
+    def __init__(self, ids, timestamps, likes, retweets, account_index=None, accounts=None,
+                 tweets=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.likes = np.asarray(likes, dtype=np.int64)
+        self.retweets = np.asarray(retweets, dtype=np.int64)
+        if account_index is None:
+            account_index = np.zeros(len(self.ids), dtype=np.int64)
+        self.account_index = np.asarray(account_index, dtype=np.int64)
+        self.accounts = list(accounts) if accounts is not None else [None]
+        self._tweets = tweets
+        assert len({len(c) for c in (self.ids, self.timestamps, self.likes, self.retweets,
+                                      self.account_index)}) == 1, "Columns must be the same length."
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_tweets(cls, tweets):
+        """Return a batch of an iterable of `get_tweets.Tweet` (e.g. from several accounts)."""
+        tweets = list(tweets)
+        accounts = []
+        account_indices = {}
+        ids, timestamps, likes, retweets, account_index = [], [], [], [], []
+        for tweet in tweets:
+            key = id(tweet.account)
+            if key not in account_indices:
+                account_indices[key] = len(accounts)
+                accounts.append(tweet.account)
+            ids.append(int(tweet.id))
+            timestamps.append(_timestamp(tweet.publish_time))
+            likes.append(tweet.likes)
+            retweets.append(tweet.retweets)
+            account_index.append(account_indices[key])
+
+        return cls(ids, timestamps, likes, retweets, account_index, accounts or [None], tweets)
+
+    @classmethod
+    def concatenate(cls, batches):
+        """Return a single batch of the Tweets in several batches (e.g. one per account)."""
+        batches = list(batches)
+        accounts = []
+        account_index = []
+        for batch in batches:
+            account_index.append(batch.account_index + len(accounts))
+            accounts.extend(batch.accounts)
+
+        tweets = None
+        if all(b._tweets is not None for b in batches):
+            tweets = [t for b in batches for t in b._tweets]
+
+        return cls(ids=np.concatenate([b.ids for b in batches] or [[]]),
+                   timestamps=np.concatenate([b.timestamps for b in batches] or [[]]),
+                   likes=np.concatenate([b.likes for b in batches] or [[]]),
+                   retweets=np.concatenate([b.retweets for b in batches] or [[]]),
+                   account_index=np.concatenate(account_index or [[]]),
+                   accounts=accounts or [None], tweets=tweets)
+
+    @property
+    def likes_retweets_combined(self):
+        """numpy.ndarray of int64: the sum of each Tweet's Likes and Retweets."""
+        return self.likes + self.retweets
+
+    def score(self, metric=None, weights=None, half_life=None, now=None):
+        """Return a score (numpy.ndarray) per Tweet, to rank Tweets by (highest first).
+
+        Args:
+            metric (str or callable or None): one of `get_tweets.METRICS`, or a function that takes
+                the batch and returns an array of scores (e.g. `lambda b: b.likes / b.retweets`).
+                Defaults to "likes_retweets_combined" if `weights` isn't provided.
+            weights (dict of str: float or None): weights of a linear combination of metrics, e.g.
+                {"likes": 1, "retweets": 3}, used instead of `metric`.
+            half_life (int or float or None): if provided, scores are decayed by half for every
+                `half_life` days since each Tweet was published, favouring recent Tweets.
+            now (datetime.datetime or None): the time Tweet ages are measured from (defaults to
+                the current time). Naive datetimes are treated as UTC.
+
+        """
+        assert metric is None or weights is None, "Either `metric` or `weights` must be None."
+        if weights is not None:
+            score = np.zeros(len(self), dtype=np.float64)
+            for name, weight in weights.items():
+                score += weight * self._column(name)
+        elif callable(metric):
+            score = np.asarray(metric(self))
+        else:
+            score = self._column(metric or "likes_retweets_combined")
+
+        if half_life is not None:
+            now = _timestamp(now or datetime.datetime.now(datetime.timezone.utc))
+            age_days = np.maximum(now - self.timestamps, 0) / 86400
+            score = score * np.exp2(-age_days / half_life)
+
+        return score
+
+    def order(self, score):
+        """Return the indices (numpy.ndarray) of every Tweet, ordered by `score` (highest first)."""
+        return np.argsort(-np.asarray(score), kind="stable")
+
+    def top(self, score, top_num=None, top_percent=None):
+        """Return the indices (numpy.ndarray) of the top Tweets by `score`, highest first.
+
+        As per `Account.get_top_tweets_num()`/`get_top_tweets_percent()`: either the top `top_num`
+        Tweets, or the top `top_percent` (1-100) percent of Tweets. Rather than sorting every
+        Tweet, the top Tweets are selected via `numpy.partition` and only they are sorted.
+
+        """
+        assert (top_num is None) != (top_percent is None), "Either `top_num` or `top_percent` " \
+                                                           "must be provided."
+        if top_num is None:
+            top_num = round((top_percent/100) * len(self))
+        top_num = min(top_num, len(self))
+        if top_num <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        negated = -np.asarray(score)
+        threshold = np.partition(negated, top_num - 1)[top_num - 1]
+        # Every Tweet scored at least the threshold, in batch order, so that ties are broken as
+        # by a stable sort of every Tweet
+        candidates = np.flatnonzero(negated <= threshold)
+        return candidates[np.argsort(negated[candidates], kind="stable")][:top_num]
+
+    def ranks(self, score):
+        """Return the rank (numpy.ndarray of int64; 1 is best) of each Tweet by `score`."""
+        return self.rank_all({"score": score})["score"][0]
+
+    def rank_all(self, metrics=get_tweets.METRICS):
+        """Return the rank and percentile of each Tweet by several metrics, in one pass.
+
+        Args:
+            metrics (iterable or dict): metric names (see `score()`), or a dict of names to score
+                arrays (e.g. from `score()`), to rank Tweets by.
+
+        Returns:
+            dict of str: (numpy.ndarray, numpy.ndarray): the rank (int64; 1 is best) and
+                percentile (float64; the percentage of Tweets ranked at or below the Tweet, so the
+                top Tweet is 100) of each Tweet, by metric.
+
+        """
+        if not isinstance(metrics, dict):
+            metrics = {m: self._column(m) for m in metrics}
+        names = list(metrics)
+        if not names:
+            return {}
+
+        num_tweets = len(self)
+        scores = np.stack([np.broadcast_to(np.asarray(metrics[m]), num_tweets) for m in names])
+        orders = np.argsort(-scores, axis=1, kind="stable")
+        ranks = np.empty_like(orders)
+        np.put_along_axis(ranks, orders, np.arange(1, num_tweets + 1), axis=1)
+        percentiles = 100 * (num_tweets - ranks + 1) / max(num_tweets, 1)
+        return {m: (ranks[i], percentiles[i]) for i, m in enumerate(names)}
+
+    def select(self, indices):
+        """Return a new batch of the Tweets at `indices` (e.g. from `top()`), in that order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        tweets = None if self._tweets is None else [self._tweets[i] for i in indices]
+        return TweetBatch(self.ids[indices], self.timestamps[indices], self.likes[indices],
+                          self.retweets[indices], self.account_index[indices], self.accounts,
+                          tweets)
+
+    def tweets(self, indices=None):
+        """Return a list of `get_tweets.Tweet` at `indices` (defaults to every Tweet), in order.
+
+        Each Tweet's rank is its position in the list (from 1); see also `ranks()`.
+
+        """
+        assert self._tweets is not None, "The batch wasn't created from Tweet objects."
+        if indices is None:
+            indices = range(len(self))
+        return [self._tweets[i] for i in indices]
+
+    def _column(self, metric):
+        metric = get_tweets.Account._check_metric(metric)
+        return getattr(self, metric)
+
+
+def _timestamp(time):
+    """Return a datetime's UTC epoch seconds (float), treating naive datetimes as UTC."""
+    return (time - (_EPOCH if time.tzinfo is None else _EPOCH_UTC)).total_seconds()
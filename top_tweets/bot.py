@@ -1,9 +1,17 @@
 import datetime
-import random
+import itertools
+import logging
 
 import tweepy
 
-from top_tweets import config, get_tweets, twitter_auth
+from top_tweets import (cache, candidates, get_tweets, leaderboard, ledger, outbox,
+                        response_cache, selection, singleflight, telemetry, twitter_auth,
+                        users)
+
+logger = logging.getLogger(__name__)
+
+# In-flight scans of the bot's timeline for Quote Tweets, shared by concurrent eligibility checks
+_QUOTE_SCANS = singleflight.Group("quote_scan")
 
 
 class Bot:
@@ -19,21 +27,54 @@ class Bot:
             - retweets
             - likes_retweets_combined
             Uses `likes_retweets_combined` by default.
+        ledger (ledger.ShareLedger or None): a persistent record of shared Tweets. If provided,
+            shares are recorded in (and "already shared" checks are made against) the ledger
+            rather than the bot's timeline. Defaults to None.
+        cache (cache.TweetCache or None): a local Tweet store shared by the source accounts, so
+            that only new Tweets are fetched on each share. Defaults to None.
+        resolver (users.UserResolver): resolves (and caches) the source accounts' users. A new
+            resolver is created by default.
+        candidates (candidates.CandidateQueue): each user's ranked, eligible Tweets, built ahead
+            of sharing by `prefetch()`.
+        selector (selection.AccountSelector): chooses the user `share_from_random_user()` shares
+            from, based on each user's recorded fetches and shares. A new (in-memory) selector is
+            created by default.
+
+    Args:
+        api (tweepy.API or None): the authenticated bot API, used for all requests (defaults to
+            `twitter_auth.get_api()`, which is created on first use).
+        candidate_max_age (int or float): the number of seconds prefetched candidates can be
+            shared for, after which shares fetch and rank Tweets again.
 
     """
-    def __init__(self, usernames=None, user_ids=None, metric="likes_retweets_combined"):
+    def __init__(self, usernames=None, user_ids=None, metric="likes_retweets_combined",
+                 ledger=None, cache=None, resolver=None, api=None, candidate_max_age=60 * 60,
+                 selector=None):
         assert usernames is None or user_ids is None, "Either `usernames` or `user_ids` must be " \
                                                       "None."
         self.usernames = usernames
         self.user_ids = user_ids
         self.metric = metric
+        self.ledger = ledger
+        self.cache = cache
+        self.resolver = resolver if resolver is not None else users.UserResolver(api=api)
+        self._api = api
+        self.candidates = candidates.CandidateQueue(max_age=candidate_max_age)
+        self.selector = selector if selector is not None else selection.AccountSelector()
+
+    @property
+    def api(self):
+        """The authenticated bot API."""
+        return self._api if self._api is not None else twitter_auth.get_api()
 
     def share_from_user(self, num_days, username=None, user_id=None, metric="default", quote=True,
                         extra_hashtags=None, max_chars=140):
         """Quote Tweet or Retweet a top Tweet by a specific user.
 
         The top ranked Tweet (based on `metric`) from the previous `num_days` that hasn't already
-        been shared will be Quote Tweeted (quote=True) or Retweeted (quote=False).
+        been shared will be Quote Tweeted (quote=True) or Retweeted (quote=False). If the user's
+        candidates have been prefetched (see `prefetch()`), the top candidate is shared without
+        fetching any Tweets.
 
         Args:
             num_days (int): the historic Tweet collection period in days, including the current day.
@@ -56,24 +97,25 @@ class Bot:
         if metric == "default":
             metric = self.metric
 
-        account = get_tweets.Account(username=username, user_id=user_id)
-        tweets = account.get_top_tweets_percent(num_days, metric, 100)
-        tweet = self._select_tweet(tweets, num_days)
-
+        tweet = self._get_top_tweet(num_days, metric, username=username, user_id=user_id)
+        content = None
         if quote:
             content = self._get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars)
-            self._quote_tweet(tweet, content)
-        else:
-            self._retweet(tweet)
+        self._publish(tweet, content)
 
     def share_from_random_user(self, num_days, usernames=None, user_ids=None, metric="default",
                                quote=True, extra_hashtags=None, max_chars=140):
-        """Quote Tweet or Retweet a top Tweet by a user randomly selected from a list.
+        """Quote Tweet or Retweet a top Tweet by a user selected from a list.
 
         The top ranked Tweet (based on `metric`) from the previous `num_days` that hasn't already
         been shared will be Quote Tweeted (quote=True) or Retweeted (quote=False). The list of users
-        to randomly choose from defaults to self.usernames or self.user_ids (whichever isn't None),
-        or another list of either `usernames` or `user_ids` can be provided.
+        to choose from defaults to self.usernames or self.user_ids (whichever isn't None), or
+        another list of either `usernames` or `user_ids` can be provided. Prefetched candidates
+        are used as per `share_from_user()`.
+
+        Users are tried in the order chosen by self.selector (randomly by default), skipping users
+        known to have nothing to share. If a user has no eligible Tweets, or their Tweets can't be
+        fetched, the next user is tried.
 
         Args:
             num_days (int): the historic Tweet collection period in days, including the current day.
@@ -92,33 +134,221 @@ class Bot:
             max_chars (int): the maximum number of Quote Tweet characters (potentially limits the
                 number of hashtags that will be included).
 
+        Raises:
+            ValueError: if no user has an eligible Tweet to share.
+
         """
         if metric == "default":
             metric = self.metric
 
-        if usernames is not None:
-            user = self._get_random_user(usernames)
-            account = get_tweets.Account(username=user)
-        elif user_ids is not None:
-            user = self._get_random_user(user_ids)
-            account = get_tweets.Account(user_id=user)
-        else:
-            # User list not provided, default list used instead
-            if self.usernames is not None:
-                user = self._get_random_user(self.usernames)
-                account = get_tweets.Account(username=user)
-            else:
-                user = self._get_random_user(self.user_ids)
-                account = get_tweets.Account(user_id=user)
+        tweet = self._get_top_tweet_any(num_days, metric, usernames, user_ids)
+        content = None
+        if quote:
+            content = self._get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars)
+        self._publish(tweet, content)
+
+    def share_from_leaderboard(self, num_days, usernames=None, user_ids=None, metric="default",
+                               per_account=None, normalise=False, quote=True, extra_hashtags=None,
+                               max_chars=140, max_workers=8, timeout=None, max_requests=None):
+        """Quote Tweet or Retweet a top Tweet across every user in a list.
+
+        The Tweets of every user are fetched concurrently and merged into a global leaderboard
+        (see `leaderboard.fetch_leaderboard()`). The top Tweet on the leaderboard that hasn't
+        already been shared will be Quote Tweeted (quote=True) or Retweeted (quote=False). The list
+        of users defaults to self.usernames or self.user_ids (whichever isn't None).
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            usernames (list of str or None): a list of Twitter user screen names/handles (without
+                "@"). `usernames` or `user_ids` (or both) must be None.
+            user_ids (list of str or None): a list of Twitter user unique identifiers. `usernames`
+                or `user_ids` (or both) must be None.
+            metric (str): the default metric to sort Tweets by, largest to smallest. One of:
+                - likes
+                - retweets
+                - likes_retweets_combined
+                Uses self.metric (`likes_retweets_combined` if not set during init) by default.
+            per_account (int or None): the maximum number of Tweets from any one user on the
+                leaderboard (e.g. 2), or None for no limit.
+            normalise (bool): whether Tweets are ranked by `metric` per 1,000 followers of their
+                user, rather than by `metric`.
+            quote (bool): whether the Tweet should be Quote Tweeted (True) or Retweeted (False).
+            extra_hashtags (list of str, or None): a list of hashtags (without '#') to include in
+                the Quote Tweet (if applicable) before any original Tweet hashtags.
+            max_chars (int): the maximum number of Quote Tweet characters (potentially limits the
+                number of hashtags that will be included).
+            max_workers (int): the maximum number of users fetched at once.
+            timeout (int or float or None): the maximum number of seconds to spend fetching
+                (defaults to None).
+            max_requests (int or None): the maximum number of timeline requests (pages) shared by
+                all users (defaults to None).
+
+        """
+        if metric == "default":
+            metric = self.metric
 
-        tweets = account.get_top_tweets_percent(num_days, metric, 100)
-        tweet = self._select_tweet(tweets, num_days)
+        accounts = self._get_accounts(usernames, user_ids)
+        tweets = leaderboard.fetch_leaderboard(accounts, num_days, metric, None, per_account,
+                                               normalise, max_workers=max_workers,
+                                               timeout=timeout, max_requests=max_requests)
+        tweet = self._select_tweet(tweets, num_days, self.ledger, self._api)
 
+        content = None
         if quote:
-            content = self._get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars)
-            self._quote_tweet(tweet, content)
-        else:
-            self._retweet(tweet)
+            content = self._get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars,
+                                              rank=tweets.index(tweet) + 1, by_user=False)
+        self._publish(tweet, content)
+
+    def plan_shares(self, num_days, num_shares, usernames=None, user_ids=None, metric="default",
+                    per_account=1, quote=True, extra_hashtags=None, max_chars=140,
+                    normalise=False, max_workers=8, timeout=None, max_requests=None):
+        """Plan several shares from the top Tweets of every user in a list, in one pass.
+
+        The Tweets of every user are fetched and ranked concurrently, and checked against previous
+        shares once. The top `num_shares` eligible Tweets across every user (as per
+        `share_from_leaderboard()`, with at most `per_account` from any one user, and each Tweet
+        planned once) are planned, most engaging first. Nothing is published: the plan can be
+        printed (see `outbox.format_plan()`) or added to an `outbox.ShareOutbox`, which publishes
+        each share at most once. The list of users defaults to self.usernames or self.user_ids
+        (whichever isn't None).
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            num_shares (int): the maximum number of shares to plan.
+            usernames (list of str or None): a list of Twitter user screen names/handles (without
+                "@"). `usernames` or `user_ids` (or both) must be None.
+            user_ids (list of str or None): a list of Twitter user unique identifiers. `usernames`
+                or `user_ids` (or both) must be None.
+            metric (str): the metric to rank Tweets by (see `share_from_user()`). Uses
+                self.metric by default.
+            per_account (int or None): the maximum number of shares of any one user's Tweets, or
+                None for no limit.
+            quote (bool): whether the Tweets should be Quote Tweeted (True) or Retweeted (False).
+            extra_hashtags (list of str, or None): a list of hashtags (without '#') to include in
+                each Quote Tweet (if applicable) before any original Tweet hashtags.
+            max_chars (int): the maximum number of Quote Tweet characters (potentially limits the
+                number of hashtags that will be included).
+            normalise (bool): whether Tweets are ranked by `metric` per 1,000 account followers.
+            max_workers (int): the maximum number of users fetched at once.
+            timeout (int or float or None): the maximum number of seconds to spend fetching
+                (defaults to None).
+            max_requests (int or None): the maximum number of timeline requests (pages) shared by
+                all users (defaults to None).
+
+        Returns:
+            list of outbox.PlannedShare: the planned shares, in the order they should be published.
+
+        """
+        if metric == "default":
+            metric = self.metric
+
+        accounts = self._get_accounts(usernames, user_ids)
+        results = get_tweets.fetch_top_tweets_many(accounts, num_days, metric, top_percent=100,
+                                                   max_workers=max_workers, timeout=timeout,
+                                                   max_requests=max_requests)
+        ranked = []
+        with telemetry.timer("stage_seconds", stage="eligibility"):
+            is_eligible = self._eligibility_check(num_days)
+            for result in results:
+                if result.ok:
+                    eligible = [t for t in result.tweets if is_eligible(t)]
+                    self.selector.record_fetch(result.account.user_id, len(result.tweets),
+                                               num_days, len(eligible))
+                    ranked.append(eligible)
+                else:
+                    self.selector.record_failure(result.account.user_id)
+                    logger.warning("Unable to fetch Tweets by '%s': %s", result.account,
+                                   result.error, extra={"account": result.account.username})
+
+        share_type = ledger.QUOTE if quote else ledger.RETWEET
+        planned_at = datetime.datetime.utcnow()
+        plan = []
+        planned_ids = set()
+        for tweet in leaderboard.merge(ranked, metric, per_account=per_account,
+                                       normalise=normalise):
+            if len(plan) == num_shares:
+                break
+            if tweet.id in planned_ids:
+                continue
+
+            planned_ids.add(tweet.id)
+            content = None
+            if quote:
+                content = self._get_quote_content(tweet, metric, num_days, extra_hashtags,
+                                                  max_chars)
+            plan.append(outbox.PlannedShare(outbox.share_key(tweet.id, share_type, planned_at),
+                                            tweet.id, share_type, tweet.account.username,
+                                            tweet.rank, content))
+
+        return plan
+
+    def prefetch(self, num_days, usernames=None, user_ids=None, metric="default",
+                 max_candidates=10, max_workers=8, timeout=None, max_requests=None):
+        """Build the share candidates of every user in a list, ahead of sharing.
+
+        The Tweets of every user are fetched and ranked concurrently, and checked against previous
+        shares (via a single scan of the ledger or bot timeline). The top eligible Tweets of each
+        successfully fetched user replace that user's `candidates`, which are used by
+        `share_from_user()` and `share_from_random_user()` (with the same `num_days` and `metric`)
+        until they're older than `candidates.max_age`, so sharing only requires the publish
+        request. Run regularly (e.g. as a daemon job; see `daemon.py`) to keep candidates fresh.
+        The list of users defaults to self.usernames or self.user_ids (whichever isn't None).
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            usernames (list of str or None): a list of Twitter user screen names/handles (without
+                "@"). `usernames` or `user_ids` (or both) must be None.
+            user_ids (list of str or None): a list of Twitter user unique identifiers. `usernames`
+                or `user_ids` (or both) must be None.
+            metric (str): the default metric to sort Tweets by, largest to smallest. One of:
+                - likes
+                - retweets
+                - likes_retweets_combined
+                Uses self.metric (`likes_retweets_combined` if not set during init) by default.
+            max_candidates (int or None): the maximum number of candidates kept per user.
+            max_workers (int): the maximum number of users fetched at once.
+            timeout (int or float or None): the maximum number of seconds to spend fetching
+                (defaults to None).
+            max_requests (int or None): the maximum number of timeline requests (pages) shared by
+                all users (defaults to None).
+
+        Returns:
+            list of get_tweets.FetchResult: one per resolved user.
+
+        """
+        if metric == "default":
+            metric = self.metric
+
+        accounts = self._get_accounts(usernames, user_ids)
+        results = get_tweets.fetch_top_tweets_many(accounts, num_days, metric, top_percent=100,
+                                                   max_workers=max_workers, timeout=timeout,
+                                                   max_requests=max_requests)
+        with telemetry.timer("stage_seconds", stage="eligibility"):
+            is_eligible = self._eligibility_check(num_days)
+            for result in results:
+                if result.ok:
+                    eligible = [t for t in result.tweets if is_eligible(t)]
+                    self.candidates.put(result.account.user_id, num_days, metric,
+                                        eligible[:max_candidates])
+                    self.selector.record_fetch(result.account.user_id, len(result.tweets),
+                                               num_days, len(eligible))
+
+        for result in results:
+            if not result.ok:
+                self.selector.record_failure(result.account.user_id)
+                logger.warning("Unable to prefetch Tweets by '%s': %s", result.account,
+                               result.error, extra={"account": result.account.username})
+
+        return results
+
+    def resolve_users(self):
+        """Resolve (and cache) the default list of users in bulk.
+
+        Requires one API request per 100 users, after which each share from a default user
+        doesn't require a user lookup (until the resolver's cache expires).
+
+        """
+        self.resolver.resolve(usernames=self.usernames, user_ids=self.user_ids)
 
     @staticmethod
     def previously_retweeted(tweet):
@@ -131,66 +361,144 @@ class Bot:
         return tweet.retweeted
 
     @staticmethod
-    def previously_quoted(tweet, num_days):
+    def previously_quoted(tweet, num_days, quoted_ids=None, api=None):
         """Return whether (True/False) the tweet has been Quote Tweeted in the previous `num_days`.
 
         Args:
             tweet(get_tweets.Tweet): the Tweet object representing the Tweet.
             num_days (int): the historic assessment period (i.e. whether the Tweet was Quote
                 Tweeted) in days, including the current day.
+            quoted_ids (set of str or None): a quoted status index previously returned by
+                `quoted_tweet_ids()` for the same `num_days`, or None to build a new index (which
+                requires fetching the bot's timeline).
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
+
+        """
+        if quoted_ids is None:
+            quoted_ids = Bot.quoted_tweet_ids(num_days, api)
+
+        return tweet.id in quoted_ids
+
+    @staticmethod
+    def quoted_tweet_ids(num_days, api=None):
+        """Return the set of Tweet IDs (str) Quote Tweeted by the bot in the previous `num_days`.
+
+        The bot's timeline is paged once, so the returned set can be used to check any number of
+        Tweets (see `previously_quoted()`) without further API requests. Concurrent calls (e.g.
+        from several threads) share a single scan of the bot's timeline (see
+        `singleflight.py`) if it covers their `num_days`.
+
+        Args:
+            num_days (int): the historic assessment period (i.e. whether a Tweet was Quote
+                Tweeted) in days, including the current day.
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
 
         """
+        if api is None:
+            api = twitter_auth.get_api()
+
         cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
-        # Cursor object handles pagination and returns a list of Tweepy Status
-        for t in tweepy.Cursor(twitter_auth.API.user_timeline,
-                               include_rts=False,
-                               exclude_replies=True,
-                               tweet_mode="extended").items():
+
+        def start(cut_off):
+            return singleflight.Once(lambda: Bot._scan_quotes(cut_off, api))
+
+        with _QUOTE_SCANS.join(id(api), cut_off, start) as scan:
+            return {tweet_id for tweet_id, publish_time in scan() if publish_time >= cut_off}
+
+    @staticmethod
+    def _scan_quotes(cut_off, api):
+        """Return a list of (quoted Tweet ID, publish time) of the bot's Quote Tweets published
+        since `cut_off`."""
+        quotes = []
+        # The API only returns Tweets published since the cut-off
+        pages = get_tweets.timeline_pages(api.user_timeline, get_tweets.cut_off_since_id(cut_off),
+                                          include_rts=False, exclude_replies=True,
+                                          tweet_mode="extended")
+        for t in itertools.chain.from_iterable(pages):
             bot_tweet = get_tweets.Tweet(t, None)
-            if bot_tweet.published_before(cut_off):
+            if bot_tweet.publish_time < cut_off:
                 break
 
-            if bot_tweet.quoted_tweet_id == tweet.id:
-                return True
+            if bot_tweet.quoted_tweet_id is not None:
+                quotes.append((bot_tweet.quoted_tweet_id, bot_tweet.publish_time))
 
-        return False
+        return quotes
 
     @staticmethod
-    def _select_tweet(tweets, num_days):
+    def _select_tweet(tweets, num_days, share_ledger=None, api=None):
         """Return the top unshared (see notes) Tweet from a list of ranked Tweets.
 
         Specifically, a Tweet will be returned if it has never been Retweeted and if it hasn't been
-        Quote Tweeted in the previous `num_days`.
+        Quote Tweeted in the previous `num_days`. The bot's timeline is fetched at most once, and
+        only if a candidate hasn't been Retweeted.
 
         Args:
             tweets (list of get_tweets.Tweet): a list of Tweet objects in order of rank.
             num_days (int): the historic assessment period (i.e. whether the Tweet was Quote
                 Tweeted) in days, including the current day.
+            share_ledger (ledger.ShareLedger or None): if provided, previous shares are looked up
+                in the ledger instead of the bot's timeline.
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
         """
-        for t in tweets:
-            if (not Bot.previously_retweeted(t)) and (not Bot.previously_quoted(t, num_days)):
-                return t
+        with telemetry.timer("stage_seconds", stage="eligibility"):
+            quoted_ids = None
+            for t in tweets:
+                if Bot.previously_retweeted(t):
+                    continue
+
+                if share_ledger is not None and share_ledger.has_retweeted(t.id):
+                    continue
 
-        raise ValueError("No eligible Tweets to share; all Tweets have either been Retweeted "
-                         "previously or Quote Tweeted in the previous `num_days`.")
+                if quoted_ids is None:
+                    if share_ledger is not None:
+                        cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+                        quoted_ids = share_ledger.quoted_tweet_ids(cut_off)
+                    else:
+                        quoted_ids = Bot.quoted_tweet_ids(num_days, api)
+
+                if not Bot.previously_quoted(t, num_days, quoted_ids):
+                    return t
+
+            raise ValueError("No eligible Tweets to share; all Tweets have either been Retweeted "
+                             "previously or Quote Tweeted in the previous `num_days`.")
 
     @staticmethod
-    def _retweet(tweet):
-        """Retweet the Tweet."""
+    def _retweet(tweet, share_ledger=None, api=None):
+        """Retweet the Tweet, recording the share in `share_ledger` (if provided)."""
+        if api is None:
+            api = twitter_auth.get_api()
+
         url = "https://twitter.com/{}/status/{}".format(tweet.account.username, tweet.id)
-        print("Retweeting Tweet (rank {}): {}".format(tweet.rank, url))
-        twitter_auth.API.retweet(tweet.id)
+        logger.info("Retweeting Tweet (rank %s): %s", tweet.rank, url,
+                    extra={"tweet_id": tweet.id, "account": tweet.account.username})
+        with telemetry.timer("stage_seconds", stage="publish"):
+            status = api.retweet(tweet.id)
+        if share_ledger is not None:
+            share_ledger.record(tweet.id, ledger.RETWEET, share_id=status.id_str,
+                                username=tweet.account.username)
 
     @staticmethod
-    def _quote_tweet(tweet, content):
-        """Quote Tweet (embed) the Tweet with the provided content."""
+    def _quote_tweet(tweet, content, share_ledger=None, api=None):
+        """Quote Tweet (embed) the Tweet with the provided content, recording the share in
+        `share_ledger` (if provided)."""
+        if api is None:
+            api = twitter_auth.get_api()
+
         embed_url = "https://twitter.com/{}/status/{}".format(tweet.account.username, tweet.id)
-        print("Publishing Quote Tweet...")
-        print(content + " " + embed_url)
-        twitter_auth.API.update_status(content, attachment_url=embed_url)
+        logger.info("Publishing Quote Tweet...\n%s %s", content, embed_url,
+                    extra={"tweet_id": tweet.id, "account": tweet.account.username})
+        with telemetry.timer("stage_seconds", stage="publish"):
+            status = api.update_status(content, attachment_url=embed_url)
+        if share_ledger is not None:
+            share_ledger.record(tweet.id, ledger.QUOTE, share_id=status.id_str,
+                                username=tweet.account.username)
 
     @staticmethod
-    def _get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars):
+    def _get_quote_content(tweet, metric, num_days, extra_hashtags, max_chars, rank=None,
+                           by_user=True):
         """Return the Quote Tweet content (str).
 
         Args:
@@ -205,8 +513,14 @@ class Bot:
                 the Quote Tweet (if applicable) before any original Tweet hashtags.
             max_chars (int): the maximum number of Quote Tweet characters (potentially limits the
                 number of hashtags that will be included).
+            rank (int or None): the Tweet's rank (defaults to `tweet.rank`).
+            by_user (bool): whether the Tweet is ranked among the user's Tweets (True), or among
+                the Tweets of several users, e.g. on a leaderboard (False).
 
         """
+        if rank is None:
+            rank = tweet.rank
+
         if metric == "likes":
             metric_str = "liked"
         elif metric == "retweets":
@@ -214,10 +528,14 @@ class Bot:
         else:
             metric_str = "liked & retweeted"
 
-        content = "Number {} most {} Tweet by @{} in the previous {} days (incl. today)." \
-                  "".format(tweet.rank, metric_str, tweet.account.username, num_days)
+        if by_user:
+            content = "Number {} most {} Tweet by @{} in the previous {} days (incl. today)." \
+                      "".format(rank, metric_str, tweet.account.username, num_days)
+        else:
+            content = "Number {} most {} Tweet in the previous {} days (incl. today), by @{}." \
+                      "".format(rank, metric_str, num_days, tweet.account.username)
 
-        hashtags = [h["text"] for h in tweet.hashtags]
+        hashtags = list(tweet.hashtags)
         if extra_hashtags is not None:
             hashtags = extra_hashtags + hashtags
 
@@ -229,17 +547,164 @@ class Bot:
 
         return content
 
-    @staticmethod
-    def _get_random_user(user_list):
-        """Return a randomly selected item from a list of usernames or user IDs."""
-        assert len(user_list) > 0, "No items in the user list; unable to select a random user."
-        return random.choice(user_list)
+    def _get_top_tweet(self, num_days, metric, username=None, user_id=None):
+        """Return a user's top unshared Tweet: their top prefetched candidate (if any, and still
+        eligible), otherwise the top of their fetched Tweets that's eligible as per
+        `_select_tweet()`, recording the fetch in self.selector."""
+        user = self.resolver.get(username=username, user_id=user_id)
+        tweet = self.candidates.pop(user.id_str, num_days, metric, self._revalidation(num_days))
+        if tweet is not None:
+            return tweet
+
+        tweets = self._get_top_tweets(num_days, metric, username=username, user_id=user_id)
+        with telemetry.timer("stage_seconds", stage="eligibility"):
+            is_eligible = self._eligibility_check(num_days)
+            eligible = [t for t in tweets if is_eligible(t)]
+        self.selector.record_fetch(user.id_str, len(tweets), num_days, len(eligible))
+        if not eligible:
+            raise ValueError("No eligible Tweets to share; all Tweets have either been Retweeted "
+                             "previously or Quote Tweeted in the previous `num_days`.")
+        return eligible[0]
+
+    def _get_top_tweets(self, num_days, metric, username=None, user_id=None):
+        """Return a user's Tweets ranked by `metric`."""
+        account = get_tweets.Account(username=username, user_id=user_id, cache=self.cache,
+                                     resolver=self.resolver, api=self._api)
+        return account.get_top_tweets_percent(num_days, metric, 100)
+
+    def _eligibility_check(self, num_days):
+        """Return a function returning whether (True/False) a Tweet is eligible to share (as per
+        `_select_tweet()`), for which previous shares are looked up once."""
+        if self.ledger is not None:
+            cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+            retweeted_ids = self.ledger.retweeted_tweet_ids()
+            quoted_ids = self.ledger.quoted_tweet_ids(cut_off)
+        else:
+            retweeted_ids = set()
+            quoted_ids = Bot.quoted_tweet_ids(num_days, self._api)
+
+        def is_eligible(tweet):
+            return not (Bot.previously_retweeted(tweet) or tweet.id in retweeted_ids
+                        or tweet.id in quoted_ids)
+
+        return is_eligible
+
+    def _revalidation(self, num_days):
+        """Return a function re-checking whether a candidate has been shared since the candidates
+        were built (e.g. by another process), via the ledger if there is one, otherwise via the
+        Tweet's current `retweeted` flag and the bot's timeline (scanned at most once)."""
+        cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+        if self.ledger is not None:
+            def is_eligible(tweet):
+                return not (self.ledger.has_retweeted(tweet.id)
+                            or self.ledger.has_quoted(tweet.id, cut_off))
+
+            return is_eligible
+
+        quoted_ids = []
+
+        def is_eligible(tweet):
+            try:
+                status = self.api.get_status(tweet.id, tweet_mode="extended")
+            except tweepy.RateLimitError:
+                raise
+            except tweepy.TweepError as e:
+                logger.info("Discarding candidate %s: %s", tweet.id, e,
+                            extra={"tweet_id": tweet.id})
+                return False
+            if status.retweeted:
+                return False
+            if not quoted_ids:
+                quoted_ids.append(Bot.quoted_tweet_ids(num_days, self._api))
+            return tweet.id not in quoted_ids[0]
+
+        return is_eligible
+
+    def _publish(self, tweet, content=None):
+        """Quote Tweet the Tweet with `content` (or Retweet it, if None), remove it from the
+        candidates, and record the share in self.selector."""
+        if content is not None:
+            self._quote_tweet(tweet, content, self.ledger, self._api)
+        else:
+            self._retweet(tweet, self.ledger, self._api)
+        self.candidates.discard(tweet.id)
+        self.selector.record_share(tweet.account.user_id)
+
+    def _get_accounts(self, usernames, user_ids):
+        """Return a list of get_tweets.Account for a list of users (resolved in bulk), defaulting
+        to the Bot's user list. Users that can't be resolved are excluded."""
+        usernames, user_ids = self._get_user_list(usernames, user_ids)
+        resolved = self.resolver.resolve(usernames=usernames, user_ids=user_ids)
+        return [get_tweets.Account(user_id=u.id_str, cache=self.cache, resolver=self.resolver,
+                                   api=self._api)
+                for u in resolved if u is not None]
+
+    def _get_user_list(self, usernames, user_ids):
+        """Return a tuple of (`usernames`, `user_ids`), defaulting to the Bot's user list."""
+        if usernames is None and user_ids is None:
+            # User list not provided, default list used instead
+            return self.usernames, self.user_ids
+
+        return usernames, user_ids
+
+    def _get_top_tweet_any(self, num_days, metric, usernames, user_ids):
+        """Return the top unshared Tweet (as per `_get_top_tweet()`) of the first user (in the
+        order chosen by self.selector) to have one, defaulting to the Bot's user list."""
+        usernames, user_ids = self._get_user_list(usernames, user_ids)
+        user_list = usernames if usernames is not None else user_ids
+        assert len(user_list) > 0, "No items in the user list; unable to select a user."
+
+        try:
+            resolved = self.resolver.resolve(usernames=usernames, user_ids=user_ids)
+        except tweepy.RateLimitError:
+            raise
+        except tweepy.TweepError as e:
+            # e.g. none of a batch of users could be resolved
+            logger.warning("Unable to resolve users: %s", e)
+            resolved = []
+
+        for user_id in self.selector.order([u.id_str for u in resolved if u is not None]):
+            try:
+                return self._get_top_tweet(num_days, metric, user_id=user_id)
+            except tweepy.RateLimitError:
+                raise
+            except tweepy.TweepError as e:
+                self.selector.record_failure(user_id)
+                logger.warning("Unable to fetch Tweets by user %s: %s", user_id, e,
+                               extra={"user_id": user_id})
+            except get_tweets.NoTweetsError as e:
+                self.selector.record_fetch(user_id, 0, num_days, 0)
+                logger.info("Nothing to share from user %s: %s", user_id, e,
+                            extra={"user_id": user_id})
+            except ValueError as e:
+                logger.info("Nothing to share from user %s: %s", user_id, e,
+                            extra={"user_id": user_id})
+
+        raise ValueError("No eligible Tweets to share; every user's Tweets have either been shared "
+                         "already or couldn't be fetched.")
 
 
 def main():
-    """Quote Tweet a top Tweet from a random user in `SOURCE_USERNAMES`."""
-    bot = Bot(usernames=config.SOURCE_USERNAMES)
-    bot.share_from_random_user(7, extra_hashtags=config.HASHTAGS)
+    """Quote Tweet a top Tweet from a user in `SOURCE_USERNAMES`."""
+    from top_tweets import config
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    twitter_auth.set_api(response_cache.ResponseCache(
+        twitter_auth.get_api(), path=getattr(config, "RESPONSE_CACHE_PATH", None)))
+    ledger_path = getattr(config, "SHARE_LEDGER_PATH", None)
+    share_ledger = ledger.ShareLedger(ledger_path) if ledger_path is not None else None
+    cache_dir = getattr(config, "TWEET_CACHE_DIR", None)
+    tweet_cache = cache.TweetCache(cache_dir) if cache_dir is not None else None
+    stats_path = getattr(config, "ACCOUNT_STATS_PATH", None)
+    selector = selection.AccountSelector(stats_path) if stats_path is not None else None
+    bot = Bot(usernames=config.SOURCE_USERNAMES, ledger=share_ledger, cache=tweet_cache,
+              selector=selector)
+    try:
+        bot.share_from_random_user(7, extra_hashtags=config.HASHTAGS)
+    finally:
+        metrics_path = getattr(config, "METRICS_TEXTFILE", None)
+        if metrics_path is not None:
+            telemetry.write_textfile(metrics_path)
 
 
 if __name__ == "__main__":
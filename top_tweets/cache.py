@@ -0,0 +1,255 @@
+import collections
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+import tweepy
+
+from top_tweets import get_tweets, telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class TweetCache:
+    """A local per-account store of fetched Tweets, used to fetch only new Tweets on each run.
+
+    For each account, the cache holds the Tweepy Status objects published since `covered_since`
+    (newest first), i.e. every Tweet (excluding Retweets and replies) the account has published
+    since that time. When a query is covered by the cache, only Tweets newer than the newest cached
+    Tweet are requested (via `since_id`); otherwise the timeline is paged back to the query's
+    cut-off as usual. Tweets older than the largest `num_days` requested for an account are evicted.
+
+    Cached engagement metrics (Likes/Retweets) are as they were when each Tweet was fetched (or
+    last refreshed), so once they're `refresh_interval` seconds old, the cached Tweets are
+    refreshed (see `refresh()`) before they're next returned.
+
+    Concurrent updates of the same account's Tweets (e.g. by `get_tweets.fetch_top_tweets_many()`)
+    are made one at a time, so a later update only fetches the Tweets published since the former.
+
+    Attributes:
+        directory (str or None): the directory used to persist the cache between runs (one JSON
+            file per account), or None to keep the cache in memory only.
+        refresh_interval (int or float or None): the number of seconds after which an account's
+            cached Tweets are refreshed when they're next returned, or None to only refresh them
+            via `refresh()`.
+
+    Args:
+        clock (callable): returns the current (epoch) time.
+
+    """
+    def __init__(self, directory=None, refresh_interval=15 * 60, clock=time.time):
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._account_locks = collections.defaultdict(threading.Lock)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def statuses(self, account, num_days, max_tweets=None, budget=None):
+        """Return a list of the account's Tweepy Status objects (newest first), updating the cache.
+
+        The returned list includes (at least) every Status published in the previous `num_days`,
+        or the `max_tweets` most recent Tweets (excluding Quote Tweets) if fewer. Cached Tweets
+        last refreshed (or fetched) at least `refresh_interval` seconds ago are refreshed first.
+
+        Args:
+            account (get_tweets.Account): the account to return Tweets for.
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            max_tweets (int or None): the maximum number of Tweets (excluding Quote Tweets)
+                required from the previous `num_days` (defaults to None).
+            budget (get_tweets.RequestBudget or None): a request budget to acquire before each
+                page is requested, or None.
+
+        """
+        today = datetime.date.today()
+        cut_off = get_tweets.Account.cut_off_time(today, num_days)
+        with self._account_lock(account.user_id):
+            with self._lock:
+                entry = self._load(account.user_id)
+
+            if entry is not None and self._covers(entry, cut_off, max_tweets):
+                telemetry.inc("cache_requests_total", cache="tweets", result="hit")
+                if (self.refresh_interval is not None
+                        and self._clock() - entry["refreshed_at"] >= self.refresh_interval):
+                    self._refresh(account, entry, entry["statuses"], budget=budget)
+                since_id = entry["statuses"][0].id_str if entry["statuses"] else None
+                logger.info("Fetching Tweets by '%s' since ID %s...", account, since_id,
+                            extra={"account": str(account), "since_id": since_id})
+                new_statuses, _ = self._fetch(account, cut_off, None, budget, since_id)
+                cached_ids = {s.id_str for s in entry["statuses"]}
+                entry["statuses"] = ([s for s in new_statuses if s.id_str not in cached_ids]
+                                     + entry["statuses"])
+                entry["max_days"] = max(entry["max_days"], num_days)
+            else:
+                telemetry.inc("cache_requests_total", cache="tweets", result="miss")
+                statuses, complete = self._fetch(account, cut_off, max_tweets, budget)
+                if complete or not statuses:
+                    covered_since = cut_off
+                else:
+                    covered_since = statuses[-1].created_at
+                max_days = num_days if entry is None else max(entry["max_days"], num_days)
+                entry = {"covered_since": covered_since, "max_days": max_days,
+                         "refreshed_at": self._clock(), "statuses": statuses}
+
+            self._evict(entry, get_tweets.Account.cut_off_time(today, entry["max_days"]))
+            with self._lock:
+                self._entries[account.user_id] = entry
+                self._save(account.user_id, entry)
+
+            return list(entry["statuses"])
+
+    def refresh(self, account, num_days=None, max_workers=4, budget=None):
+        """Update the engagement metrics of an account's cached Tweets, removing deleted Tweets.
+
+        The cached Tweets are looked up in bulk (see `get_tweets.lookup_statuses()`), 100 per
+        request, rather than paging through the account's timeline again.
+
+        Args:
+            account (get_tweets.Account): the account whose cached Tweets are refreshed.
+            num_days (int or None): if provided, only Tweets from the previous `num_days` are
+                refreshed.
+            max_workers (int): the maximum number of requests made at once.
+            budget (get_tweets.RequestBudget or None): a request budget to acquire before each
+                request, or None.
+
+        Returns:
+            int: the number of deleted (or otherwise unavailable) Tweets removed from the cache.
+
+        """
+        with self._account_lock(account.user_id):
+            with self._lock:
+                entry = self._load(account.user_id)
+            if entry is None:
+                return 0
+
+            statuses = entry["statuses"]
+            if num_days is not None:
+                cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+                statuses = [s for s in statuses if not _before(s.created_at, cut_off)]
+            num_deleted = self._refresh(account, entry, statuses, max_workers, budget)
+            with self._lock:
+                self._entries[account.user_id] = entry
+                self._save(account.user_id, entry)
+
+            return num_deleted
+
+    def _refresh(self, account, entry, statuses, max_workers=4, budget=None):
+        """Replace `statuses` (from the cache entry) with their current Status, removing deleted
+        Tweets, and return the number removed."""
+        current = get_tweets.lookup_statuses((s.id_str for s in statuses), account.api,
+                                             max_workers, budget)
+        refreshed = [current.get(s.id_str, s) for s in entry["statuses"]]
+        entry["statuses"] = [s for s in refreshed if s is not None]
+        # Only a refresh of every cached Tweet restarts the refresh interval
+        if len(statuses) == len(refreshed):
+            entry["refreshed_at"] = self._clock()
+        return len(refreshed) - len(entry["statuses"])
+
+    def clear(self, user_id=None):
+        """Remove the cached Tweets for `user_id`, or for all accounts if None."""
+        with self._lock:
+            user_ids = list(self._entries) if user_id is None else [user_id]
+            for u in user_ids:
+                self._entries.pop(u, None)
+                if self.directory is not None and os.path.exists(self._path(u)):
+                    os.remove(self._path(u))
+
+    def _account_lock(self, user_id):
+        """Return the lock (threading.Lock) serialising updates of an account's Tweets."""
+        with self._lock:
+            return self._account_locks[user_id]
+
+    @staticmethod
+    def _covers(entry, cut_off, max_tweets):
+        """Return whether (True/False) the cache entry contains every Tweet a query requires."""
+        if not _before(cut_off, entry["covered_since"]):
+            return True
+
+        if max_tweets is None:
+            return False
+
+        num_tweets = sum(1 for s in entry["statuses"] if not s.is_quote_status)
+        return num_tweets >= max_tweets
+
+    @staticmethod
+    def _fetch(account, cut_off, max_tweets, budget=None, since_id=None):
+        """Return a tuple of (list of Tweepy Status, bool) fetched from the account's timeline.
+
+        The bool represents whether every Status since `cut_off` was fetched (i.e. the fetch wasn't
+        stopped by `max_tweets`).
+
+        """
+        if since_id is None:
+            since_id = get_tweets.cut_off_since_id(cut_off)
+
+        statuses = []
+        num_tweets = 0
+        for status in account._timeline(since_id, budget):
+            if get_tweets.utc_naive(status.created_at) < cut_off:
+                return statuses, True
+            elif num_tweets == max_tweets:
+                return statuses, False
+
+            statuses.append(status)
+            if not status.is_quote_status:
+                num_tweets += 1
+
+        return statuses, True
+
+    @staticmethod
+    def _evict(entry, cut_off):
+        """Remove Tweets published before `cut_off` from the cache entry."""
+        entry["statuses"] = [s for s in entry["statuses"] if not _before(s.created_at, cut_off)]
+        if _before(entry["covered_since"], cut_off):
+            entry["covered_since"] = cut_off
+
+    def _load(self, user_id):
+        if user_id in self._entries:
+            return self._entries[user_id]
+
+        if self.directory is None or not os.path.exists(self._path(user_id)):
+            return None
+
+        with open(self._path(user_id)) as f:
+            data = json.load(f)
+
+        entry = {
+            "covered_since": datetime.datetime.fromisoformat(data["covered_since"]),
+            "max_days": data["max_days"],
+            # Caches saved before refreshes were recorded are refreshed on their next use
+            "refreshed_at": data.get("refreshed_at", 0),
+            "statuses": [tweepy.models.Status.parse(None, s) for s in data["statuses"]],
+        }
+        self._entries[user_id] = entry
+        return entry
+
+    def _save(self, user_id, entry):
+        if self.directory is None:
+            return
+
+        data = {
+            "covered_since": entry["covered_since"].isoformat(),
+            "max_days": entry["max_days"],
+            "refreshed_at": entry["refreshed_at"],
+            "statuses": [s._json for s in entry["statuses"]],
+        }
+        tmp_path = self._path(user_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path(user_id))
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, "{}.json".format(user_id))
+
+
+def _before(time, other):
+    """Return whether (True/False) `time` is before `other`, allowing naive (UTC) datetimes."""
+    if (time.tzinfo is None) != (other.tzinfo is None):
+        time, other = [t.replace(tzinfo=datetime.timezone.utc) if t.tzinfo is None else t
+                       for t in (time, other)]
+    return time < other
@@ -0,0 +1,101 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CandidateQueue:
+    """Ranked, eligibility-checked Tweets per user, prepared ahead of sharing.
+
+    A prefetch stage (see `bot.Bot.prefetch()`) replaces each user's candidates, highest ranked
+    first, and a publish stage pops the top candidate, so that sharing only requires the publish
+    request. A user's candidates are discarded once they're older than `max_age` (their ranks and
+    eligibility may have changed), and the popped candidate is re-validated before it's returned.
+
+    Attributes:
+        max_age (int or float): the number of seconds a user's candidates can be used for.
+
+    Args:
+        clock (callable): returns the current (epoch) time.
+
+    """
+    _Entry = collections.namedtuple("_Entry", "num_days metric built_at tweets")
+
+    def __init__(self, max_age=60 * 60, clock=time.time):
+        self.max_age = max_age
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """The number of candidates (of every user)."""
+        with self._lock:
+            return sum(len(e.tweets) for e in self._entries.values())
+
+    def put(self, user_id, num_days, metric, tweets):
+        """Replace a user's candidates with a list of Tweets, highest ranked first.
+
+        Args:
+            user_id (str): the user's unique identifier.
+            num_days (int): the historic Tweet collection period the Tweets were ranked over.
+            metric (str): the metric the Tweets were ranked by.
+            tweets (list of get_tweets.Tweet): the eligible Tweets, highest ranked first.
+
+        """
+        entry = self._Entry(num_days, metric, self._clock(), collections.deque(tweets))
+        with self._lock:
+            self._entries[user_id] = entry
+
+    def pop(self, user_id, num_days, metric, is_eligible=None):
+        """Remove and return a user's top candidate, or None if there isn't a usable candidate.
+
+        Candidates are only returned for the same `num_days` and `metric` they were ranked by, and
+        if they aren't stale. Candidates that fail re-validation are discarded.
+
+        Args:
+            user_id (str): the user's unique identifier.
+            num_days (int): the historic Tweet collection period of the share.
+            metric (str): the metric of the share.
+            is_eligible (callable or None): returns whether (True/False) a candidate can still
+                be shared (e.g. per the share ledger), or None to skip re-validation.
+
+        Returns:
+            get_tweets.Tweet or None: the top eligible candidate.
+
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or (entry.num_days, entry.metric) != (num_days, metric):
+                return None
+            if self._clock() - entry.built_at > self.max_age:
+                logger.info("Discarding stale candidates of user %s...", user_id,
+                            extra={"user_id": user_id})
+                del self._entries[user_id]
+                return None
+
+            while entry.tweets:
+                tweet = entry.tweets.popleft()
+                if is_eligible is None or is_eligible(tweet):
+                    return tweet
+
+            return None
+
+    def discard(self, tweet_id):
+        """Remove a Tweet (e.g. once shared) from every user's candidates."""
+        with self._lock:
+            for entry in self._entries.values():
+                for tweet in [t for t in entry.tweets if t.id == tweet_id]:
+                    entry.tweets.remove(tweet)
+
+    def age(self, user_id):
+        """Return the age (seconds) of a user's candidates, or None if there aren't any."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return None if entry is None else self._clock() - entry.built_at
+
+    def clear(self):
+        """Remove every user's candidates."""
+        with self._lock:
+            self._entries.clear()
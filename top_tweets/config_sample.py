@@ -14,3 +14,57 @@ SOURCE_USERNAMES = [
 # List of str, or None: a list of hashtags (without '#') to include in
 # the Quote Tweet (if applicable) before any original Tweet hashtags.
 HASHTAGS = ["hashtag"]
+
+# str or None: the SQLite file used to record shared Tweets (see `ledger.py`), or None to
+# check previous shares via the bot's timeline instead.
+SHARE_LEDGER_PATH = "shares.sqlite3"
+
+# str or None: the SQLite file used to keep each source account's fetch and share statistics
+# between runs (see `selection.py`), so accounts with nothing to share are skipped, or None to
+# keep statistics in memory for a single run only.
+ACCOUNT_STATS_PATH = "account_stats.sqlite3"
+
+# str: the SQLite file of shares planned by `python -m top_tweets.outbox plan`, published by
+# `python -m top_tweets.outbox drain` (see `outbox.py`).
+SHARE_OUTBOX_PATH = "outbox.sqlite3"
+
+# list of dict or None: the credentials (`consumer_key`, `consumer_secret`, `access_token`, and
+# `access_token_secret`) of each fetch worker (see `workers.py`), cycled if there are more workers
+# than credentials, so each worker has its own rate limits, or None to use the credentials above.
+WORKER_CREDENTIALS = None
+
+# str or None: the directory used to cache fetched Tweets between runs (see `cache.py`), so only
+# new Tweets are fetched (cached Tweets' Likes and Retweets are looked up in bulk once they're 15
+# minutes old), or None to fetch every Tweet in the collection period on each run.
+TWEET_CACHE_DIR = None
+
+# str or None: the SQLite file used to cache API responses (e.g. users and timeline pages) between
+# runs (see `response_cache.py`), or None to cache responses in memory for a single run only.
+RESPONSE_CACHE_PATH = "responses.sqlite3"
+
+# str: the directory `python -m top_tweets.archive` archives the Tweets of `SOURCE_USERNAMES` to
+# (see `archive.py`), for ranking Tweets over long periods without the API.
+TWEET_ARCHIVE_DIR = "tweet_archive"
+
+# List of dict, or None: the share jobs run by `python -m top_tweets.daemon` (see `daemon.py`).
+# Each job runs every `interval` seconds or on a `cron` schedule (local time), calling a `Bot`
+# share `method` (defaults to "share_from_random_user") with `num_days` (defaults to 7) and any
+# other keyword arguments. None runs `daemon.DEFAULT_JOBS`. A "prefetch" job builds each user's
+# share candidates ahead of the share jobs (see `Bot.prefetch()`), so shares are published
+# without fetching any Tweets.
+SHARE_JOBS = [
+    {"interval": 30 * 60, "method": "prefetch", "num_days": 7, "run_immediately": True},
+    {"cron": "0 9,17 * * *", "num_days": 7},
+    {"cron": "0 12 * * 5", "method": "share_from_leaderboard", "num_days": 7, "per_account": 1},
+    ]
+
+# bool: whether progress is logged as JSON objects (one per line) rather than plain messages.
+LOG_JSON = False
+
+# int or None: the port `python -m top_tweets.daemon` serves metrics on (in the Prometheus text
+# format; see `telemetry.py`), or None to not serve metrics.
+METRICS_PORT = None
+
+# str or None: the file `bot.py` writes metrics to after each run (e.g. for the Prometheus node
+# exporter's textfile collector), or None to not write metrics.
+METRICS_TEXTFILE = None
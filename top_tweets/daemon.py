@@ -0,0 +1,284 @@
+"""Run the bot as a long-running process, sharing Tweets on a schedule.
+
+Unlike running `bot.main()` from cron, the API object, resolved users, and share history (and
+cached Tweets, if `TWEET_CACHE_DIR` is set) are kept in memory between shares, so each share
+doesn't need to resolve users or page through the bot's timeline again.
+
+Usage: python -m top_tweets.daemon
+
+Jobs are configured via `SHARE_JOBS` in `config.py` (see `config_sample.py`).
+"""
+import datetime
+import logging
+import signal
+import threading
+import time
+
+from top_tweets import bot, cache, ledger, response_cache, selection, telemetry, twitter_auth
+
+logger = logging.getLogger(__name__)
+
+# Used if `SHARE_JOBS` isn't configured: the daemon's own default of one share every 6 hours
+DEFAULT_JOBS = [{"interval": 6 * 60 * 60, "method": "share_from_random_user", "num_days": 7}]
+
+
+class CronSchedule:
+    """A cron expression, e.g. "0 9 * * 1-5" (at 09:00 every weekday), in local time.
+
+    Fields are minute, hour, day of month, month, and day of week (0-6 from Sunday; 7 is also
+    Sunday). Each field can be "*", a number, a range ("1-5"), a step ("*/15" or "0-30/10"), or a
+    comma separated list of these. As per cron, if both the day of month and day of week are
+    restricted, either can match.
+
+    Attributes:
+        expression (str): the cron expression.
+
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Invalid cron expression '{}'; expected 5 fields.".format(expression))
+
+        values = [self._parse_field(f, *r) for f, r in zip(fields, self.RANGES)]
+        self._minutes, self._hours, self._days, self._months, weekdays = values
+        self._weekdays = {d % 7 for d in weekdays}
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+
+    def next_time(self, after):
+        """Return the first matching time (datetime.datetime) after the datetime `after`."""
+        time = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = time + datetime.timedelta(days=366 * 5)
+        while time < limit:
+            if time.month not in self._months:
+                year, month = divmod(time.month, 12)
+                time = time.replace(year=time.year + year, month=month + 1, day=1, hour=0,
+                                    minute=0)
+            elif not self._matches_day(time):
+                time = time.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif time.hour not in self._hours:
+                time = time.replace(minute=0) + datetime.timedelta(hours=1)
+            elif time.minute not in self._minutes:
+                time += datetime.timedelta(minutes=1)
+            else:
+                return time
+
+        raise ValueError("Cron expression '{}' never matches.".format(self.expression))
+
+    def _matches_day(self, time):
+        day = time.day in self._days
+        weekday = (time.weekday() + 1) % 7 in self._weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def _parse_field(self, field, low, high):
+        values = set()
+        for part in field.split(","):
+            value_range, _, step = part.partition("/")
+            if value_range == "*":
+                start, end = low, high
+            elif "-" in value_range:
+                start, end = (int(v) for v in value_range.split("-"))
+            else:
+                start = int(value_range)
+                end = high if step else start
+
+            if not low <= start <= end <= high:
+                raise ValueError("Invalid cron field '{}' in '{}'.".format(field, self.expression))
+            values.update(range(start, end + 1, int(step) if step else 1))
+
+        return values
+
+
+class Job:
+    """A function called on a schedule, either every `interval` seconds or per `cron`.
+
+    Attributes:
+        name (str): the job's name, used in progress messages.
+        function (callable): the function called (without arguments) each time the job runs.
+        interval (int or float or None): the number of seconds between runs.
+        cron (CronSchedule or None): the times the job runs.
+        next_run (float or None): the (epoch) time the job next runs.
+        runs (int): the number of times the job has run.
+
+    """
+    def __init__(self, name, function, interval=None, cron=None):
+        assert (interval is None) != (cron is None), "Either `interval` or `cron` must be " \
+                                                     "provided."
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.cron = CronSchedule(cron) if isinstance(cron, str) else cron
+        self.next_run = None
+        self.runs = 0
+
+    def schedule(self, now):
+        """Set `next_run` to the job's next run time after `now` (epoch seconds)."""
+        if self.interval is not None:
+            self.next_run = now + self.interval
+        else:
+            self.next_run = self.cron.next_time(datetime.datetime.fromtimestamp(now)).timestamp()
+
+
+class Scheduler:
+    """Run jobs on their schedules in a single thread, until stopped.
+
+    Jobs run one at a time, in order of their next run time. An error raised by a job is logged
+    and the job is rescheduled as usual. `stop()` (or SIGINT/SIGTERM, once
+    `install_signal_handlers()` has been called) stops the scheduler after the current job.
+
+    Attributes:
+        jobs (list of Job): the scheduled jobs.
+
+    Args:
+        clock (callable): returns the current (epoch) time.
+        wait (callable or None): waits for a number of seconds, returning True if the scheduler
+            was stopped meanwhile (defaults to waiting for `stop()`).
+
+    """
+    def __init__(self, clock=time.time, wait=None):
+        self.jobs = []
+        self._clock = clock
+        self._stopping = threading.Event()
+        self._wait = wait if wait is not None else self._stopping.wait
+
+    def add_job(self, function, interval=None, cron=None, name=None, run_immediately=False):
+        """Schedule a function every `interval` seconds or per a `cron` expression.
+
+        Args:
+            function (callable): the function called (without arguments) each time the job runs.
+            interval (int or float or None): the number of seconds between runs.
+            cron (str or None): a cron expression (see `CronSchedule`).
+            name (str or None): the job's name (defaults to the function's name).
+            run_immediately (bool): whether the job first runs when the scheduler starts, rather
+                than at its first scheduled time.
+
+        Returns:
+            Job: the scheduled job.
+
+        """
+        job = Job(name or getattr(function, "__name__", "job"), function, interval, cron)
+        job.schedule(self._clock())
+        if run_immediately:
+            job.next_run = self._clock()
+        self.jobs.append(job)
+        return job
+
+    def run(self, max_runs=None):
+        """Run jobs as they're due until stopped (or `max_runs` jobs have run)."""
+        assert self.jobs, "No jobs have been scheduled."
+        self._stopping.clear()
+        runs = 0
+        while not self._stopping.is_set() and (max_runs is None or runs < max_runs):
+            job = min(self.jobs, key=lambda j: j.next_run)
+            wait = job.next_run - self._clock()
+            if wait > 0:
+                logger.info("Next job '%s' in %.0f seconds...", job.name, wait,
+                            extra={"job": job.name})
+                if self._wait(wait):
+                    break
+
+            logger.info("Running job '%s'...", job.name, extra={"job": job.name})
+            try:
+                job.function()
+            except Exception:
+                logger.exception("Job '%s' failed", job.name, extra={"job": job.name})
+
+            job.runs += 1
+            runs += 1
+            job.schedule(self._clock())
+
+        logger.info("Scheduler stopped.")
+
+    def stop(self):
+        """Stop the scheduler once the current job (if any) has finished."""
+        self._stopping.set()
+
+    def install_signal_handlers(self):
+        """Stop the scheduler gracefully on SIGINT or SIGTERM (from the main thread only)."""
+        def handle(signum, frame):
+            logger.info("Received signal %d; stopping after the current job...", signum)
+            self.stop()
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
+
+
+def create_bot(usernames, share_ledger=None, tweet_cache=None, backfill_days=None, api=None,
+               selector=None):
+    """Return a `bot.Bot` whose state is kept warm between shares.
+
+    The bot keeps a single API object, a user resolver, a share ledger, and (if provided) a Tweet
+    cache. If a ledger isn't provided, an in-memory ledger is backfilled
+    from the bot's timeline (for the previous `backfill_days`) once, rather than paging through the
+    timeline on every share.
+
+    """
+    api = api if api is not None else twitter_auth.get_api()
+    if share_ledger is None:
+        share_ledger = ledger.ShareLedger(":memory:")
+        share_ledger.backfill(backfill_days or 9999, api=api)
+
+    share_bot = bot.Bot(usernames=usernames, ledger=share_ledger, cache=tweet_cache, api=api,
+                        selector=selector)
+    share_bot.resolve_users()
+    return share_bot
+
+
+def share_job(share_bot, method="share_from_random_user", num_days=7, **kwargs):
+    """Return a function (for `Scheduler.add_job()`) calling a `bot.Bot` share method."""
+    share = getattr(share_bot, method)
+
+    def run():
+        share(num_days, **kwargs)
+
+    run.__name__ = method
+    return run
+
+
+def main():
+    """Run the share jobs in `SHARE_JOBS` (or `DEFAULT_JOBS`) until SIGINT/SIGTERM."""
+    from top_tweets import config
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    jobs = getattr(config, "SHARE_JOBS", None) or DEFAULT_JOBS
+    ledger_path = getattr(config, "SHARE_LEDGER_PATH", None)
+    share_ledger = ledger.ShareLedger(ledger_path) if ledger_path is not None else None
+    cache_dir = getattr(config, "TWEET_CACHE_DIR", None)
+    tweet_cache = cache.TweetCache(cache_dir) if cache_dir is not None else None
+    api = response_cache.ResponseCache(twitter_auth.get_api(),
+                                       path=getattr(config, "RESPONSE_CACHE_PATH", None))
+    stats_path = getattr(config, "ACCOUNT_STATS_PATH", None)
+    selector = selection.AccountSelector(stats_path) if stats_path is not None else None
+    share_bot = create_bot(config.SOURCE_USERNAMES, share_ledger, tweet_cache,
+                           backfill_days=max(j.get("num_days", 7) for j in jobs), api=api,
+                           selector=selector)
+
+    scheduler = Scheduler()
+    for job in jobs:
+        job = dict(job)
+        interval, cron = job.pop("interval", None), job.pop("cron", None)
+        run_immediately = job.pop("run_immediately", False)
+        if job.get("method", "share_from_random_user").startswith("share_"):
+            job.setdefault("extra_hashtags", config.HASHTAGS)
+        scheduler.add_job(share_job(share_bot, **job), interval, cron,
+                          run_immediately=run_immediately)
+
+    metrics_port = getattr(config, "METRICS_PORT", None)
+    if metrics_port is not None:
+        telemetry.start_http_server(metrics_port)
+
+    scheduler.install_signal_handlers()
+    try:
+        scheduler.run()
+    finally:
+        share_bot.ledger.close()
+        share_bot.selector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""An offline stand-in for the Twitter API (v1.1) endpoints used by this project.
+
+`FakeAPI` can be used anywhere a Tweepy API object is (e.g. `Account(..., api=FakeAPI(...))` or
+`twitter_auth.set_api(FakeAPI(...))`), serving synthetic timelines of a configurable size,
+engagement distribution, and latency. It's intended for tests and benchmarks, which can use its
+request counts to measure API usage without network access.
+"""
+import array
+import collections
+import datetime
+import json
+import random
+import re
+import threading
+import time
+
+import tweepy
+
+from top_tweets import get_tweets
+
+DATE_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+MAX_COUNT = 200
+
+
+class FakeUser:
+    """A synthetic Twitter user and their timeline.
+
+    Tweet engagement is stored in compact arrays and each Tweet's JSON is generated on request, so
+    timelines of millions of Tweets can be served without holding millions of dicts in memory.
+
+    Attributes:
+        id (int): the user's unique identifier.
+        screen_name (str): the user's screen name/handle.
+        num_tweets (int): the number of Tweets in the user's timeline.
+        newest_time (datetime.datetime): the publish time of the most recent Tweet (naive UTC).
+        interval (float): the number of seconds between consecutive Tweets.
+        followers_count (int): the user's number of followers.
+
+    """
+    def __init__(self, id, screen_name, num_tweets, newest_time, days, rng, engagement=(3, 1.5),
+                 quote_ratio=0.05, followers_count=1000):
+        self.id = id
+        self.screen_name = screen_name
+        self.num_tweets = num_tweets
+        self.newest_time = newest_time
+        self.interval = days * 86400 / max(num_tweets, 1)
+        self.followers_count = followers_count
+        mu, sigma = engagement
+        self.likes = array.array("l", (int(rng.lognormvariate(mu, sigma))
+                                       for _ in range(num_tweets)))
+        self.retweets = array.array("l", (likes // rng.randint(3, 20) for likes in self.likes))
+        self.quotes = array.array("b", (rng.random() < quote_ratio for _ in range(num_tweets)))
+
+    def json(self):
+        """Return the user's v1.1 User JSON dict."""
+        return {
+            "id": self.id,
+            "id_str": str(self.id),
+            "screen_name": self.screen_name,
+            "name": self.screen_name.title(),
+            "statuses_count": self.num_tweets,
+            "followers_count": self.followers_count,
+        }
+
+    def tweet_id(self, index):
+        """Return the Snowflake ID (int) of the Tweet at `index` (0 is the most recent)."""
+        return snowflake_id(self.publish_time(index), self.id % 4096)
+
+    def publish_time(self, index):
+        return self.newest_time - datetime.timedelta(seconds=index * self.interval)
+
+    def index(self, tweet_id):
+        """Return the index of the newest Tweet with an ID <= `tweet_id` (may be `num_tweets`)."""
+        lo, hi = 0, self.num_tweets
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.tweet_id(mid) > tweet_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def tweet_json(self, index, retweeted=False):
+        """Return the v1.1 Tweet JSON dict of the Tweet at `index`."""
+        tweet_id = self.tweet_id(index)
+        is_quote = bool(self.quotes[index])
+        hashtags = [{"text": "tag{}".format((index + i) % 50), "indices": [0, 5]}
+                    for i in range(index % 3)]
+        return {
+            "id": tweet_id,
+            "id_str": str(tweet_id),
+            "created_at": self.publish_time(index).strftime(DATE_FORMAT),
+            "full_text": "Synthetic Tweet {} by @{}".format(index, self.screen_name),
+            "is_quote_status": is_quote,
+            "quoted_status_id_str": "1" if is_quote else None,
+            "entities": {"hashtags": hashtags, "urls": [], "user_mentions": [], "symbols": []},
+            "favorite_count": self.likes[index],
+            "retweet_count": self.retweets[index],
+            "retweeted": retweeted,
+            "favorited": False,
+            "lang": "en",
+            "user": {"id": self.id, "id_str": str(self.id), "screen_name": self.screen_name},
+        }
+
+
+class FakeMethod:
+    """Returned by `FakeAPI` methods called with `create=True`, as expected by `tweepy.Cursor`."""
+    payload_type = "status"
+    payload_list = True
+
+    def __init__(self, api):
+        self.api = api
+
+
+class FakeAPI:
+    """An offline stand-in for `tweepy.API`, serving synthetic users and timelines.
+
+    Supports `user_timeline` (including `since_id`/`max_id`/`count` pagination and `tweepy.Cursor`),
+    `get_user`, `lookup_users`, `get_status`, `statuses_lookup`, `update_status`, `retweet`, and
+    `destroy_status`. The authenticating (bot) user's timeline contains the Quote Tweets and
+    Retweets published via the fake API. Deleted Tweets are omitted from timelines and lookups.
+
+    Attributes:
+        users (dict of str: FakeUser): the synthetic users, by lowercase screen name.
+        bot (FakeUser): the authenticating user (with an empty source timeline).
+        calls (collections.Counter): the number of requests made to each method.
+        latency (float): the number of seconds each request takes.
+
+    Args:
+        users (dict of str: int): the number of Tweets in each user's timeline, by screen name.
+        days (int or float): the period the Tweets of each user are spread evenly over, ending now.
+        engagement (tuple of float): the (mu, sigma) of the lognormal distribution of Likes.
+        quote_ratio (float): the proportion of each timeline that are Quote Tweets.
+        latency (float): the number of seconds each request takes.
+        seed (int): the random seed used to generate engagement.
+
+    """
+    def __init__(self, users, days=30, engagement=(3, 1.5), quote_ratio=0.05, latency=0.0,
+                 seed=0):
+        self.parser = tweepy.parsers.ModelParser()
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.last_response = None
+        self._lock = threading.Lock()
+        self._retweeted = set()
+        self._deleted = set()
+        self._bot_tweets = []
+        rng = random.Random(seed)
+        newest_time = datetime.datetime.utcnow().replace(microsecond=0)
+        self.users = {}
+        for i, (screen_name, num_tweets) in enumerate(users.items()):
+            self.users[screen_name.lower()] = FakeUser(
+                1000 + i, screen_name, num_tweets, newest_time, days, rng, engagement,
+                quote_ratio, followers_count=rng.randint(100, 100000))
+        self.bot = FakeUser(999, "fake_bot", 0, newest_time, days, rng)
+        self._users_by_id = {u.id: u for u in self.users.values()}
+
+    @property
+    def requests(self):
+        """The total number of requests made."""
+        return sum(self.calls.values())
+
+    def user_timeline(self, id=None, user_id=None, screen_name=None, since_id=None, max_id=None,
+                      count=20, include_rts=True, exclude_replies=False, tweet_mode=None,
+                      parser=None, create=False, **kwargs):
+        if create:
+            return FakeMethod(self)
+
+        self._request("user_timeline")
+        count = min(int(count), MAX_COUNT)
+        if id is None and user_id is None and screen_name is None:
+            statuses = self._bot_timeline(since_id, max_id, count, include_rts)
+        else:
+            user = self._user(id=id, user_id=user_id, screen_name=screen_name)
+            start = 0 if max_id is None else user.index(int(max_id))
+            statuses = []
+            for i in range(start, min(start + count, user.num_tweets)):
+                if since_id is not None and user.tweet_id(i) <= int(since_id):
+                    break
+                if user.tweet_id(i) not in self._deleted:
+                    statuses.append(user.tweet_json(i, user.tweet_id(i) in self._retweeted))
+
+        return self._result(statuses, parser)
+
+    user_timeline.pagination_mode = "id"
+
+    def get_user(self, id=None, user_id=None, screen_name=None, **kwargs):
+        self._request("get_user")
+        return tweepy.models.User.parse(self, self._user(id, user_id, screen_name).json())
+
+    def lookup_users(self, user_ids=None, screen_names=None, **kwargs):
+        self._request("lookup_users")
+        users = []
+        for key in (user_ids or screen_names or [])[:100]:
+            try:
+                if user_ids is not None:
+                    users.append(self._user(user_id=key))
+                else:
+                    users.append(self._user(screen_name=key))
+            except tweepy.TweepError:
+                continue
+        return [tweepy.models.User.parse(self, u.json()) for u in users]
+
+    def statuses_lookup(self, id_, tweet_mode=None, **kwargs):
+        self._request("statuses_lookup")
+        statuses = (self._status_json(int(i)) for i in id_[:100])
+        return tweepy.models.Status.parse_list(self, [s for s in statuses if s is not None])
+
+    def destroy_status(self, id, **kwargs):
+        self._request("destroy_status")
+        status = self._status_json(int(id))
+        if status is None:
+            raise tweepy.TweepError("No status found with that ID.", api_code=144)
+        with self._lock:
+            self._deleted.add(int(id))
+            self._bot_tweets = [s for s in self._bot_tweets if s["id"] != int(id)]
+        return tweepy.models.Status.parse(self, status)
+
+    def get_status(self, id, **kwargs):
+        self._request("get_status")
+        status = self._status_json(int(id))
+        if status is None:
+            raise tweepy.TweepError("No status found with that ID.", api_code=144)
+        return tweepy.models.Status.parse(self, status)
+
+    def update_status(self, status=None, attachment_url=None, **kwargs):
+        self._request("update_status")
+        quoted_id = None
+        if attachment_url is not None:
+            quoted_id = re.search(r"/status/(\d+)", attachment_url).group(1)
+        return self._publish({"full_text": status, "is_quote_status": quoted_id is not None,
+                              "quoted_status_id_str": quoted_id})
+
+    def retweet(self, id, **kwargs):
+        self._request("retweet")
+        source = self._status_json(int(id))
+        if source is None:
+            raise tweepy.TweepError("No status found with that ID.", api_code=144)
+        with self._lock:
+            self._retweeted.add(int(id))
+        source["retweeted"] = True
+        return self._publish({"full_text": "RT", "is_quote_status": False,
+                              "retweeted_status": source})
+
+    def _request(self, method):
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _result(self, statuses, parser):
+        if isinstance(parser, tweepy.parsers.RawParser):
+            # `tweepy.Cursor` requests raw JSON payloads
+            return json.dumps(statuses)
+        return tweepy.models.Status.parse_list(self, statuses)
+
+    def _user(self, id=None, user_id=None, screen_name=None):
+        key = id if id is not None else user_id
+        user = None
+        if key is not None and str(key).isdigit():
+            user = self._users_by_id.get(int(key))
+        if user is None:
+            user = self.users.get(str(screen_name or key).lower())
+        if user is None:
+            raise tweepy.TweepError("User not found.", api_code=50)
+        return user
+
+    def _status_json(self, tweet_id):
+        if tweet_id in self._deleted:
+            return None
+        for user in self.users.values():
+            index = user.index(tweet_id)
+            if index < user.num_tweets and user.tweet_id(index) == tweet_id:
+                return user.tweet_json(index, tweet_id in self._retweeted)
+
+        for status in self._bot_tweets:
+            if status["id"] == tweet_id:
+                return dict(status)
+        return None
+
+    def _publish(self, fields):
+        with self._lock:
+            now = datetime.datetime.utcnow()
+            tweet_id = snowflake_id(now, len(self._bot_tweets) % 4096)
+            status = {
+                "id": tweet_id,
+                "id_str": str(tweet_id),
+                "created_at": now.strftime(DATE_FORMAT),
+                "entities": {"hashtags": []},
+                "favorite_count": 0,
+                "retweet_count": 0,
+                "retweeted": False,
+                "user": self.bot.json(),
+            }
+            status.update(fields)
+            self._bot_tweets.insert(0, status)
+        return tweepy.models.Status.parse(self, status)
+
+    def _bot_timeline(self, since_id, max_id, count, include_rts):
+        with self._lock:
+            statuses = list(self._bot_tweets)
+        return [s for s in statuses
+                if (include_rts or "retweeted_status" not in s)
+                and (since_id is None or s["id"] > int(since_id))
+                and (max_id is None or s["id"] <= int(max_id))][:count]
+
+
+def snowflake_id(time, sequence=0):
+    """Return a Snowflake Tweet ID (int) for a (naive UTC or offset-aware) datetime."""
+    return get_tweets.snowflake_id(time) | sequence
@@ -1,8 +1,33 @@
+import concurrent.futures
 import datetime
-import pytz
-import tweepy
+import heapq
+import logging
+import operator
+import threading
+import time
 
-from top_tweets import twitter_auth
+from top_tweets import singleflight, telemetry, twitter_auth
+
+logger = logging.getLogger(__name__)
+
+# The metrics Tweets can be ranked by
+METRICS = ("likes", "retweets", "likes_retweets_combined")
+# The maximum number of Tweets per `user_timeline` request
+TIMELINE_PAGE_SIZE = 200
+# The maximum number of Tweet IDs per `statuses_lookup` request
+LOOKUP_BATCH_SIZE = 100
+# The Twitter epoch (milliseconds since the Unix epoch), the origin of Snowflake Tweet IDs
+TWITTER_EPOCH_MS = 1288834974657
+
+# In-flight timeline fetches, shared by concurrent fetches of the same user (by API and user ID)
+_TIMELINES = singleflight.Group("timeline")
+# In-flight user requests, shared by concurrent `Account` initialisations for the same user
+_USERS = singleflight.Group("user")
+
+
+class NoTweetsError(ValueError):
+    """Raised when an account has no Tweets (excluding Retweets/Quote Tweets/replies) in the
+    collection period."""
 
 
 class Account:
@@ -16,13 +41,28 @@ class Account:
         user_id (str): the User's unique identifier.
         name (str): the User's profile name.
         statuses_count (int): the number of Tweets (including Retweets) published by the User.
+        followers_count (int): the User's number of followers.
+        cache (cache.TweetCache or None): a local Tweet store used to fetch only Tweets published
+            since the previous fetch, or None to fetch every Tweet on each call.
+        archive (archive.TweetArchive or None): if provided, Tweets are read from the archive
+            rather than requested from the API (see `archive.TweetArchive.account()`).
+
+    Args:
+        resolver (users.UserResolver or None): if provided, the user is resolved via (and cached
+            by) the resolver rather than requested individually.
+        api (tweepy.API or None): the API used to request the User and Tweets (defaults to
+            `twitter_auth.get_api()`).
 
     """
-    def __init__(self, username=None, user_id=None):
-        if username is not None:
-            self.user = twitter_auth.API.get_user(screen_name=username)
+    def __init__(self, username=None, user_id=None, cache=None, resolver=None, api=None,
+                 archive=None):
+        self._api = api
+        if resolver is not None and (username is not None or user_id is not None):
+            self.user = resolver.get(username=username, user_id=user_id)
+        elif username is not None:
+            self.user = self._get_user(screen_name=username.lower())
         elif user_id is not None:
-            self.user = twitter_auth.API.get_user(user_id=user_id)
+            self.user = self._get_user(user_id=str(user_id))
         else:
             raise ValueError("Error initialising Account. "
                              "You must provide a `username` or `user_id` as a keyword argument.")
@@ -31,10 +71,18 @@ class Account:
         self.user_id = self.user.id_str
         self.name = self.user.name
         self.statuses_count = self.user.statuses_count
+        self.followers_count = self.user.followers_count
+        self.cache = cache
+        self.archive = archive
 
     def __str__(self):
         return "{} (@{})".format(self.name, self.username)
 
+    @property
+    def api(self):
+        """The API used to request the account's Tweets."""
+        return self._api if self._api is not None else twitter_auth.get_api()
+
     def get_top_tweets_num(self, num_days, metric, top_num, max_tweets=None):
         """Return the top `top_num` Tweets from the previous `num_days`, based on `metric`.
 
@@ -61,9 +109,7 @@ class Account:
             list of Tweet: sorted and filtered based on passed arguments.
 
         """
-        fetched_tweets = self._fetch_tweets(num_days, max_tweets)
-        sorted_tweets = self._sort_tweets(fetched_tweets, metric)
-        return self._filter_tweets(sorted_tweets, top_num)
+        return self._get_top_tweets(num_days, metric, max_tweets, top_num=top_num)
 
     def get_top_tweets_percent(self, num_days, metric, top_percent, max_tweets=None):
         """Return the top `top_percent` Tweets from the previous `num_days`, based on `metric`.
@@ -91,10 +137,46 @@ class Account:
             list of Tweet: sorted and filtered based on passed arguments.
 
         """
-        fetched_tweets = self._fetch_tweets(num_days, max_tweets)
-        sorted_tweets = self._sort_tweets(fetched_tweets, metric)
-        top_num = round((top_percent/100) * len(sorted_tweets))
-        return self._filter_tweets(sorted_tweets, top_num)
+        return self._get_top_tweets(num_days, metric, max_tweets, top_percent=top_percent)
+
+    def get_rankings(self, num_days, metrics=METRICS, max_tweets=None):
+        """Return the Tweets from the previous `num_days`, ranked independently by several metrics.
+
+        The timeline is fetched once, so (unlike calling `get_top_tweets_num()` for each metric)
+        the top Tweets by every metric only require the requests of a single fetch. For example,
+        get_rankings(30).top_num("retweets", 10) returns the top 10 Tweets based on their number
+        of Retweets from the previous 30 days (including the current day).
+
+        Excludes Retweets, Quote Tweets, and replies. API response and rate limits apply:
+        https://developer.twitter.com/en/docs/twitter-api/v1/tweets/timelines/api-reference/get-statuses-user_timeline.
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            metrics (iterable of str): the metrics to rank Tweets by (defaults to every metric).
+            max_tweets (int or None): the maximum number of Tweets to retrieve from the previous
+                `num_days` (defaults to None).
+
+        Returns:
+            Rankings: the ranked Tweets.
+
+        """
+        return Rankings(self._fetch_tweets(num_days, max_tweets), metrics, account=self)
+
+    def get_tweet_batch(self, num_days, max_tweets=None):
+        """Return a `batch.TweetBatch` of every Tweet from the previous `num_days`.
+
+        The batch can be ranked by any metric (including weighted and time-decayed scores) or
+        combined with other accounts' batches via `batch.TweetBatch.concatenate()`. Requires NumPy.
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            max_tweets (int or None): the maximum number of Tweets to retrieve from the previous
+                `num_days` (defaults to None).
+
+        """
+        from top_tweets.batch import TweetBatch
+
+        return TweetBatch.from_tweets(self._fetch_tweets(num_days, max_tweets))
 
     @staticmethod
     def cut_off_time(latest_date, num_days):
@@ -115,7 +197,49 @@ class Account:
         date = latest_date - datetime.timedelta(days=(num_days - 1))
         return datetime.datetime(date.year, date.month, date.day)
 
-    def _fetch_tweets(self, num_days, max_tweets):
+    def _get_top_tweets(self, num_days, metric, max_tweets, top_num=None, top_percent=None,
+                        budget=None):
+        """Return the top `top_num` (or `top_percent`) Tweets, selected while they're fetched.
+
+        Rather than fetching every Tweet and then sorting, the top Tweets are kept in a bounded
+        heap as pages are fetched. For `top_num`, the heap holds at most `top_num` Tweets. For
+        `top_percent`, the final number of Tweets isn't known until the fetch ends, so the heap
+        holds `top_percent` of `max_tweets` (an upper bound on the number of Tweets), which always
+        contains the final top Tweets. If `max_tweets` is None, only each Tweet's metric value and
+        ID are kept, and the selected Tweets are looked up once the fetch ends (see
+        `_select_top_percent()`). The account's `statuses_count` isn't used as a bound, as it's
+        only as current as the User (more Tweets may have been published since, or be cached).
+        The results (and ranks) are identical to sorting every Tweet.
+
+        """
+        archive = getattr(self, "archive", None)
+        if archive is not None:
+            return archive.top_tweets(self, num_days, metric, top_num, top_percent,
+                                      max_tweets)
+
+        tweets = self.iter_tweets(num_days, max_tweets, budget=budget)
+        # Tweets are selected as they're fetched, so this times both
+        with telemetry.timer("stage_seconds", stage="fetch"):
+            if top_num is not None:
+                top_tweets, num_tweets = self._select_top_tweets(tweets, metric, top_num)
+            elif max_tweets is not None:
+                top_tweets, num_tweets = self._select_top_tweets(
+                    tweets, metric, round((top_percent/100) * max_tweets))
+            elif top_percent >= 100:
+                # Every Tweet is returned
+                top_tweets, num_tweets = self._select_top_tweets(tweets, metric, None)
+            else:
+                top_tweets, num_tweets = self._select_top_percent(tweets, metric, top_percent,
+                                                                  budget)
+        self._check_tweets_fetched(num_tweets, num_days)
+        if top_num is None:
+            top_num = round((top_percent/100) * num_tweets)
+
+        logger.info("Returning the top %d of %d Tweets...", min(top_num, num_tweets), num_tweets,
+                    extra={"account": self.username, "tweets": num_tweets})
+        return top_tweets[:top_num]
+
+    def _fetch_tweets(self, num_days, max_tweets, budget=None):
         """Fetch and return a list of the account's public Tweets.
 
         Excludes Retweets, Quote Tweets, and replies. API response and rate limits apply:
@@ -125,39 +249,117 @@ class Account:
             num_days (int): the historic Tweet collection period in days, including the current day.
             max_tweets (int or None): the maximum number of Tweets to retrieve from the previous
                 `num_days` (defaults to None).
+            budget (RequestBudget or None): a request budget (potentially shared with other
+                fetches) to acquire before each page is requested, or None.
+
+        """
+        with telemetry.timer("stage_seconds", stage="fetch"):
+            tweets = list(self.iter_tweets(num_days, max_tweets, budget=budget))
+        self._check_tweets_fetched(len(tweets), num_days)
+        return tweets
+
+    def iter_tweets(self, num_days, max_tweets=None, include_quotes=False, budget=None):
+        """Yield the account's public Tweets from the previous `num_days`, newest first.
+
+        Pages are requested only as the generator is consumed, so a consumer that stops early
+        (e.g. after the first Tweet matching a filter; see `streams.py`) only makes the requests it
+        needs, and Tweets aren't held in memory. If the account has a `cache`, the cache is updated
+        (which may fetch every new Tweet) before the first Tweet is yielded.
+
+        Excludes Retweets and replies. API response and rate limits apply:
+        https://developer.twitter.com/en/docs/twitter-api/v1/tweets/timelines/api-reference/get-statuses-user_timeline.
+
+        Args:
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            max_tweets (int or None): the maximum number of Tweets to yield (defaults to None).
+            include_quotes (bool): whether Quote Tweets are included (defaults to False).
+            budget (RequestBudget or None): a request budget (potentially shared with other
+                fetches) to acquire before each page is requested, or None.
 
         """
+        archive = getattr(self, "archive", None)
+        if archive is not None:
+            yield from archive.iter_tweets(self, num_days, max_tweets, include_quotes)
+            return
+
         cut_off = self.cut_off_time(datetime.date.today(), num_days)
-        tweets = []
-        print("Fetching Tweets by '{}'...".format(self))
-        # Cursor object handles pagination and returns a list of Tweepy Status
-        for t in tweepy.Cursor(twitter_auth.API.user_timeline,
-                               id=self.user_id,
-                               include_rts=False,
-                               exclude_replies=True,
-                               tweet_mode="extended").items():
-
-            tweet = Tweet(t, self)
-            if len(tweets) == max_tweets:
-                break
-            elif tweet.published_before(cut_off):
+        num_tweets = 0
+        if self.cache is not None:
+            statuses = self.cache.statuses(self, num_days, max_tweets, budget)
+        else:
+            logger.info("Fetching Tweets by '%s'...", self, extra={"account": self.username})
+            # The API only returns Tweets published since the cut-off
+            statuses = self._timeline(cut_off_since_id(cut_off), budget)
+
+        for t in statuses:
+            if num_tweets == max_tweets or utc_naive(t.created_at) < cut_off:
                 break
-            elif tweet.is_quote_tweet:
+            elif t.is_quote_status and not include_quotes:
                 continue
             else:
-                tweets.append(tweet)
+                num_tweets += 1
+                yield Tweet(t, self)
 
-        assert len(tweets) > 0, "No Tweets (excluding Retweets/Quote Tweets/replies) returned " \
-                                "for '{}' since {}.".format(self, cut_off)
-        return tweets
+    def _get_user(self, **kwargs):
+        """Request the Tweepy User, sharing the request with concurrent requests for the user."""
+        def start(_):
+            return singleflight.Once(lambda: self.api.get_user(**kwargs))
+
+        key = (id(self.api),) + tuple(kwargs.items())
+        with _USERS.join(key, 0, start) as get_user:
+            return get_user()
+
+    def _check_tweets_fetched(self, num_tweets, num_days):
+        cut_off = self.cut_off_time(datetime.date.today(), num_days)
+        if num_tweets == 0:
+            raise NoTweetsError("No Tweets (excluding Retweets/Quote Tweets/replies) returned "
+                                "for '{}' since {}.".format(self, cut_off))
+
+    def _timeline(self, since_id=None, budget=None):
+        """Yield the account's Tweepy Status objects, newest first.
+
+        Excludes Retweets and replies. Pages are requested lazily as the generator is consumed.
+        Concurrent calls for the same user (e.g. from threads ranking by different metrics or
+        periods) share a single fetch (see `singleflight.py`): a call joins an in-flight fetch
+        since an earlier (or the same) `since_id` that hasn't yet returned its first page, and
+        each page is requested once, by whichever call first needs it.
+
+        Args:
+            since_id (int or str or None): if provided, only Tweets with a greater (i.e. more
+                recent) ID are returned (see `cut_off_since_id()`).
+            budget (RequestBudget or None): a request budget to acquire before each page this
+                call requests, or None.
+
+        """
+        since_id = int(since_id) if since_id is not None else 0
+
+        def start(since_id):
+            return singleflight.SharedIterator(self._fetch_timeline(since_id or None))
+
+        with _TIMELINES.join((id(self.api), self.user_id), since_id, start) as timeline:
+            for page in timeline.iterate(budget):
+                for status in page:
+                    if status.id <= since_id:
+                        # Fetched for a call with an earlier `since_id`
+                        return
+                    yield status
+
+    def _fetch_timeline(self, since_id=None):
+        """Yield pages (lists of Tweepy Status) of the account's timeline, newest first (as per
+        `_timeline()`, but always requesting the timeline), one request per page."""
+        for page in timeline_pages(self.api.user_timeline, since_id, user_id=self.user_id,
+                                   include_rts=False, exclude_replies=True,
+                                   tweet_mode="extended"):
+            telemetry.inc("timeline_pages_total", account=self.username)
+            telemetry.inc("tweets_fetched_total", len(page), account=self.username)
+            yield page
 
     def _sort_tweets(self, tweets, metric):
         """Sort and return a list of Tweet based on `metric` (highest to lowest)."""
-        metric = metric.lower()
-        valid_metrics = ["likes", "retweets", "likes_retweets_combined"]
-        assert metric in valid_metrics, "{} is not a valid metric to sort Tweets by.".format(metric)
-        print("Sorting Tweets based on {}...".format(metric))
-        sorted_tweets = sorted(tweets, key=lambda t: getattr(t, metric), reverse=True)
+        metric = self._check_metric(metric)
+        logger.info("Sorting Tweets based on %s...", metric)
+        with telemetry.timer("stage_seconds", stage="rank"):
+            sorted_tweets = sorted(tweets, key=lambda t: getattr(t, metric), reverse=True)
 
         rank = 1
         for tweet in sorted_tweets:
@@ -166,45 +368,383 @@ class Account:
 
         return sorted_tweets
 
+    def _select_top_tweets(self, tweets, metric, capacity):
+        """Return a tuple of (list of Tweet, int): the top `capacity` Tweets and the Tweet count.
+
+        Tweets are consumed from the `tweets` iterable one at a time and only the top `capacity`
+        are kept (in a heap), in the same (stable) order as `_sort_tweets()`. If `capacity` is None
+        every Tweet is kept.
+
+        """
+        metric = self._check_metric(metric)
+        logger.info("Selecting the top Tweets based on %s...", metric)
+        counter = [0]
+
+        def counted(iterable):
+            for t in iterable:
+                counter[0] += 1
+                yield t
+
+        if capacity is None:
+            top_tweets = sorted(counted(tweets), key=operator.attrgetter(metric), reverse=True)
+        elif capacity > 0:
+            # Equivalent to sorted(...)[:capacity], including the order of equal Tweets
+            top_tweets = heapq.nlargest(capacity, counted(tweets), key=operator.attrgetter(metric))
+        else:
+            top_tweets = []
+            for _ in counted(tweets):
+                pass
+
+        rank = 1
+        for tweet in top_tweets:
+            tweet.rank = rank
+            rank += 1
+
+        return top_tweets, counter[0]
+
+    def _select_top_percent(self, tweets, metric, top_percent, budget=None):
+        """Return a tuple of (list of Tweet, int): the top `top_percent` of Tweets and the Tweet
+        count.
+
+        The number of top Tweets isn't known until every Tweet has been consumed from the `tweets`
+        iterable, so only each Tweet's `metric` value and ID are kept (rather than the Tweet). The
+        top Tweets are selected in the same (stable) order as `_sort_tweets()`, then looked up in
+        bulk (see `lookup_statuses()`), one request per 100 top Tweets. The looked up Tweets have
+        their current engagement (so are ranked by it), and any deleted since are omitted.
+
+        """
+        metric = self._check_metric(metric)
+        logger.info("Selecting the top Tweets based on %s...", metric)
+        values = [(getattr(t, metric), t.id) for t in tweets]
+        top_num = round((top_percent/100) * len(values))
+        # Equivalent to sorted(...)[:top_num], including the order of equal Tweets
+        selected = heapq.nlargest(top_num, values, key=operator.itemgetter(0))
+        top_tweets = sorted(self._lookup_tweets([i for _, i in selected], budget),
+                            key=operator.attrgetter(metric), reverse=True)
+
+        rank = 1
+        for tweet in top_tweets:
+            tweet.rank = rank
+            rank += 1
+
+        return top_tweets, len(values)
+
+    def _lookup_tweets(self, tweet_ids, budget=None):
+        """Return a list of the account's current Tweets with `tweet_ids`, in order (omitting any
+        that have been deleted)."""
+        statuses = lookup_statuses(tweet_ids, api=self.api, budget=budget)
+        return [Tweet(s, self) for s in statuses.values() if s is not None]
+
+    @staticmethod
+    def _check_metric(metric):
+        """Return the lowercase `metric`, asserting that it's a valid metric to sort Tweets by."""
+        metric = metric.lower()
+        assert metric in METRICS, "{} is not a valid metric to sort Tweets by.".format(metric)
+        return metric
+
     def _filter_tweets(self, tweets, top_num):
         """Filter and return the `top_num` Tweets."""
         if top_num > len(tweets):
-            print("Only {} Tweets fetched; returning all {}...".format(len(tweets), len(tweets)))
+            logger.info("Only %d Tweets fetched; returning all %d...", len(tweets), len(tweets))
         else:
-            print("Returning the top {} of {} Tweets...".format(top_num, len(tweets)))
+            logger.info("Returning the top %d of %d Tweets...", top_num, len(tweets))
         return tweets[:top_num]
 
 
+class Rankings:
+    """A set of Tweets ranked independently by several metrics (see `Account.get_rankings()`).
+
+    Each metric's ranking is held by the `Rankings` object rather than in `Tweet.rank`, so the
+    rankings of the same Tweets by different metrics can be used side by side.
+
+    Attributes:
+        account (Account or None): the account which published the Tweets, or None.
+        tweets (list of Tweet): the Tweets in the order they were fetched (newest first).
+        metrics (tuple of str): the metrics the Tweets are ranked by.
+
+    """
+    def __init__(self, tweets, metrics=METRICS, account=None):
+        self.account = account
+        self.tweets = list(tweets)
+        self.metrics = tuple(Account._check_metric(m) for m in metrics)
+        self._rank()
+
+    def __len__(self):
+        return len(self.tweets)
+
+    def refresh(self, api=None, max_workers=4):
+        """Refresh the Tweets' engagement metrics in bulk (see `refresh_tweets()`) and re-rank them.
+
+        Deleted (or otherwise unavailable) Tweets are removed from the rankings.
+
+        Args:
+            api (tweepy.API or None): the API used to look up Tweets (defaults to the account's API,
+                or `twitter_auth.get_api()`).
+            max_workers (int): the maximum number of lookup requests made at once.
+
+        Returns:
+            list of Tweet: the removed Tweets.
+
+        """
+        if api is None and self.account is not None:
+            api = self.account.api
+        deleted = refresh_tweets(self.tweets, api, max_workers)
+        deleted_ids = {t.id for t in deleted}
+        self.tweets = [t for t in self.tweets if t.id not in deleted_ids]
+        self._rank()
+        return deleted
+
+    def ranked(self, metric):
+        """Return a list of every Tweet, sorted by `metric` (highest to lowest)."""
+        return list(self._ranking(metric))
+
+    def rank(self, tweet, metric):
+        """Return the rank (int; 1 is best/highest) of a Tweet (or Tweet ID) by `metric`."""
+        metric = Account._check_metric(metric)
+        if metric not in self._ranks:
+            self._ranks[metric] = {t.id: r for r, t in enumerate(self._ranking(metric), start=1)}
+        return self._ranks[metric][getattr(tweet, "id", tweet)]
+
+    def top_num(self, metric, top_num):
+        """Return a list of the top `top_num` Tweets by `metric` (highest to lowest)."""
+        return self._ranking(metric)[:top_num]
+
+    def top_percent(self, metric, top_percent):
+        """Return a list of the top `top_percent` (1-100) percent of Tweets by `metric`."""
+        return self._ranking(metric)[:round((top_percent/100) * len(self.tweets))]
+
+    def _rank(self):
+        # Sorting is stable, so equal Tweets are ranked as by `Account.get_top_tweets_num()`
+        with telemetry.timer("stage_seconds", stage="rank"):
+            self._ranked = {m: sorted(self.tweets, key=operator.attrgetter(m), reverse=True)
+                            for m in self.metrics}
+        self._ranks = {}
+
+    def _ranking(self, metric):
+        metric = Account._check_metric(metric)
+        assert metric in self._ranked, "The Tweets weren't ranked by {}.".format(metric)
+        return self._ranked[metric]
+
+
+class RequestBudget:
+    """A thread-safe limit on the number of API requests and/or time shared by several fetches.
+
+    Attributes:
+        max_requests (int or None): the maximum number of requests, or None for no limit.
+        deadline (float or None): the `time.monotonic()` time after which no further requests
+            may be made, or None for no limit.
+        requests (int): the number of requests acquired so far.
+
+    """
+    def __init__(self, max_requests=None, timeout=None):
+        self.max_requests = max_requests
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Acquire a single request from the budget.
+
+        Raises:
+            RuntimeError: if the request limit has been reached or the deadline has passed.
+
+        """
+        with self._lock:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise RuntimeError("Request budget deadline passed.")
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                raise RuntimeError("Request budget of {} requests exhausted."
+                                   "".format(self.max_requests))
+            self.requests += 1
+
+
+class FetchResult:
+    """The top Tweets fetched for a single account by `fetch_top_tweets_many()`.
+
+    Attributes:
+        account (Account): the account the Tweets were fetched for.
+        tweets (list of Tweet or None): the sorted and filtered Tweets, or None if an error
+            occurred.
+        error (Exception or None): the error raised while fetching the account's Tweets, or None.
+
+    """
+    def __init__(self, account, tweets=None, error=None):
+        self.account = account
+        self.tweets = tweets
+        self.error = error
+
+    @property
+    def ok(self):
+        """Whether (True/False) the Tweets were fetched successfully."""
+        return self.error is None
+
+
+def fetch_top_tweets_many(accounts, num_days, metric, top_num=None, top_percent=None,
+                          max_tweets=None, max_workers=8, timeout=None, max_requests=None):
+    """Fetch the top Tweets of several accounts concurrently.
+
+    Each account's Tweets are fetched, sorted, and filtered as per `Account.get_top_tweets_num()`
+    (if `top_num` is provided) or `Account.get_top_tweets_percent()` (if `top_percent` is provided,
+    or neither). Accounts are fetched in parallel by a bounded thread pool, with every page request
+    acquired from a single shared `RequestBudget`. An error while fetching one account (including
+    an exhausted budget) is returned in that account's result rather than raised.
+
+    Args:
+        accounts (list of Account): the accounts to fetch Tweets for.
+        num_days (int): the historic Tweet collection period in days, including the current day.
+        metric (str): the metric to sort Tweets by, largest to smallest. One of:
+            - likes
+            - retweets
+            - likes_retweets_combined
+        top_num (int or None): the top number of Tweets to return for each account.
+        top_percent (int or None): the top percentage (1-100) of Tweets to return for each
+            account (defaults to 100 if `top_num` isn't provided).
+        max_tweets (int or None): the maximum number of Tweets to retrieve for each account from
+            the previous `num_days`, before sorting and filtering (defaults to None).
+        max_workers (int): the maximum number of accounts fetched at once.
+        timeout (int or float or None): the maximum number of seconds to spend fetching, after
+            which unfinished accounts return an error (defaults to None).
+        max_requests (int or None): the maximum number of requests (timeline pages and Tweet
+            lookups) shared by all accounts (defaults to None).
+
+    Returns:
+        list of FetchResult: in the same order as `accounts`.
+
+    """
+    assert top_num is None or top_percent is None, "Either `top_num` or `top_percent` must be " \
+                                                   "None."
+    budget = RequestBudget(max_requests, timeout)
+
+    def fetch(account):
+        percent = 100 if top_num is None and top_percent is None else top_percent
+        return account._get_top_tweets(num_days, metric, max_tweets, top_num, percent, budget)
+
+    results = [FetchResult(a) for a in accounts]
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(fetch, r.account): r for r in results}
+    done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+    # Unfinished fetches stop at their next page request (the budget deadline has passed)
+    executor.shutdown(wait=False)
+
+    for future, result in futures.items():
+        if future in not_done:
+            result.error = TimeoutError("Fetch timed out after {} seconds.".format(timeout))
+        elif future.exception() is not None:
+            result.error = future.exception()
+        else:
+            result.tweets = future.result()
+
+    return results
+
+
+def lookup_statuses(tweet_ids, api=None, max_workers=4, budget=None):
+    """Return the current Tweepy Status of several Tweets, requested in bulk.
+
+    Tweets are requested via the `statuses/lookup` endpoint, `LOOKUP_BATCH_SIZE` (100) IDs per
+    request, with up to `max_workers` requests made at once (each paced by the API's rate limit
+    scheduler, if any):
+    https://developer.twitter.com/en/docs/twitter-api/v1/tweets/post-and-engage/api-reference/get-statuses-lookup.
+
+    Args:
+        tweet_ids (iterable of str or int): the Tweets' unique identifiers.
+        api (tweepy.API or None): the API used to look up Tweets (defaults to
+            `twitter_auth.get_api()`).
+        max_workers (int): the maximum number of requests made at once.
+        budget (RequestBudget or None): a request budget to acquire before each request, or None.
+
+    Returns:
+        dict of str: tweepy.Status or None: the Status of each Tweet ID, or None if the Tweet has
+            been deleted (or is otherwise unavailable, e.g. its account is now protected).
+
+    """
+    api = api if api is not None else twitter_auth.get_api()
+    statuses = dict.fromkeys(str(i) for i in tweet_ids)
+    ids = list(statuses)
+    batches = [ids[i:i + LOOKUP_BATCH_SIZE] for i in range(0, len(ids), LOOKUP_BATCH_SIZE)]
+
+    def lookup(batch):
+        if budget is not None:
+            budget.acquire()
+        # Unavailable Tweets are omitted from the response
+        return api.statuses_lookup(batch, tweet_mode="extended")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for found in executor.map(lookup, batches):
+            for status in found:
+                statuses[status.id_str] = status
+
+    logger.info("Looked up %d Tweets in %d requests...", len(ids), len(batches),
+                extra={"tweets": len(ids), "requests": len(batches)})
+    return statuses
+
+
+def refresh_tweets(tweets, api=None, max_workers=4, budget=None):
+    """Update the engagement metrics of Tweets in bulk, rather than re-fetching their timelines.
+
+    Each Tweet's `likes`, `retweets`, `likes_retweets_combined`, and `retweeted` are updated from
+    its current Status (see `lookup_statuses()`), so e.g. a week of Tweets from several accounts
+    can be re-ranked with a handful of requests.
+
+    Args:
+        tweets (iterable of Tweet): the Tweets to refresh.
+        api (tweepy.API or None): the API used to look up Tweets (defaults to
+            `twitter_auth.get_api()`).
+        max_workers (int): the maximum number of requests made at once.
+        budget (RequestBudget or None): a request budget to acquire before each request, or None.
+
+    Returns:
+        list of Tweet: the Tweets which have been deleted (or are otherwise unavailable), which
+            aren't updated.
+
+    """
+    tweets = list(tweets)
+    statuses = lookup_statuses((t.id for t in tweets), api, max_workers, budget)
+    deleted = []
+    for tweet in tweets:
+        status = statuses[tweet.id]
+        if status is None:
+            deleted.append(tweet)
+        else:
+            tweet.refresh(status)
+    return deleted
+
+
 class Tweet:
     """A single Tweet and its associated data/metrics.
 
     https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/tweet
 
+    Only the fields used to rank and share Tweets are stored (in `__slots__`), so that large numbers
+    of Tweets can be held in memory. The Tweepy Status object is only kept if `keep_status` is True,
+    otherwise it's requested from the API (once) if `status` or `text` is accessed.
+
     Attributes:
-        status (Tweepy Status): the Tweepy Status (Tweet) object.
         account (Account or None): the Twitter user account which published the Tweet, or None.
         id (str): the Tweet's unique identifier.
         publish_time (datetime.datetime): datetime object representing when the Tweet was published.
         is_quote_tweet (bool): whether the Tweet is a Quote Tweet.
         quoted_tweet_id (str or None): the quoted Tweet's unique identifier, or None if
             the Tweet is not a Quote Tweet.
-        retweeted_tweet (tweepy.models.Status or None): the Retweeted Tweet Tweepy Status (Tweet)
-            object, or None if the Tweet is not a Retweet.
-        text (str): the UTF-8 text of the Tweet.
-        hashtags (list of dict): list of Twitter API (v1) Hashtag object.
+        retweeted_tweet_id (str or None): the Retweeted Tweet's unique identifier, or None if the
+            Tweet is not a Retweet.
+        hashtags (tuple of str): the text of the Tweet's hashtags (without '#').
         likes (int): how many times the Tweet has been Liked.
         retweets (int): how many times the Tweet has been Retweeted.
         likes_retweets_combined (int): the sum of the Tweet's Likes and Retweets.
-        rank (int or None): the Tweet's rank (1 is best/highest) relative to other Tweets that
-            have been sorted by engagement, or None if Tweets haven't been sorted.
+        rank (int or None): the Tweet's rank (1 is best/highest) in the list returned by
+            `Account.get_top_tweets_num()`/`get_top_tweets_percent()`, or None. Use `Rankings` to
+            rank the same Tweets by several metrics.
         retweeted (bool): whether the Tweet has been Retweeted by the authenticating user.
 
     """
-    def __init__(self, status, account):
-        self.status = status
+    __slots__ = ("account", "id", "publish_time", "is_quote_tweet", "quoted_tweet_id",
+                 "retweeted_tweet_id", "hashtags", "likes", "retweets", "likes_retweets_combined",
+                 "rank", "retweeted", "_status")
+
+    def __init__(self, status, account, keep_status=False):
         self.account = account
         self.id = status.id_str
-        self.publish_time = status.created_at
+        self.publish_time = utc_naive(status.created_at)
         self.is_quote_tweet = status.is_quote_status
         if self.is_quote_tweet:
             self.quoted_tweet_id = status.quoted_status_id_str
@@ -212,22 +752,48 @@ class Tweet:
             self.quoted_tweet_id = None
 
         try:
-            self.retweeted_tweet = status.retweeted_status
+            self.retweeted_tweet_id = status.retweeted_status.id_str
         except AttributeError:
-            self.retweeted_tweet = None
+            self.retweeted_tweet_id = None
 
-        try:
-            # If `tweet_mode="extended"`
-            self.text = status.full_text
-        except AttributeError:
-            self.text = status.text
-
-        self.hashtags = status.entities.get("hashtags")
+        self.hashtags = tuple(h["text"] for h in status.entities.get("hashtags", ()))
         self.likes = status.favorite_count
         self.retweets = status.retweet_count
         self.likes_retweets_combined = self.likes + self.retweets
         self.rank = None
         self.retweeted = status.retweeted
+        self._status = status if keep_status else None
+
+    def refresh(self, status):
+        """Update the Tweet's engagement metrics from a more recent Tweepy Status of the Tweet."""
+        self.likes = status.favorite_count
+        self.retweets = status.retweet_count
+        self.likes_retweets_combined = self.likes + self.retweets
+        self.retweeted = status.retweeted
+        if self._status is not None:
+            self._status = status
+
+    @property
+    def status(self):
+        """The Tweepy Status (Tweet) object, requested from the API if it wasn't kept."""
+        if self._status is None:
+            api = self.account.api if self.account is not None else twitter_auth.get_api()
+            self._status = api.get_status(self.id, tweet_mode="extended")
+        return self._status
+
+    @property
+    def is_retweet(self):
+        """Whether (True/False) the Tweet is a Retweet."""
+        return self.retweeted_tweet_id is not None
+
+    @property
+    def text(self):
+        """The UTF-8 text of the Tweet (see `status`)."""
+        try:
+            # If `tweet_mode="extended"`
+            return self.status.full_text
+        except AttributeError:
+            return self.status.text
 
     def published_before(self, time):
         """Return whether (True/False) the Tweet was published before a given datetime.
@@ -236,11 +802,64 @@ class Tweet:
             time (datetime.datetime): a datetime.datetime object.
 
         """
-        try:
-            return self.publish_time < time
-        except TypeError:
-            # Offset-naive (`time`) vs offset-aware (`publish_time`) inconsistency
-            # https://stackoverflow.com/a/15307743/11262798
-            utc = pytz.UTC
-            time = utc.localize(time)
-            return self.publish_time < time
+        return utc_naive(self.publish_time) < utc_naive(time)
+
+
+def utc_naive(time):
+    """Return a datetime as a naive UTC datetime, treating naive datetimes as UTC (as per Tweepy)."""
+    if time.tzinfo is None:
+        return time
+    return time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def snowflake_id(time):
+    """Return the smallest Snowflake Tweet ID (int) of a Tweet published at `time` (naive UTC).
+
+    Tweet IDs encode their publish time (in milliseconds), so IDs can be used to bound timeline
+    requests by time: https://developer.twitter.com/en/docs/twitter-ids.
+
+    """
+    ms = (utc_naive(time) - datetime.datetime(1970, 1, 1)) // datetime.timedelta(milliseconds=1)
+    return (ms - TWITTER_EPOCH_MS) << 22
+
+
+def cut_off_since_id(cut_off):
+    """Return the `since_id` (int) bounding a timeline to Tweets published since `cut_off`.
+
+    Returns None if `cut_off` predates Snowflake IDs (November 2010), in which case timelines
+    can't be bounded by ID.
+
+    """
+    since_id = snowflake_id(cut_off) - 1
+    return since_id if since_id > 0 else None
+
+
+def timeline_pages(method, since_id=None, max_id=None, budget=None, **kwargs):
+    """Yield pages (lists of Tweepy Status) of a timeline, newest first.
+
+    Pages of `TIMELINE_PAGE_SIZE` Tweets (the endpoint maximum) are requested lazily, as the
+    generator is consumed, each bounded by the `max_id` of the previous page. Unlike
+    `tweepy.Cursor`, earlier pages aren't retained.
+
+    Args:
+        method (callable): the API method, e.g. `api.user_timeline`.
+        since_id (int or str or None): if provided, only Tweets with a greater ID are returned.
+        max_id (int or str or None): if provided, only Tweets with an ID less than or equal to
+            `max_id` are returned.
+        budget (RequestBudget or None): a request budget to acquire before each page is
+            requested, or None.
+        **kwargs: other parameters of each request (e.g. `user_id`, `tweet_mode`).
+
+    """
+    while True:
+        if budget is not None:
+            budget.acquire()
+
+        page = method(since_id=since_id, max_id=max_id, count=TIMELINE_PAGE_SIZE, **kwargs)
+        if not page:
+            # Replies/Retweets are removed after `count` is applied, so only an empty page
+            # marks the end of the timeline
+            return
+
+        yield page
+        max_id = page[-1].id - 1
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import logging
+
+from top_tweets import get_tweets
+
+logger = logging.getLogger(__name__)
+
+
+def score(tweet, metric, normalise=False):
+    """Return a Tweet's leaderboard score (int or float) based on `metric`.
+
+    Args:
+        tweet (get_tweets.Tweet): the Tweet to score.
+        metric (str): the metric to score Tweets by (see `get_tweets.METRICS`).
+        normalise (bool): whether the score is normalised by the number of followers of the
+            Tweet's account, i.e. `metric` per 1,000 followers, so that Tweets by smaller accounts
+            can compete with those by larger accounts.
+
+    """
+    value = getattr(tweet, metric)
+    if normalise:
+        return 1000 * value / max(tweet.account.followers_count, 1)
+    return value
+
+
+def merge(ranked_tweets, metric, top_num=None, per_account=None, normalise=False):
+    """Yield the global top Tweets of several accounts, highest scoring first.
+
+    Each account's Tweets must already be sorted by `metric` (highest to lowest), e.g. as returned
+    by `Account.get_top_tweets_num()`. The sorted streams are combined with a heap-based k-way
+    merge (`heapq.merge`), so only the Tweets consumed are compared, rather than concatenating and
+    re-sorting every Tweet. Tweets with equal scores are yielded in the order of `ranked_tweets`.
+
+    Args:
+        ranked_tweets (iterable of iterable of get_tweets.Tweet): each account's Tweets, sorted by
+            `metric` (highest to lowest).
+        metric (str): the metric to rank Tweets by (see `get_tweets.METRICS`).
+        top_num (int or None): the maximum number of Tweets to yield, or None for every Tweet.
+        per_account (int or None): the maximum number of Tweets from any one account (e.g. 2), or
+            None for no limit.
+        normalise (bool): whether Tweets are ranked by `metric` per 1,000 account followers (see
+            `score()`). Normalising doesn't change the order of an account's own Tweets.
+
+    """
+    metric = get_tweets.Account._check_metric(metric)
+    streams = [itertools.islice(tweets, per_account) for tweets in ranked_tweets]
+    merged = heapq.merge(*streams, key=lambda t: score(t, metric, normalise), reverse=True)
+    return itertools.islice(merged, top_num)
+
+
+def fetch_leaderboard(accounts, num_days, metric, top_num, per_account=None, normalise=False,
+                      max_tweets=None, max_workers=8, timeout=None, max_requests=None):
+    """Fetch and return the global top Tweets of several accounts.
+
+    Each account's top Tweets are fetched concurrently (as per
+    `get_tweets.fetch_top_tweets_many()`); only the top `top_num` (or `per_account`, if fewer) of
+    each account are kept, which always contains the global top Tweets. These are then merged via
+    `merge()`. Accounts which couldn't be fetched are excluded from the leaderboard.
+
+    For example, fetch_leaderboard(accounts, 7, "likes", 10, per_account=2) would return the top 10
+    Tweets based on their number of Likes from the previous 7 days (including the current day),
+    with at most 2 Tweets from any one account.
+
+    Args:
+        accounts (list of get_tweets.Account): the accounts to rank Tweets across.
+        num_days (int): the historic Tweet collection period in days, including the current day.
+        metric (str): the metric to rank Tweets by (see `get_tweets.METRICS`).
+        top_num (int or None): the number of Tweets on the leaderboard, or None for every Tweet.
+        per_account (int or None): the maximum number of Tweets from any one account, or None.
+        normalise (bool): whether Tweets are ranked by `metric` per 1,000 account followers.
+        max_tweets (int or None): the maximum number of Tweets to retrieve for each account from
+            the previous `num_days` (defaults to None).
+        max_workers (int): the maximum number of accounts fetched at once.
+        timeout (int or float or None): the maximum number of seconds to spend fetching
+            (defaults to None).
+        max_requests (int or None): the maximum number of timeline requests (pages) shared by all
+            accounts (defaults to None).
+
+    Returns:
+        list of get_tweets.Tweet: the leaderboard, highest scoring first.
+
+    """
+    limits = [n for n in (top_num, per_account) if n is not None]
+    account_num = min(limits) if limits else None
+    results = get_tweets.fetch_top_tweets_many(accounts, num_days, metric, top_num=account_num,
+                                               max_tweets=max_tweets, max_workers=max_workers,
+                                               timeout=timeout, max_requests=max_requests)
+    for result in results:
+        if not result.ok:
+            logger.warning("Excluding '%s' from the leaderboard: %s", result.account, result.error,
+                           extra={"account": result.account.username})
+
+    ranked_tweets = [r.tweets for r in results if r.ok]
+    return list(merge(ranked_tweets, metric, top_num, per_account, normalise))
@@ -0,0 +1,248 @@
+import datetime
+import itertools
+import logging
+import sqlite3
+import sys
+import threading
+
+from top_tweets import get_tweets, telemetry, twitter_auth
+
+logger = logging.getLogger(__name__)
+
+RETWEET = "retweet"
+QUOTE = "quote"
+
+
+class ShareLedger:
+    """A persistent (SQLite) record of the Tweets shared (Retweeted or Quote Tweeted) by the bot.
+
+    The ledger allows "already shared" checks to be made locally (via indexed lookups) rather than
+    by paging through the bot's timeline. Entries are written by `Bot` whenever a Tweet is shared;
+    `backfill()` can be used to populate a new ledger from the bot's existing timeline and
+    `reconcile()` to check (and optionally correct) the ledger against the API.
+
+    Attributes:
+        path (str): the SQLite database file path (or ":memory:" for a temporary ledger).
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS shares (
+                    id INTEGER PRIMARY KEY,
+                    tweet_id TEXT NOT NULL,
+                    share_type TEXT NOT NULL,
+                    shared_at TEXT NOT NULL,
+                    share_id TEXT UNIQUE,
+                    username TEXT
+                );
+                CREATE INDEX IF NOT EXISTS shares_tweet_id ON shares (tweet_id);
+                CREATE INDEX IF NOT EXISTS shares_share_type ON shares (share_type);
+                CREATE INDEX IF NOT EXISTS shares_shared_at ON shares (shared_at);
+            """)
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._conn.close()
+
+    def record(self, tweet_id, share_type, shared_at=None, share_id=None, username=None):
+        """Record that a Tweet has been shared.
+
+        Args:
+            tweet_id (str): the shared (source) Tweet's unique identifier.
+            share_type (str): either `RETWEET` or `QUOTE`.
+            shared_at (datetime.datetime or None): when the Tweet was shared (defaults to now).
+            share_id (str or None): the unique identifier of the bot's Retweet/Quote Tweet, if
+                known. Entries with a `share_id` that has already been recorded are ignored.
+            username (str or None): the screen name of the source Tweet's author, if known.
+
+        """
+        assert share_type in (RETWEET, QUOTE), "{} is not a valid share type.".format(share_type)
+        if shared_at is None:
+            shared_at = datetime.datetime.utcnow()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO shares "
+                "(tweet_id, share_type, shared_at, share_id, username) VALUES (?, ?, ?, ?, ?)",
+                (str(tweet_id), share_type, _timestamp(shared_at), share_id, username))
+
+    def has_retweeted(self, tweet_id):
+        """Return whether (True/False) the Tweet has ever been Retweeted."""
+        return self._exists("tweet_id = ? AND share_type = ?", (str(tweet_id), RETWEET))
+
+    def has_quoted(self, tweet_id, cut_off):
+        """Return whether (True/False) the Tweet has been Quote Tweeted since `cut_off`.
+
+        Args:
+            tweet_id (str): the Tweet's unique identifier.
+            cut_off (datetime.datetime): the start of the assessment period.
+
+        """
+        return self._exists("tweet_id = ? AND share_type = ? AND shared_at >= ?",
+                            (str(tweet_id), QUOTE, _timestamp(cut_off)))
+
+    def retweeted_tweet_ids(self):
+        """Return the set of Tweet IDs (str) that have ever been Retweeted."""
+        return self._tweet_ids("share_type = ?", (RETWEET,))
+
+    def quoted_tweet_ids(self, cut_off):
+        """Return the set of Tweet IDs (str) that have been Quote Tweeted since `cut_off`."""
+        return self._tweet_ids("share_type = ? AND shared_at >= ?", (QUOTE, _timestamp(cut_off)))
+
+    def entries(self, cut_off=None):
+        """Return a list of (tweet_id, share_type, share_id) tuples shared since `cut_off`."""
+        query = "SELECT tweet_id, share_type, share_id FROM shares"
+        params = ()
+        if cut_off is not None:
+            query += " WHERE shared_at >= ?"
+            params = (_timestamp(cut_off),)
+
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY shared_at", params).fetchall()
+
+    def backfill(self, num_days=9999, api=None):
+        """Record the shares found on the bot's timeline from the previous `num_days`.
+
+        Intended to be run once when a ledger is first created; shares which have already been
+        recorded (based on the bot's Retweet/Quote Tweet ID) are ignored.
+
+        Args:
+            num_days (int): the historic period to backfill in days, including the current day.
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
+
+        Returns:
+            int: the number of shares found on the timeline.
+
+        """
+        shares = self._timeline_shares(num_days, api)
+        for tweet_id, share_type, shared_at, share_id in shares:
+            self.record(tweet_id, share_type, shared_at, share_id)
+
+        logger.info("Backfilled %d shares from the bot timeline.", len(shares),
+                    extra={"shares": len(shares)})
+        return len(shares)
+
+    def reconcile(self, num_days, api=None, fix=False):
+        """Compare the ledger against the bot's timeline for the previous `num_days`.
+
+        Args:
+            num_days (int): the historic period to compare in days, including the current day.
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
+            fix (bool): whether to add missing shares to, and remove stale shares from, the ledger.
+
+        Returns:
+            dict: "missing" (shares on the timeline but not in the ledger) and "stale" (shares in
+                the ledger with a `share_id` that is no longer on the timeline), each a list of
+                (tweet_id, share_type, share_id) tuples.
+
+        """
+        cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+        timeline = self._timeline_shares(num_days, api)
+        timeline_ids = {share_id for _, _, _, share_id in timeline}
+        recorded = self.entries(cut_off)
+        recorded_ids = {share_id for _, _, share_id in recorded}
+
+        missing = [(t, s, i) for t, s, _, i in timeline if i not in recorded_ids]
+        stale = [(t, s, i) for t, s, i in recorded if i is not None and i not in timeline_ids]
+
+        if fix:
+            for tweet_id, share_type, shared_at, share_id in timeline:
+                if share_id not in recorded_ids:
+                    self.record(tweet_id, share_type, shared_at, share_id)
+
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM shares WHERE share_id = ?",
+                                       [(i,) for _, _, i in stale])
+
+        logger.info("Reconciled ledger: %d missing, %d stale shares.", len(missing), len(stale),
+                    extra={"missing": len(missing), "stale": len(stale)})
+        return {"missing": missing, "stale": stale}
+
+    def _exists(self, where, params):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM shares WHERE {} LIMIT 1".format(where), params).fetchone()
+        return row is not None
+
+    def _tweet_ids(self, where, params):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT tweet_id FROM shares WHERE {}".format(where), params).fetchall()
+        return {r[0] for r in rows}
+
+    @staticmethod
+    def _timeline_shares(num_days, api):
+        """Return a list of (tweet_id, share_type, shared_at, share_id) from the bot timeline."""
+        if api is None:
+            api = twitter_auth.get_api()
+
+        cut_off = get_tweets.Account.cut_off_time(datetime.date.today(), num_days)
+        shares = []
+        # The API only returns Tweets published since the cut-off
+        pages = get_tweets.timeline_pages(api.user_timeline, get_tweets.cut_off_since_id(cut_off),
+                                          include_rts=True, exclude_replies=True,
+                                          tweet_mode="extended")
+        for t in itertools.chain.from_iterable(pages):
+            bot_tweet = get_tweets.Tweet(t, None)
+            if bot_tweet.publish_time < cut_off:
+                break
+
+            if bot_tweet.retweeted_tweet_id is not None:
+                shares.append((bot_tweet.retweeted_tweet_id, RETWEET,
+                               bot_tweet.publish_time, bot_tweet.id))
+            elif bot_tweet.quoted_tweet_id is not None:
+                shares.append((bot_tweet.quoted_tweet_id, QUOTE,
+                               bot_tweet.publish_time, bot_tweet.id))
+
+        return shares
+
+
+def _timestamp(time):
+    """Return a sortable UTC timestamp (str) for a naive (UTC) or offset-aware datetime."""
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main(argv=None):
+    """Backfill (`backfill [num_days]`) or reconcile (`reconcile num_days [--fix]`) the share
+    ledger.
+
+    `reconcile` prints the shares missing from the ledger and the stale shares in the ledger, and
+    only updates the ledger if `--fix` is provided.
+
+    """
+    from top_tweets import config
+
+    argv = sys.argv[1:] if argv is None else argv
+    fix = "--fix" in argv
+    argv = [a for a in argv if a != "--fix"]
+    assert len(argv) >= 1 and argv[0] in ("backfill", "reconcile"), \
+        "Usage: python -m top_tweets.ledger backfill [num_days] | reconcile num_days [--fix]"
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    ledger = ShareLedger(config.SHARE_LEDGER_PATH)
+    try:
+        if argv[0] == "backfill":
+            ledger.backfill(int(argv[1]) if len(argv) > 1 else 9999)
+            return
+
+        result = ledger.reconcile(int(argv[1]), fix=fix)
+        for status in ("missing", "stale"):
+            for tweet_id, share_type, share_id in result[status]:
+                print("{}: {} of Tweet {} (share {})".format(status, share_type, tweet_id,
+                                                            share_id))
+        if not fix and (result["missing"] or result["stale"]):
+            print("Run with --fix to update the ledger.")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
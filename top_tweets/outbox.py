@@ -0,0 +1,318 @@
+"""A persistent outbox of planned shares, published by a worker with retries.
+
+Usage: python -m top_tweets.outbox plan num_shares [num_days] [--dry-run] | drain [max_shares]
+
+`plan` plans `num_shares` shares (at most one per account) from the Tweets of every account in
+`SOURCE_USERNAMES` from the previous `num_days` (defaults to 7), and adds them to the outbox at
+`SHARE_OUTBOX_PATH` (see `config_sample.py`); with `--dry-run`, the plan (including each Quote
+Tweet's content) is printed instead, and nothing is published or added to the outbox. `drain`
+publishes the outbox's pending shares.
+"""
+import collections
+import datetime
+import logging
+import sqlite3
+import sys
+import threading
+import time
+
+import tweepy
+
+from top_tweets import ledger, telemetry, twitter_auth
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Twitter API error codes meaning the share has already been published (e.g. by an attempt
+# whose response was lost): "Status is a duplicate" and "You have already retweeted this Tweet"
+ALREADY_PUBLISHED_CODES = (187, 327)
+
+PlannedShare = collections.namedtuple("PlannedShare",
+                                      "key tweet_id share_type username rank content")
+PlannedShare.__doc__ = """A share planned by `bot.Bot.plan_shares()`.
+
+Attributes:
+    key (str): the share's idempotency key; a share is only added to an outbox once.
+    tweet_id (str): the unique identifier of the Tweet to share.
+    share_type (str): either `ledger.RETWEET` or `ledger.QUOTE`.
+    username (str): the screen name of the Tweet's author.
+    rank (int): the Tweet's rank among its author's Tweets.
+    content (str or None): the Quote Tweet content, or None for a Retweet.
+
+"""
+
+
+def share_key(tweet_id, share_type, planned_at=None):
+    """Return the idempotency key (str) of sharing a Tweet.
+
+    A Tweet can only be Retweeted once, whereas it can be Quote Tweeted again in a later
+    collection period, so Quote Tweet keys include the (UTC) day the share was planned.
+
+    """
+    if share_type == ledger.RETWEET:
+        return "{}:{}".format(share_type, tweet_id)
+    planned_at = planned_at or datetime.datetime.utcnow()
+    return "{}:{}:{}".format(share_type, tweet_id, planned_at.date().isoformat())
+
+
+def format_plan(plan):
+    """Return a human-readable description (str) of a list of `PlannedShare`."""
+    lines = []
+    for i, share in enumerate(plan, 1):
+        url = "https://twitter.com/{}/status/{}".format(share.username, share.tweet_id)
+        lines.append("{}. {} (rank {}) {}".format(i, share.share_type, share.rank, url))
+        if share.content is not None:
+            lines.append("   " + share.content)
+    return "\n".join(lines)
+
+
+class ShareOutbox:
+    """A persistent (SQLite) queue of planned shares, each published at most once.
+
+    Shares are added by `enqueue()` (e.g. from `bot.Bot.plan_shares()`) and published in order by
+    `drain()`, so a failure partway through a batch leaves the remaining shares pending rather
+    than lost. Each share has an idempotency key: re-enqueuing a planned share is ignored, and a
+    share is marked as sent (rather than published again) if the API reports it as a duplicate,
+    e.g. when retrying a share whose response was lost.
+
+    Attributes:
+        path (str): the SQLite database file path (or ":memory:" for a temporary outbox).
+
+    Args:
+        clock (callable): returns the current (epoch) time.
+        sleep (callable): waits for a number of seconds.
+
+    """
+    def __init__(self, path, clock=time.time, sleep=time.sleep):
+        self.path = path
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT UNIQUE NOT NULL,
+                    tweet_id TEXT NOT NULL,
+                    share_type TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    rank INTEGER,
+                    content TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    next_attempt REAL NOT NULL,
+                    share_id TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, next_attempt);
+                CREATE INDEX IF NOT EXISTS outbox_tweet_id ON outbox (tweet_id);
+            """)
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._conn.close()
+
+    def enqueue(self, plan):
+        """Add planned shares to the outbox, returning the number added (int).
+
+        Shares whose key is already in the outbox, or whose Tweet already has a share waiting to
+        be published, are ignored.
+
+        Args:
+            plan (list of PlannedShare): the shares to add, in the order they're published.
+
+        """
+        added = 0
+        now = self._clock()
+        with self._lock, self._conn:
+            for share in plan:
+                waiting = self._conn.execute(
+                    "SELECT 1 FROM outbox WHERE tweet_id = ? AND status IN (?, ?)",
+                    (share.tweet_id, PENDING, SENDING)).fetchone()
+                if waiting is not None:
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO outbox (key, tweet_id, share_type, username, rank, "
+                    "content, status, enqueued_at, next_attempt) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (share.key, share.tweet_id, share.share_type, share.username, share.rank,
+                     share.content, PENDING, now, now))
+                added += cursor.rowcount
+        return added
+
+    def entries(self, status=None):
+        """Return a list of (key, status, attempts, share_id, error) tuples, in publish order."""
+        query = "SELECT key, status, attempts, share_id, error FROM outbox"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY id", params).fetchall()
+
+    def drain(self, api=None, share_ledger=None, max_shares=None, spacing=60, max_attempts=5,
+              retry_delay=60, send_timeout=5 * 60):
+        """Publish the outbox's pending shares, in order.
+
+        Shares are published `spacing` seconds apart. A share that fails is retried by a later
+        drain after `retry_delay` seconds (doubling for each attempt), and marked as failed after
+        `max_attempts`. Draining stops at a rate limit error, leaving the share pending. Each share
+        is claimed (marked "sending") atomically before it's published, so concurrent drains (e.g.
+        overlapping cron runs) never publish the same share. Shares left "sending" for
+        `send_timeout` seconds (e.g. by an interrupted drain) are published again, unless
+        `share_ledger` has recorded them (the API also rejects duplicates).
+
+        Args:
+            api (tweepy.API or None): the authenticated bot API (defaults to
+                `twitter_auth.get_api()`).
+            share_ledger (ledger.ShareLedger or None): if provided, shares are recorded in the
+                ledger.
+            max_shares (int or None): the maximum number of shares to publish.
+            spacing (int or float): the number of seconds between shares.
+            max_attempts (int): the maximum number of attempts to publish each share.
+            retry_delay (int or float): the number of seconds before a failed share is retried.
+            send_timeout (int or float): the number of seconds after which a share left "sending"
+                is published again.
+
+        Returns:
+            int: the number of shares published.
+
+        """
+        if api is None:
+            api = twitter_auth.get_api()
+
+        sent = 0
+        while max_shares is None or sent < max_shares:
+            row = self._next()
+            if row is None:
+                break
+            if sent > 0 and spacing:
+                self._sleep(spacing)
+
+            id_, tweet_id, share_type, username, content, status, attempts, enqueued_at = row
+            if status == SENDING and self._recorded(share_ledger, tweet_id, share_type,
+                                                    enqueued_at):
+                self._update(id_, SENT)
+                continue
+
+            if not self._claim(id_, status, attempts, self._clock() + send_timeout):
+                # Claimed by a concurrent drain
+                continue
+            try:
+                share_id = self._send(api, tweet_id, share_type, username, content)
+            except tweepy.RateLimitError as e:
+                self._update(id_, PENDING, attempts=attempts,
+                             next_attempt=self._clock() + retry_delay, error=str(e))
+                logger.warning("Rate limited; %s shares left pending", len(self.entries(PENDING)))
+                break
+            except tweepy.TweepError as e:
+                if e.api_code in ALREADY_PUBLISHED_CODES:
+                    self._update(id_, SENT, error=str(e))
+                elif attempts + 1 >= max_attempts:
+                    self._update(id_, FAILED, error=str(e))
+                    logger.error("Failed to share Tweet %s: %s", tweet_id, e,
+                                 extra={"tweet_id": tweet_id, "account": username})
+                else:
+                    delay = retry_delay * 2 ** attempts
+                    self._update(id_, PENDING, next_attempt=self._clock() + delay, error=str(e))
+                    logger.warning("Unable to share Tweet %s (retrying in %ss): %s", tweet_id,
+                                   delay, e, extra={"tweet_id": tweet_id, "account": username})
+                continue
+
+            self._update(id_, SENT, share_id=share_id)
+            if share_ledger is not None:
+                share_ledger.record(tweet_id, share_type, share_id=share_id, username=username)
+            telemetry.inc("outbox_shares_total", share_type=share_type)
+            sent += 1
+
+        return sent
+
+    def _next(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, tweet_id, share_type, username, content, status, attempts, enqueued_at "
+                "FROM outbox WHERE status IN (?, ?) AND next_attempt <= ? ORDER BY id LIMIT 1",
+                (PENDING, SENDING, self._clock())).fetchone()
+
+    def _claim(self, id_, status, attempts, send_timeout):
+        """Mark a share as "sending" (until the `send_timeout` time), returning whether
+        (True/False) it was claimed, i.e. hadn't been claimed since it was read."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (SENDING, send_timeout, id_, status, attempts))
+        return cursor.rowcount == 1
+
+    def _update(self, id_, status, **fields):
+        fields["status"] = status
+        assignments = ", ".join("{} = ?".format(name) for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE outbox SET {} WHERE id = ?".format(assignments),
+                               list(fields.values()) + [id_])
+
+    @staticmethod
+    def _recorded(share_ledger, tweet_id, share_type, enqueued_at):
+        """Return whether (True/False) the ledger has recorded the share since it was enqueued."""
+        if share_ledger is None:
+            return False
+        if share_type == ledger.RETWEET:
+            return share_ledger.has_retweeted(tweet_id)
+        return share_ledger.has_quoted(tweet_id, datetime.datetime.utcfromtimestamp(enqueued_at))
+
+    @staticmethod
+    def _send(api, tweet_id, share_type, username, content):
+        """Publish a share, returning the bot's Tweet's unique identifier (str)."""
+        url = "https://twitter.com/{}/status/{}".format(username, tweet_id)
+        logger.info("Publishing %s of %s", share_type, url,
+                    extra={"tweet_id": tweet_id, "account": username})
+        with telemetry.timer("stage_seconds", stage="publish"):
+            if share_type == ledger.RETWEET:
+                status = api.retweet(tweet_id)
+            else:
+                status = api.update_status(content, attachment_url=url)
+        return status.id_str
+
+
+def main(argv=None):
+    """Plan shares into (`plan`), or publish shares from (`drain`), the outbox."""
+    from top_tweets import bot, config
+
+    argv = sys.argv[1:] if argv is None else argv
+    dry_run = "--dry-run" in argv
+    argv = [a for a in argv if a != "--dry-run"]
+    assert len(argv) >= 1 and argv[0] in ("plan", "drain"), \
+        "Usage: python -m top_tweets.outbox plan num_shares [num_days] [--dry-run] | " \
+        "drain [max_shares]"
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    ledger_path = getattr(config, "SHARE_LEDGER_PATH", None)
+    share_ledger = ledger.ShareLedger(ledger_path) if ledger_path is not None else None
+    if argv[0] == "plan":
+        share_bot = bot.Bot(usernames=config.SOURCE_USERNAMES, ledger=share_ledger)
+        num_days = int(argv[2]) if len(argv) > 2 else 7
+        plan = share_bot.plan_shares(num_days, int(argv[1]), extra_hashtags=config.HASHTAGS)
+        if dry_run:
+            print(format_plan(plan))
+            return
+
+    outbox = ShareOutbox(config.SHARE_OUTBOX_PATH)
+    try:
+        if argv[0] == "plan":
+            logger.info("Added %s shares to the outbox", outbox.enqueue(plan))
+        else:
+            max_shares = int(argv[1]) if len(argv) > 1 else None
+            outbox.drain(share_ledger=share_ledger, max_shares=max_shares)
+    finally:
+        outbox.close()
+
+
+if __name__ == "__main__":
+    main()
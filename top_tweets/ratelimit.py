@@ -0,0 +1,235 @@
+import functools
+import logging
+import math
+import threading
+import time
+import urllib.parse
+
+import tweepy
+
+from top_tweets import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Rate limit window (seconds) and requests per window for each paced API method, per user:
+# https://developer.twitter.com/en/docs/twitter-api/v1/rate-limits
+DEFAULT_LIMITS = {
+    "user_timeline": (15 * 60, 900),
+    "lookup_users": (15 * 60, 900),
+    "get_user": (15 * 60, 900),
+    "get_status": (15 * 60, 900),
+    "statuses_lookup": (15 * 60, 900),
+    "update_status": (3 * 60 * 60, 300),
+    "retweet": (3 * 60 * 60, 300),
+}
+
+# The `rate_limit_status` resource of each paced API method (updates/Retweets aren't included)
+RESOURCES = {
+    "user_timeline": ("statuses", "/statuses/user_timeline"),
+    "lookup_users": ("users", "/users/lookup"),
+    "get_user": ("users", "/users/show/:id"),
+    "get_status": ("statuses", "/statuses/show/:id"),
+    "statuses_lookup": ("statuses", "/statuses/lookup"),
+}
+
+# The request path of each paced API method, used to check which endpoint a response is from
+PATHS = {
+    "user_timeline": "/statuses/user_timeline.json",
+    "lookup_users": "/users/lookup.json",
+    "get_user": "/users/show.json",
+    "get_status": "/statuses/show.json",
+    "statuses_lookup": "/statuses/lookup.json",
+    "update_status": "/statuses/update.json",
+    "retweet": "/statuses/retweet/",
+}
+
+
+class EndpointLimit:
+    """The rate limit state of a single API endpoint.
+
+    Attributes:
+        window (int): the length of the rate limit window in seconds.
+        limit (int): the number of requests allowed per window.
+        remaining (int): the number of requests remaining in the current window.
+        reset (float or None): the (epoch) time the current window ends, or None if unknown.
+
+    """
+    def __init__(self, window, limit):
+        self.window = window
+        self.limit = limit
+        self.remaining = limit
+        self.reset = None
+
+    def update(self, headers):
+        """Update the state from a response's `x-rate-limit-*` headers (if present).
+
+        Within the same window, the remaining quota is never increased, as responses to
+        concurrent requests may be read out of order (and requests may have been reserved since).
+
+        """
+        reset = headers.get("x-rate-limit-reset")
+        reset = float(reset) if reset is not None else self.reset
+        if headers.get("x-rate-limit-limit") is not None:
+            self.limit = int(headers["x-rate-limit-limit"])
+        if headers.get("x-rate-limit-remaining") is not None:
+            remaining = int(headers["x-rate-limit-remaining"])
+            if reset is not None and reset == self.reset:
+                remaining = min(remaining, self.remaining)
+            self.remaining = remaining
+        self.reset = reset
+
+
+class RateLimitScheduler:
+    """Wrap a Tweepy API object, pacing requests to match each endpoint's rate limit.
+
+    The remaining quota and reset time of each endpoint in `DEFAULT_LIMITS` is tracked from the
+    `x-rate-limit-*` response headers. Requests are made immediately while quota remains; once an
+    endpoint's quota is used up, requests to it wait (in a queue, if from several threads) until
+    the window resets, rather than retrying after a fixed delay. A rate limited (429) response is
+    retried once the window resets.
+
+    Any other attribute (e.g. unpaced API methods) is passed through to the wrapped API object, so
+    the scheduler can be used anywhere a Tweepy API object is.
+
+    Attributes:
+        api (tweepy.API): the wrapped API object.
+        limits (dict of str: EndpointLimit): the rate limit state of each paced API method.
+        max_retries (int): the maximum number of times a rate limited request is retried.
+
+    """
+    def __init__(self, api, max_retries=3, clock=time.time, sleep=time.sleep):
+        self.api = api
+        self.limits = {name: EndpointLimit(*limits) for name, limits in DEFAULT_LIMITS.items()}
+        self.max_retries = max_retries
+        self._clock = clock
+        self._sleep = sleep
+        self._condition = threading.Condition()
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if name not in DEFAULT_LIMITS:
+            return attr
+
+        # `wraps` retains the method's `pagination_mode`, required by `tweepy.Cursor`
+        @functools.wraps(attr)
+        def paced(*args, **kwargs):
+            if kwargs.get("create"):
+                # `tweepy.Cursor` calls methods with `create=True` to access the underlying
+                # method object, which doesn't make a request
+                return attr(*args, **kwargs)
+            return self._request(name, attr, *args, **kwargs)
+
+        return paced
+
+    def expected_wait(self, requests):
+        """Return the expected number of seconds to wait for a set of requests to be allowed.
+
+        Args:
+            requests (dict of str: int): the number of requests to be made per API method, e.g.
+                {"user_timeline": 1000, "lookup_users": 3}.
+
+        Returns:
+            float: the longest wait (across API methods) before all requests can be made, assuming
+                no other requests are made.
+
+        """
+        now = self._clock()
+        wait = 0
+        with self._condition:
+            for name, num_requests in requests.items():
+                limit = self.limits[name]
+                remaining = limit.remaining
+                reset = limit.reset
+                if reset is None or reset <= now:
+                    remaining, reset = limit.limit, now + limit.window
+
+                if num_requests <= remaining:
+                    continue
+
+                windows = math.ceil((num_requests - remaining) / limit.limit)
+                wait = max(wait, (reset - now) + (windows - 1) * limit.window)
+
+        return wait
+
+    def refresh(self):
+        """Update the tracked quotas of every endpoint via a single `rate_limit_status` request."""
+        status = self.api.rate_limit_status(resources="statuses,users")
+        with self._condition:
+            for name, (family, resource) in RESOURCES.items():
+                state = status["resources"].get(family, {}).get(resource)
+                if state is not None:
+                    self.limits[name].limit = state["limit"]
+                    self.limits[name].remaining = state["remaining"]
+                    self.limits[name].reset = float(state["reset"])
+            self._condition.notify_all()
+
+    def _request(self, name, method, *args, **kwargs):
+        """Make a request once the endpoint's quota allows, retrying if rate limited."""
+        for retries in range(self.max_retries + 1):
+            self._acquire(name)
+            telemetry.inc("api_requests_total", endpoint=name)
+            try:
+                with telemetry.timer("api_request_seconds", endpoint=name):
+                    result = method(*args, **kwargs)
+            except tweepy.TweepError as e:
+                response = getattr(e, "response", None)
+                if response is None or response.status_code not in (420, 429):
+                    raise
+                self._update(name, response.headers, exhausted=True)
+                if retries == self.max_retries:
+                    raise
+                logger.warning("Rate limited (%s); waiting for the window to reset...", name,
+                               extra={"endpoint": name})
+                continue
+
+            # `last_response` is shared by every thread using the API object, so it may be the
+            # response to a concurrent request to another endpoint
+            response = getattr(self.api, "last_response", None)
+            if response is not None and self._from_endpoint(name, response):
+                self._update(name, response.headers)
+            return result
+
+    @staticmethod
+    def _from_endpoint(name, response):
+        """Return whether (True/False) a response is from a request to the endpoint (or unknown,
+        e.g. an offline API's response without a URL)."""
+        url = getattr(response, "url", None)
+        if not url:
+            return True
+        return PATHS[name] in urllib.parse.urlsplit(url).path
+
+    def _acquire(self, name):
+        """Wait until a request to the endpoint is allowed, and reserve it."""
+        limit = self.limits[name]
+        with self._condition:
+            while True:
+                now = self._clock()
+                if limit.reset is not None and limit.reset <= now:
+                    # The window has reset (without a response to confirm it yet)
+                    limit.remaining = limit.limit
+                    limit.reset = None
+
+                if limit.remaining > 0:
+                    limit.remaining -= 1
+                    return
+
+                wait = limit.window if limit.reset is None else limit.reset - now
+                logger.info("Waiting %.0f seconds for the %s rate limit to reset...", wait, name,
+                            extra={"endpoint": name, "wait": wait})
+                telemetry.inc("rate_limit_waits_total", endpoint=name)
+                telemetry.inc("rate_limit_wait_seconds_total", wait, endpoint=name)
+                self._condition.release()
+                try:
+                    self._sleep(wait)
+                finally:
+                    self._condition.acquire()
+
+    def _update(self, name, headers, exhausted=False):
+        limit = self.limits[name]
+        with self._condition:
+            limit.update(headers)
+            if exhausted:
+                limit.remaining = 0
+                if limit.reset is None or limit.reset <= self._clock():
+                    limit.reset = self._clock() + float(headers.get("retry-after", limit.window))
+            self._condition.notify_all()
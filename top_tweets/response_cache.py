@@ -0,0 +1,305 @@
+import collections
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import tweepy
+
+from top_tweets import telemetry
+
+# Seconds each read endpoint's responses are cached for. Timeline pages include engagement
+# metrics (Likes/Retweets), so are cached for less time than users.
+DEFAULT_TTLS = {
+    "user_timeline": 5 * 60,
+    "get_user": 60 * 60,
+    "lookup_users": 60 * 60,
+    "get_status": 5 * 60,
+}
+
+# Methods that publish to the bot's timeline, invalidating its cached pages (and those of the
+# shared Tweet)
+WRITE_METHODS = ("update_status", "retweet")
+
+# The parameters identifying a timeline's user; requests without any are for the bot's timeline
+_USER_PARAMS = ("id", "user_id", "screen_name")
+
+_Entry = collections.namedtuple("_Entry", "endpoint user expires size result")
+
+
+class ResponseCache:
+    """Wrap a Tweepy API object, caching the responses of read endpoints for a period of time.
+
+    Responses are cached by endpoint and parameters, so identical requests (e.g. the same user
+    looked up by each `Account`, or the first page of the bot's timeline requested for each
+    eligibility check) are only sent once per `ttls` period. The cache is bounded by a number of
+    entries and/or a total size (of the responses' JSON), evicting the least recently used
+    responses first. If `path` is provided, responses are also stored in a SQLite database, so
+    they can be shared between processes (e.g. cron runs of `bot.py`).
+
+    Publishing via `update_status` or `retweet` invalidates every cached page of the bot's
+    timeline, so "already shared" checks always see the bot's latest Tweets, and every cached
+    response including the shared (e.g. Retweeted) Tweet, such as its author's timeline pages.
+
+    Any other attribute is passed through to the wrapped API object (e.g. a
+    `ratelimit.RateLimitScheduler`, so only cache misses are paced). Cached responses are shared,
+    so shouldn't be modified.
+
+    Attributes:
+        api (tweepy.API): the wrapped API object.
+        ttls (dict of str: int or float): the number of seconds each cached endpoint's responses
+            are cached for. Other endpoints aren't cached.
+        max_entries (int or None): the maximum number of cached responses, or None for no limit.
+        max_bytes (int or None): the maximum total size (in bytes of JSON) of cached responses,
+            or None for no limit.
+        path (str or None): the SQLite database file path, or None to cache in memory only.
+
+    """
+    def __init__(self, api, ttls=None, max_entries=1024, max_bytes=None, path=None,
+                 clock=time.time):
+        self.api = api
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._bot_users = {""}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        endpoint TEXT NOT NULL,
+                        user TEXT NOT NULL,
+                        expires REAL NOT NULL,
+                        accessed REAL NOT NULL,
+                        body TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS responses_user ON responses (endpoint, user);
+                    CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+                """)
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if name in WRITE_METHODS:
+            def write(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                if not kwargs.get("create"):
+                    self.invalidate_bot_timeline(getattr(result, "user", None))
+                    shared_id = _shared_status_id(name, args, kwargs)
+                    if shared_id is not None:
+                        self.invalidate_status(shared_id)
+                return result
+
+            write.__dict__.update(getattr(attr, "__dict__", {}))
+            return write
+
+        if name not in self.ttls:
+            return attr
+
+        def cached(*args, **kwargs):
+            if kwargs.get("create") or "parser" in kwargs:
+                # `tweepy.Cursor` accesses the method object or requests raw payloads
+                return attr(*args, **kwargs)
+            return self._request(name, attr, args, kwargs)
+
+        # Retain the method's `pagination_mode`, required by `tweepy.Cursor`
+        cached.__dict__.update(getattr(attr, "__dict__", {}))
+        return cached
+
+    @property
+    def num_entries(self):
+        """int: the number of responses cached in memory."""
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def size(self):
+        """int: the total size (in bytes of JSON) of the responses cached in memory."""
+        with self._lock:
+            return self._size
+
+    def invalidate(self, endpoint=None):
+        """Remove the cached responses of `endpoint`, or of every endpoint if None."""
+        with self._lock:
+            self._remove(lambda e: endpoint is None or e.endpoint == endpoint)
+            if self._conn is not None:
+                with self._conn:
+                    if endpoint is None:
+                        self._conn.execute("DELETE FROM responses")
+                    else:
+                        self._conn.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+
+    def invalidate_bot_timeline(self, bot_user=None):
+        """Remove every cached page of the bot's timeline.
+
+        Args:
+            bot_user (tweepy.User or None): the bot's user (e.g. from a published Status), so that
+                pages requested by the bot's ID or screen name are also removed.
+
+        """
+        with self._lock:
+            if bot_user is not None:
+                self._bot_users.update((bot_user.id_str, bot_user.screen_name.lower()))
+            users = set(self._bot_users)
+            self._remove(lambda e: e.endpoint == "user_timeline" and e.user in users)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.executemany(
+                        "DELETE FROM responses WHERE endpoint = 'user_timeline' AND user = ?",
+                        [(u,) for u in users])
+
+    def invalidate_status(self, status_id):
+        """Remove every cached response including a Status (e.g. once it's been shared, as its
+        `retweeted` flag has changed), such as its `get_status` response and timeline pages.
+
+        Args:
+            status_id (int or str): the Status's unique identifier.
+
+        """
+        status_id = str(status_id)
+
+        def includes(entry):
+            statuses = entry.result if isinstance(entry.result, list) else [entry.result]
+            return any(getattr(s, "id_str", None) == status_id for s in statuses)
+
+        with self._lock:
+            self._remove(includes)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses WHERE body LIKE ?",
+                                       ('%"id_str": "{}"%'.format(status_id),))
+
+    def close(self):
+        """Close the underlying database connection (if any)."""
+        if self._conn is not None:
+            self._conn.close()
+
+    def _request(self, endpoint, method, args, kwargs):
+        key, user = _cache_key(endpoint, args, kwargs)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._remove(lambda e: e is entry)
+                entry = None
+            if entry is None and self._conn is not None:
+                entry = self._load(key, now)
+            if entry is not None:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                telemetry.inc("cache_requests_total", cache="responses", result="hit")
+                return entry.result
+
+        telemetry.inc("cache_requests_total", cache="responses", result="miss")
+        result = method(*args, **kwargs)
+        body = _encode(result)
+        if body is not None:
+            entry = _Entry(endpoint, user, now + self.ttls[endpoint], len(body), result)
+            with self._lock:
+                self._store(key, entry, body, now)
+        return result
+
+    def _load(self, key, now):
+        row = self._conn.execute("SELECT endpoint, user, expires, body FROM responses "
+                                 "WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        if row is None:
+            return None
+
+        endpoint, user, expires, body = row
+        entry = _Entry(endpoint, user, expires, len(body), _decode(body, self.api))
+        with self._conn:
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry, body=None, now=None):
+        if key in self._entries:
+            self._size -= self._entries.pop(key).size
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._entries and self._over_limit(len(self._entries), self._size):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+        if body is not None and self._conn is not None:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                   (key, entry.endpoint, entry.user, entry.expires, now, body))
+                self._conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+                self._prune()
+
+    def _prune(self):
+        """Evict the least recently used responses from the database, as per the memory limits."""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+
+        rows = self._conn.execute("SELECT key, length(body) FROM responses "
+                                  "ORDER BY accessed DESC").fetchall()
+        num_entries, size = 0, 0
+        evicted = []
+        for key, length in rows:
+            num_entries += 1
+            size += length
+            if self._over_limit(num_entries, size):
+                evicted.append((key,))
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def _over_limit(self, num_entries, size):
+        return ((self.max_entries is not None and num_entries > self.max_entries)
+                or (self.max_bytes is not None and size > self.max_bytes))
+
+    def _remove(self, predicate):
+        for key, entry in list(self._entries.items()):
+            if predicate(entry):
+                del self._entries[key]
+                self._size -= entry.size
+
+
+def _cache_key(endpoint, args, kwargs):
+    """Return the cache key (str) and timeline user (str; "" for the bot) of a request."""
+    params = {k: str(v) for k, v in kwargs.items() if v is not None}
+    for name in ("screen_name", "screen_names"):
+        if name in params:
+            params[name] = params[name].lower()
+    user = next((params[p].lower() for p in _USER_PARAMS if p in params), "")
+    if args:
+        user = str(args[0]).lower()
+    return json.dumps([endpoint, [str(a) for a in args], sorted(params.items())]), user
+
+
+def _shared_status_id(method, args, kwargs):
+    """Return the ID (str) of the Tweet shared by a write request, or None if it isn't known."""
+    if method == "retweet":
+        status_id = args[0] if args else kwargs.get("id")
+        return str(status_id) if status_id is not None else None
+
+    match = re.search(r"/status/(\d+)", kwargs.get("attachment_url") or "")
+    return match.group(1) if match is not None else None
+
+
+def _encode(result):
+    """Return the JSON (str) of a Tweepy model or list of models, or None if not cacheable."""
+    many = isinstance(result, list)
+    models = result if many else [result]
+    if not all(isinstance(m, (tweepy.models.Status, tweepy.models.User)) for m in models):
+        return None
+    return json.dumps({"many": many,
+                       "models": [[type(m).__name__, m._json] for m in models]})
+
+
+def _decode(body, api):
+    data = json.loads(body)
+    models = [getattr(tweepy.models, name).parse(api, model) for name, model in data["models"]]
+    if not data["many"]:
+        return models[0]
+
+    results = tweepy.models.ResultSet()
+    results.extend(models)
+    return results
@@ -0,0 +1,175 @@
+import collections
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WEIGHTED = "weighted"
+ROUND_ROBIN = "round_robin"
+
+AccountStats = collections.namedtuple(
+    "AccountStats", "user_id last_fetch num_tweets num_days num_eligible last_share last_failure")
+AccountStats.__doc__ = """The selection statistics of a single account.
+
+Attributes:
+    user_id (str): the account's user's unique identifier.
+    last_fetch (float or None): when (epoch time) the account's Tweets were last fetched.
+    num_tweets (int or None): the number of Tweets published in the last fetch's period.
+    num_days (int or None): the last fetch's collection period in days.
+    num_eligible (int or None): the number of those Tweets that hadn't been shared.
+    last_share (float or None): when (epoch time) a Tweet by the account was last shared.
+    last_failure (float or None): when (epoch time) a fetch for the account last failed.
+
+"""
+AccountStats.__new__.__defaults__ = (None,) * 6
+
+
+class AccountSelector:
+    """Choose which account to share from, skipping accounts known to have nothing to share.
+
+    Per-account statistics (`AccountStats`) are recorded by `bot.Bot` whenever an account's
+    Tweets are fetched or shared, or a fetch fails. `order()` returns the accounts worth trying,
+    in the order they should be tried:
+        - "weighted": randomly, weighted by each account's number of eligible (unshared) Tweets
+            (accounts that haven't been fetched are weighted by the average)
+        - "round_robin": least recently shared first
+    Accounts are skipped while they're known to be exhausted (every fetched Tweet has been
+    shared) until they're expected to have published a new Tweet (based on their posting
+    volume, up to `max_skip` seconds), and for `failure_backoff` seconds after a failed fetch.
+
+    Attributes:
+        path (str): the SQLite database file path (or ":memory:" for temporary statistics), so
+            that statistics are kept between runs (e.g. from cron).
+        strategy (str): either `WEIGHTED` or `ROUND_ROBIN`.
+        max_skip (int or float): the maximum number of seconds an exhausted account is skipped.
+        failure_backoff (int or float): the number of seconds an account is skipped after a
+            failed fetch.
+
+    Args:
+        clock (callable): returns the current (epoch) time.
+        rng (random.Random or None): the random number generator used for weighted selection.
+
+    """
+    def __init__(self, path=":memory:", strategy=WEIGHTED, max_skip=24 * 60 * 60,
+                 failure_backoff=60 * 60, clock=time.time, rng=None):
+        assert strategy in (WEIGHTED, ROUND_ROBIN), "{} is not a valid strategy.".format(strategy)
+        self.path = path
+        self.strategy = strategy
+        self.max_skip = max_skip
+        self.failure_backoff = failure_backoff
+        self._clock = clock
+        self._rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS account_stats (
+                    user_id TEXT PRIMARY KEY,
+                    last_fetch REAL,
+                    num_tweets INTEGER,
+                    num_days INTEGER,
+                    num_eligible INTEGER,
+                    last_share REAL,
+                    last_failure REAL
+                )
+            """)
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._conn.close()
+
+    def stats(self, user_id):
+        """Return an account's `AccountStats` (with None fields if nothing has been recorded)."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM account_stats WHERE user_id = ?",
+                                     (str(user_id),)).fetchone()
+        return AccountStats(*row) if row is not None else AccountStats(str(user_id))
+
+    def record_fetch(self, user_id, num_tweets, num_days, num_eligible):
+        """Record that an account's Tweets have been fetched (and checked against previous shares).
+
+        Args:
+            user_id (str): the account's user's unique identifier.
+            num_tweets (int): the number of Tweets fetched from the collection period.
+            num_days (int): the collection period in days.
+            num_eligible (int): the number of the fetched Tweets that haven't been shared.
+
+        """
+        self._update(user_id, last_fetch=self._clock(), num_tweets=num_tweets, num_days=num_days,
+                     num_eligible=num_eligible, last_failure=None)
+
+    def record_share(self, user_id):
+        """Record that a Tweet by an account has been shared."""
+        # Decremented by the database, so concurrent updates (e.g. by another process) aren't lost
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO account_stats (user_id) VALUES (?)",
+                               (str(user_id),))
+            self._conn.execute(
+                "UPDATE account_stats SET last_share = ?, num_eligible = CASE "
+                "WHEN num_eligible > 0 THEN num_eligible - 1 ELSE num_eligible END "
+                "WHERE user_id = ?", (self._clock(), str(user_id)))
+
+    def record_failure(self, user_id):
+        """Record that fetching an account's Tweets failed."""
+        self._update(user_id, last_failure=self._clock())
+
+    def retry_time(self, user_id):
+        """Return when (epoch time) an account is next worth trying (0 if it's worth trying now)."""
+        return self._retry(self.stats(user_id))[0]
+
+    def order(self, user_ids):
+        """Return the accounts worth trying (a sublist of `user_ids`), in the order to try them."""
+        now = self._clock()
+        available = []
+        for user_id in user_ids:
+            stats = self.stats(user_id)
+            retry_time, reason = self._retry(stats)
+            if retry_time <= now:
+                available.append(stats)
+            else:
+                logger.info("Skipping user %s until %s (%s)...", user_id,
+                            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(retry_time)),
+                            reason, extra={"user_id": str(user_id)})
+
+        if self.strategy == ROUND_ROBIN:
+            self._rng.shuffle(available)
+            available.sort(key=lambda s: s.last_share or 0)
+            return [s.user_id for s in available]
+
+        known = [s.num_eligible for s in available if s.num_eligible is not None]
+        default = sum(known) / len(known) if known and sum(known) > 0 else 1
+        weights = [default if s.num_eligible is None else max(s.num_eligible, 0.1)
+                   for s in available]
+        ordered = []
+        while available:
+            index = self._rng.choices(range(len(available)), weights)[0]
+            ordered.append(available.pop(index).user_id)
+            weights.pop(index)
+        return ordered
+
+    def _retry(self, stats):
+        """Return a tuple (float, str) of when an account is next worth trying and why."""
+        retry_time, reason = 0, None
+        if stats.last_failure is not None:
+            retry_time, reason = stats.last_failure + self.failure_backoff, "fetch failed"
+        if stats.num_eligible == 0:
+            # Any new Tweet is eligible, so wait for the interval between the account's Tweets
+            interval = self.max_skip
+            if stats.num_tweets:
+                interval = min(interval, stats.num_days * 24 * 60 * 60 / stats.num_tweets)
+            if stats.last_fetch + interval > retry_time:
+                retry_time, reason = stats.last_fetch + interval, "nothing to share"
+        return retry_time, reason
+
+    def _update(self, user_id, **fields):
+        """Set fields of an account's statistics (only those provided, so concurrent updates of
+        other fields aren't lost)."""
+        assignments = ", ".join("{} = ?".format(name) for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO account_stats (user_id) VALUES (?)",
+                               (str(user_id),))
+            self._conn.execute("UPDATE account_stats SET {} WHERE user_id = ?".format(assignments),
+                               list(fields.values()) + [str(user_id)])
@@ -0,0 +1,207 @@
+import collections
+import contextlib
+import threading
+
+from top_tweets import telemetry
+
+
+class Group:
+    """Coalesce concurrent work for the same key (e.g. an account's timeline) into one flight.
+
+    A caller joins an in-flight value for its key whose window covers the caller's window (e.g. a
+    timeline fetched since an earlier cut-off contains every Tweet since a later one), or starts a
+    new flight if there isn't one. The flight is shared until its last caller leaves, after which
+    the next caller starts a new flight, so values are never reused once they're complete (see
+    `response_cache.py` for caching).
+
+    Attributes:
+        name (str): the group's name, used to label its metrics.
+
+    """
+    _Flight = collections.namedtuple("_Flight", "window value callers")
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def join(self, key, window, start):
+        """Return a context manager yielding a caller's handle of an in-flight (or new) flight.
+
+        Args:
+            key (hashable): identifies the work, e.g. (API, user ID).
+            window (comparable): the extent of work the caller requires; a flight covers the
+                caller if its window is less than or equal to the caller's (e.g. the start time or
+                `since_id` of a timeline).
+            start (callable): called with `window` to create the value of a new flight, e.g. a
+                `SharedIterator` or `Once`. The value must do its work lazily, as it's created
+                while the group is locked. Its `attach()` returns the handle yielded to each
+                caller (detached when the caller leaves), or None if it can no longer be shared.
+
+        """
+        with self._lock:
+            flights = self._flights[key]
+            handle = None
+            for flight in flights:
+                if flight.window <= window:
+                    handle = flight.value.attach()
+                    if handle is not None:
+                        result = "shared"
+                        break
+            if handle is None:
+                flight = self._Flight(window, start(window), [0])
+                flights.append(flight)
+                handle = flight.value.attach()
+                result = "new"
+            flight.callers[0] += 1
+        telemetry.inc("singleflight_requests_total", group=self.name, result=result)
+
+        try:
+            yield handle
+        finally:
+            handle.detach()
+            with self._lock:
+                flight.callers[0] -= 1
+                if flight.callers[0] == 0:
+                    flights.remove(flight)
+                    if not flights:
+                        del self._flights[key]
+
+
+class SharedIterator:
+    """An iterator consumed (from the start) by several callers, each advancing it as needed.
+
+    Items are requested from the source iterator at most once, by whichever caller first needs
+    them (other callers needing the same item wait). An item is only kept until every attached
+    caller has read it, so a single caller buffers nothing; once the first item has been dropped,
+    further callers can't attach. Each item of the source is expected to cost a single request
+    (e.g. a page of a timeline): the request budget of the caller advancing the source is
+    acquired before the source is advanced, so an exhausted budget is only raised to that caller
+    and the source can still be advanced by the others. Any other exception raised by the source
+    is raised to every caller that needs a further item.
+
+    """
+    def __init__(self, source):
+        self._source = source
+        self._items = collections.deque()
+        self._offset = 0  # the index of the first item in `_items`
+        self._done = False
+        self._error = None
+        self._readers = []
+        self._lock = threading.Lock()
+        self._advancing = threading.Lock()
+
+    def attach(self):
+        """Return a new caller's `SharedIterator.Reader`, or None if items have been dropped."""
+        with self._lock:
+            if self._offset > 0:
+                return None
+            reader = SharedIterator.Reader(self)
+            self._readers.append(reader)
+            return reader
+
+    def _next(self, reader, budget):
+        """Return a tuple (found, item) of the reader's next item, advancing it."""
+        while True:
+            with self._lock:
+                if reader.index < self._offset + len(self._items):
+                    item = self._items[reader.index - self._offset]
+                    reader.index += 1
+                    self._trim()
+                    return True, item
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return False, None
+
+            # Requests are made one at a time, without locking the items (so other callers can
+            # attach or read buffered items meanwhile)
+            with self._advancing:
+                with self._lock:
+                    if reader.index < self._offset + len(self._items) or self._done:
+                        continue
+                if budget is not None:
+                    budget.acquire()
+                self._advance()
+
+    def _advance(self):
+        try:
+            item = next(self._source)
+        except StopIteration:
+            with self._lock:
+                self._done = True
+        except Exception as e:
+            with self._lock:
+                self._done = True
+                self._error = e
+        else:
+            with self._lock:
+                self._items.append(item)
+
+    def _trim(self):
+        """Drop the items every attached caller has read."""
+        first_needed = min((r.index for r in self._readers),
+                           default=self._offset + len(self._items))
+        while self._offset < first_needed:
+            self._items.popleft()
+            self._offset += 1
+
+    def _detach(self, reader):
+        with self._lock:
+            if reader in self._readers:
+                self._readers.remove(reader)
+                self._trim()
+
+    class Reader:
+        """A single caller's position in a `SharedIterator`."""
+        def __init__(self, shared):
+            self.index = 0
+            self._shared = shared
+
+        def iterate(self, budget=None):
+            """Yield the caller's remaining items of the source, in order.
+
+            Args:
+                budget (get_tweets.RequestBudget or None): a request budget to acquire before
+                    each item this caller requests from the source (see `SharedIterator`), or None.
+
+            """
+            while True:
+                found, item = self._shared._next(self, budget)
+                if not found:
+                    return
+                yield item
+
+        def detach(self):
+            """Stop reading, so that items are no longer kept for this caller."""
+            self._shared._detach(self)
+
+
+class Once:
+    """A function called at most once (on first use), sharing its result or exception."""
+    def __init__(self, function):
+        self._function = function
+        self._result = None
+        self._error = None
+        self._called = False
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if not self._called:
+                try:
+                    self._result = self._function()
+                except Exception as e:
+                    self._error = e
+                self._called = True
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def attach(self):
+        """Return the `Once` itself, as every caller shares its result."""
+        return self
+
+    def detach(self):
+        """Do nothing, as the result is kept until the `Once` is discarded."""
@@ -0,0 +1,120 @@
+"""Composable filters and aggregations over streams of Tweets (e.g. `Account.iter_tweets()`).
+
+Each filter returns a stage: a function that takes an iterable of Tweets and returns an iterator,
+consuming its input lazily. Stages are combined with `pipeline()`, and pages of Tweets are only
+requested as the pipeline is consumed, e.g. the first Tweet (newest first) with at least 1,000
+Likes and a #python hashtag:
+
+    tweets = pipeline(account.iter_tweets(30), min_engagement(1000, "likes"), hashtags(["python"]))
+    tweet = next(tweets, None)
+"""
+import heapq
+import itertools
+import operator
+
+from top_tweets import get_tweets
+
+
+def pipeline(tweets, *stages):
+    """Return an iterator of the Tweets in `tweets` passed through each stage in turn."""
+    tweets = iter(tweets)
+    for stage in stages:
+        tweets = stage(tweets)
+    return tweets
+
+
+def min_engagement(minimum, metric="likes_retweets_combined"):
+    """Return a stage keeping Tweets with at least `minimum` of `metric`."""
+    metric = get_tweets.Account._check_metric(metric)
+    value = operator.attrgetter(metric)
+
+    def stage(tweets):
+        return (t for t in tweets if value(t) >= minimum)
+
+    return stage
+
+
+def hashtags(tags, match_all=False):
+    """Return a stage keeping Tweets with any (or, if `match_all`, all) of the hashtags.
+
+    Args:
+        tags (iterable of str): hashtags (with or without '#'), compared case-insensitively.
+        match_all (bool): whether a Tweet must have every hashtag, rather than any.
+
+    """
+    tags = {t.lower().lstrip("#") for t in tags}
+
+    def matches(tweet):
+        tweet_tags = {t.lower() for t in tweet.hashtags}
+        return tags <= tweet_tags if match_all else not tags.isdisjoint(tweet_tags)
+
+    def stage(tweets):
+        return (t for t in tweets if matches(t))
+
+    return stage
+
+
+def where(predicate):
+    """Return a stage keeping Tweets for which `predicate(tweet)` is True."""
+    def stage(tweets):
+        return (t for t in tweets if predicate(t))
+
+    return stage
+
+
+def limit(num_tweets):
+    """Return a stage ending the stream (and pagination) after `num_tweets` Tweets."""
+    def stage(tweets):
+        return itertools.islice(tweets, num_tweets)
+
+    return stage
+
+
+class RunningTopK:
+    """A running top `k` of the Tweets in a stream, based on `metric`, in bounded memory.
+
+    Used as a stage, Tweets are passed through unchanged while the top `k` are kept (in a heap),
+    so the current top Tweets can be read at any point, e.g. to stop the stream once they're good
+    enough. Tweets are ordered as per `Account.get_top_tweets_num()`, i.e. Tweets with equal
+    `metric` keep the order they were seen in.
+
+    Attributes:
+        k (int): the number of top Tweets kept.
+        metric (str): the metric Tweets are ranked by.
+        count (int): the number of Tweets seen.
+
+    """
+    def __init__(self, k, metric="likes_retweets_combined"):
+        self.k = k
+        self.metric = get_tweets.Account._check_metric(metric)
+        self.count = 0
+        self._heap = []
+
+    def __call__(self, tweets):
+        for tweet in tweets:
+            self.add(tweet)
+            yield tweet
+
+    def add(self, tweet):
+        """Add a Tweet to the running top `k`, returning whether (True/False) it was kept."""
+        # Earlier Tweets rank higher than later Tweets with equal `metric`
+        item = (getattr(tweet, self.metric), -self.count, tweet)
+        self.count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+            return True
+        if self.k > 0 and item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+            return True
+        return False
+
+    def consume(self, tweets):
+        """Add every Tweet in `tweets` and return the top Tweets (see `tweets`)."""
+        for tweet in tweets:
+            self.add(tweet)
+        return self.tweets
+
+    @property
+    def tweets(self):
+        """list of Tweet: the current top Tweets, highest to lowest."""
+        return [item[2] for item in sorted(self._heap, key=lambda i: i[:2], reverse=True)]
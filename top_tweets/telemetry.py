@@ -0,0 +1,250 @@
+"""Runtime metrics: API requests, pages, cache hits, rate limit waits, and stage timings.
+
+Modules record metrics in the default `REGISTRY` (via `inc()`, `observe()`, and `timer()`), which
+can be read directly, exported in the Prometheus text format (`REGISTRY.prometheus()`,
+`write_textfile()`, or `start_http_server()`), or passed to hooks as each value is recorded.
+
+Recorded metrics (all prefixed with `top_tweets_`):
+    api_requests_total{endpoint}: requests made via `ratelimit.RateLimitScheduler`.
+    api_request_seconds{endpoint}: the duration of each of those requests.
+    rate_limit_waits_total{endpoint}, rate_limit_wait_seconds_total{endpoint}: waits for rate
+        limit windows to reset.
+    timeline_pages_total{account}, tweets_fetched_total{account}: timeline pages (and the Tweets
+        in them) requested per account.
+    cache_requests_total{cache, result}: Tweet cache ("tweets"), user cache ("users"), and API
+        response cache ("responses") hits and misses.
+    stage_seconds{stage}: the duration of each "fetch", "rank", "eligibility", and "publish".
+"""
+import bisect
+import contextlib
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+
+PREFIX = "top_tweets_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """The distribution of a series of values (e.g. durations in seconds).
+
+    Attributes:
+        buckets (tuple of float): the (inclusive) upper bound of each bucket.
+        counts (list of int): the number of values in each bucket (not cumulative), with a final
+            bucket for values larger than every bound.
+        sum (float): the sum of every value.
+        count (int): the number of values.
+
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """A thread-safe set of counters and histograms, each identified by a name and labels.
+
+    Attributes:
+        buckets (tuple of float): the buckets of new histograms.
+
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Increase a counter by `value`."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._call_hooks("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        """Record a value (e.g. a duration in seconds) in a histogram."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.buckets)
+            self._histograms[key].observe(value)
+        self._call_hooks("histogram", name, value, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """A context manager recording the duration (seconds) of its block in a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """Return the value (int or float) of a counter (0 if it hasn't been increased)."""
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """Return a histogram (Histogram), or None if no values have been recorded."""
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def add_hook(self, hook):
+        """Call `hook(kind, name, value, labels)` whenever a value is recorded.
+
+        `kind` is "counter" or "histogram". Hooks are called in the recording thread, so should
+        be fast (e.g. forwarding values to another metrics system).
+
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def reset(self):
+        """Remove every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def prometheus(self):
+        """Return every metric in the Prometheus text exposition format (str)."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(k, (list(h.counts), h.sum, h.count, h.buckets)) for k, h in histograms]
+
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append("# TYPE {}{} counter".format(PREFIX, name))
+                declared.add(name)
+            lines.append("{}{}{} {}".format(PREFIX, name, _format_labels(labels), value))
+
+        for (name, labels), (counts, total, count, buckets) in histograms:
+            if name not in declared:
+                lines.append("# TYPE {}{} histogram".format(PREFIX, name))
+                declared.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", str(bound)),)
+                lines.append("{}{}_bucket{} {}".format(PREFIX, name, _format_labels(bucket_labels),
+                                                       cumulative))
+            lines.append("{}{}_sum{} {}".format(PREFIX, name, _format_labels(labels), total))
+            lines.append("{}{}_count{} {}".format(PREFIX, name, _format_labels(labels), count))
+
+        return "\n".join(lines) + "\n"
+
+    def _call_hooks(self, kind, name, value, labels):
+        for hook in list(self._hooks):
+            hook(kind, name, value, labels)
+
+
+REGISTRY = Registry()
+
+
+def inc(name, value=1, **labels):
+    """Increase a counter in the default registry (see `Registry.inc()`)."""
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Record a value in a histogram of the default registry (see `Registry.observe()`)."""
+    REGISTRY.observe(name, value, **labels)
+
+
+def timer(name, **labels):
+    """Time a block in a histogram of the default registry (see `Registry.timer()`)."""
+    return REGISTRY.timer(name, **labels)
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Write the registry's metrics to a file (e.g. for the node exporter's textfile collector).
+
+    The file is replaced atomically, so it's never read partially written.
+
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.prometheus())
+    os.replace(tmp_path, path)
+
+
+def start_http_server(port, address="", registry=REGISTRY):
+    """Serve the registry's metrics over HTTP (for Prometheus to scrape) from a daemon thread.
+
+    Returns:
+        http.server.ThreadingHTTPServer: the server, which can be stopped via `shutdown()`.
+
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class JSONFormatter(logging.Formatter):
+    """Format log records as JSON objects (one per line), including any `extra` fields.
+
+    For example, logger.info("Fetched page", extra={"account": "user", "tweets": 200}) is
+    formatted as {"time": ..., "level": "INFO", "logger": ..., "message": "Fetched page",
+    "account": "user", "tweets": 200}.
+
+    """
+    # The attributes of every log record, which aren't `extra` fields
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update((k, v) for k, v in vars(record).items() if k not in self.RESERVED)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def configure_logging(level=logging.INFO, json_format=False):
+    """Log progress messages to stderr, as plain messages or (if `json_format`) JSON objects."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter() if json_format else logging.Formatter("%(message)s"))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for _, v in labels)
+    return "{" + ",".join('{}="{}"'.format(k, v) for (k, _), v in zip(labels, escaped)) + "}"
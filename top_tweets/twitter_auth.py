@@ -1,13 +1,67 @@
+import threading
+
 import tweepy
 
-from top_tweets import config
+from top_tweets import ratelimit
+
+# Server errors are retried after a short delay; rate limits are handled by `RateLimitScheduler`
+RETRY_ERRORS = {500, 502, 503, 504}
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def tweepy_auth(consumer_key=None, consumer_secret=None, access_token=None,
+                access_token_secret=None):
+    """Return an authenticated Tweepy API object.
+
+    Credentials default to those in `config.py`, which is only imported if a credential isn't
+    provided (so several API objects, e.g. for several bot accounts, can be created without it).
+    Only server errors are retried, so wrap the API object in a `ratelimit.RateLimitScheduler` (as
+    per `get_api()`) to wait for rate limits to reset.
+
+    """
+    if None in (consumer_key, consumer_secret, access_token, access_token_secret):
+        from top_tweets import config
+
+        consumer_key = consumer_key or config.CONSUMER_KEY
+        consumer_secret = consumer_secret or config.CONSUMER_SECRET
+        access_token = access_token or config.ACCESS_TOKEN
+        access_token_secret = access_token_secret or config.ACCESS_TOKEN_SECRET
+
+    auth = tweepy.OAuthHandler(consumer_key, consumer_secret)
+    auth.set_access_token(access_token, access_token_secret)
+    return tweepy.API(auth, retry_count=3, retry_delay=5, retry_errors=RETRY_ERRORS)
+
+
+def get_api():
+    """Return the default API object, creating it (via `tweepy_auth()`) on first use.
+
+    The default API object is wrapped in a `ratelimit.RateLimitScheduler`, which paces requests
+    based on each endpoint's rate limit. `Account`, `Bot`, and the other classes that make API
+    requests use the default API unless another is provided when they're created.
+
+    """
+    global _api
+    with _api_lock:
+        if _api is None:
+            _api = ratelimit.RateLimitScheduler(tweepy_auth())
+        return _api
+
+
+def set_api(api):
+    """Replace the default API object (e.g. with an offline or differently authenticated API).
 
+    Passing None resets the default, so it's created again (via `tweepy_auth()`) on next use.
 
-def tweepy_auth():
-    """Return an authenticated Tweepy API object."""
-    auth = tweepy.OAuthHandler(config.CONSUMER_KEY, config.CONSUMER_SECRET)
-    auth.set_access_token(config.ACCESS_TOKEN, config.ACCESS_TOKEN_SECRET)
-    return tweepy.API(auth, retry_count=10, retry_delay=30)
+    """
+    global _api
+    with _api_lock:
+        _api = api
 
 
-API = tweepy_auth()
+def __getattr__(name):
+    # `twitter_auth.API` is retained for backwards compatibility, but is now created lazily
+    if name == "API":
+        return get_api()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
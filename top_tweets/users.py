@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+
+from top_tweets import telemetry, twitter_auth
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH_SIZE = 100
+
+
+class UserResolver:
+    """Resolve Twitter users (by screen name or ID) in bulk, caching the results.
+
+    Users are requested via the `users/lookup` endpoint, up to 100 per request, and the Tweepy
+    User objects are cached (by both screen name and ID) for `ttl` seconds, so repeat lookups
+    (e.g. each time an `Account` is created for the same user) don't require an API request:
+    https://developer.twitter.com/en/docs/twitter-api/v1/accounts-and-users/follow-search-get-users/api-reference/get-users-lookup.
+
+    Attributes:
+        ttl (int or float): the number of seconds a resolved user is cached for.
+
+    Args:
+        api (tweepy.API or None): the API used to look up users (defaults to
+            `twitter_auth.get_api()`).
+
+    """
+    def __init__(self, ttl=3600, api=None):
+        self.ttl = ttl
+        self._api = api
+        self._users = {}
+        self._user_ids = {}
+        self._lock = threading.Lock()
+
+    def get(self, username=None, user_id=None):
+        """Return the Tweepy User for a screen name/handle (without "@") or unique identifier.
+
+        Raises:
+            ValueError: if neither `username` or `user_id` is provided, or the user can't be found
+                (e.g. the account doesn't exist or is suspended).
+
+        """
+        if username is not None:
+            users = self.resolve(usernames=[username])
+        elif user_id is not None:
+            users = self.resolve(user_ids=[user_id])
+        else:
+            raise ValueError("You must provide a `username` or `user_id` to resolve a user.")
+
+        if users[0] is None:
+            raise ValueError("Unable to resolve user '{}'.".format(username or user_id))
+
+        return users[0]
+
+    def resolve(self, usernames=None, user_ids=None):
+        """Return a list of Tweepy User (or None, if not found) in the order requested.
+
+        Users that aren't cached (or whose cache entry has expired) are looked up in batches of
+        `LOOKUP_BATCH_SIZE`. Either `usernames` or `user_ids` must be None.
+
+        Args:
+            usernames (list of str or None): a list of Twitter user screen names/handles
+                (without "@").
+            user_ids (list of str or None): a list of Twitter user unique identifiers.
+
+        """
+        assert usernames is None or user_ids is None, "Either `usernames` or `user_ids` must be " \
+                                                      "None."
+        if usernames is not None:
+            keys = [self._username_key(u) for u in usernames]
+        else:
+            keys = [str(u) for u in user_ids or []]
+
+        resolved = {k: self._cached(k, usernames is not None) for k in keys}
+        missing = [k for k, user in resolved.items() if user is None]
+        telemetry.inc("cache_requests_total", len(resolved) - len(missing), cache="users",
+                      result="hit")
+        telemetry.inc("cache_requests_total", len(missing), cache="users", result="miss")
+        for i in range(0, len(missing), LOOKUP_BATCH_SIZE):
+            batch = missing[i:i + LOOKUP_BATCH_SIZE]
+            logger.info("Looking up %d users...", len(batch), extra={"users": len(batch)})
+            if usernames is not None:
+                found = self.api.lookup_users(screen_names=batch)
+            else:
+                found = self.api.lookup_users(user_ids=batch)
+
+            self.add(found)
+            for user in found:
+                key = self._username_key(user.screen_name) if usernames is not None else user.id_str
+                resolved[key] = user
+
+        return [resolved[k] for k in keys]
+
+    @property
+    def api(self):
+        """The API used to look up users."""
+        return self._api if self._api is not None else twitter_auth.get_api()
+
+    def add(self, users):
+        """Cache a list of Tweepy User objects (e.g. returned by another API request)."""
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for user in users:
+                self._users[user.id_str] = (user, expires)
+                self._user_ids[self._username_key(user.screen_name)] = user.id_str
+
+    def clear(self):
+        """Remove all cached users."""
+        with self._lock:
+            self._users.clear()
+            self._user_ids.clear()
+
+    def _cached(self, key, is_username):
+        """Return the cached Tweepy User for a (normalised) screen name or ID, or None."""
+        with self._lock:
+            user_id = self._user_ids.get(key) if is_username else key
+            user, expires = self._users.get(user_id, (None, 0))
+        if time.monotonic() >= expires:
+            return None
+
+        return user
+
+    @staticmethod
+    def _username_key(username):
+        """Screen names are case-insensitive."""
+        return username.lower().lstrip("@")
@@ -0,0 +1,432 @@
+"""Fetch the top Tweets of very large account lists with several worker processes (or hosts).
+
+Usage: python -m top_tweets.workers submit path [num_days] [top_num] | work path [index] |
+           run path num_workers | leaderboard path top_num [per_account]
+
+`submit` adds every account in `SOURCE_USERNAMES` (see `config_sample.py`) to the work queue at
+`path` (a SQLite file, which can be on a filesystem shared by several hosts), to fetch the top
+`top_num` (defaults to 10) Tweets of each from the previous `num_days` (defaults to 7). `work`
+runs a worker (using `WORKER_CREDENTIALS[index]`, if configured) until the queue is empty, `run`
+runs `num_workers` local worker processes, and `leaderboard` prints the merged top Tweets.
+"""
+import json
+import logging
+import multiprocessing
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import tweepy
+
+from top_tweets import get_tweets, leaderboard, ratelimit, telemetry, twitter_auth, users
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+_DATE_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+
+
+class WorkQueue:
+    """A persistent (SQLite) queue of accounts to fetch, and store of each account's top Tweets.
+
+    Accounts are submitted once (`submit()`), then claimed in batches by any number of workers
+    (`work()`), in any number of processes or hosts sharing the database file. Each worker
+    stores the ranked top Tweets and user of each account it fetches, and a coordinator merges
+    them into leaderboards (`leaderboard()`). Claims that aren't completed within
+    `claim_timeout` seconds (e.g. the worker crashed) are claimed again, up to `max_attempts`.
+
+    The queue also implements `users.UserResolver.get()` (for stored users), so `Account`
+    objects can be created for the stored results without any API requests.
+
+    Attributes:
+        path (str): the SQLite database file path.
+        claim_timeout (int or float): the number of seconds a worker has to complete a claim.
+        max_attempts (int): the maximum number of times each account is claimed.
+
+    """
+    def __init__(self, path, claim_timeout=10 * 60, max_attempts=3):
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, claimed_at);
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                json TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS users_username ON users (username);
+            CREATE TABLE IF NOT EXISTS results (
+                user_id TEXT NOT NULL,
+                tweet_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                json TEXT NOT NULL,
+                PRIMARY KEY (user_id, tweet_id)
+            );
+        """)
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._conn.close()
+
+    def submit(self, usernames, num_days, metric, top_num):
+        """Add accounts to the queue, to fetch the top `top_num` Tweets of each.
+
+        Every account in a queue is fetched with the same parameters; accounts already in the
+        queue are ignored.
+
+        Args:
+            usernames (list of str): Twitter user screen names/handles (without "@").
+            num_days (int): the historic Tweet collection period in days, including the current day.
+            metric (str): the metric to rank Tweets by (see `get_tweets.METRICS`).
+            top_num (int): the number of top Tweets stored for each account (the most any one
+                account can have on a leaderboard).
+
+        """
+        metric = get_tweets.Account._check_metric(metric)
+        settings = {"num_days": num_days, "metric": metric, "top_num": top_num}
+        with self._transaction():
+            self._conn.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                                   [(k, json.dumps(v)) for k, v in settings.items()])
+            self._conn.executemany("INSERT OR IGNORE INTO jobs (username, status) VALUES (?, ?)",
+                                   [(u.lower(), PENDING) for u in usernames])
+
+    def settings(self):
+        """Return the queue's fetch parameters, a dict of num_days, metric, and top_num."""
+        with self._lock:
+            rows = self._conn.execute("SELECT name, value FROM settings").fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def claim(self, worker, num_accounts):
+        """Claim up to `num_accounts` accounts for a worker, returning a list of usernames.
+
+        Timed out claims of accounts that have already been claimed `max_attempts` times are
+        marked as failed.
+
+        """
+        now = time.time()
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ? WHERE status = ? AND claimed_at < ? AND "
+                "attempts >= ?", (FAILED, "Claim timed out.", CLAIMED, now - self.claim_timeout,
+                                  self.max_attempts))
+            rows = self._conn.execute(
+                "SELECT id, username FROM jobs WHERE attempts < ? AND (status = ? OR "
+                "(status = ? AND claimed_at < ?)) ORDER BY id LIMIT ?",
+                (self.max_attempts, PENDING, CLAIMED, now - self.claim_timeout,
+                 num_accounts)).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?", [(CLAIMED, worker, now, id_) for id_, _ in rows])
+        return [username for _, username in rows]
+
+    def complete(self, username, user, tweets):
+        """Store an account's user and ranked top Tweets, completing its job.
+
+        Args:
+            username (str): the claimed username.
+            user (tweepy.User): the account's user.
+            tweets (list of get_tweets.Tweet): the account's top Tweets, highest ranked first.
+
+        """
+        with self._transaction():
+            self._conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+                               (user.id_str, user.screen_name.lower(), json.dumps(user._json)))
+            self._conn.execute("DELETE FROM results WHERE user_id = ?", (user.id_str,))
+            self._conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?)",
+                                   [(user.id_str, t.id, t.rank, json.dumps(_tweet_json(t)))
+                                    for t in tweets])
+            self._conn.execute("UPDATE jobs SET status = ?, error = NULL WHERE username = ?",
+                               (DONE, username.lower()))
+
+    def fail(self, username, error, retry=True):
+        """Record that fetching an account failed, so it's claimed again (up to `max_attempts`)
+        if `retry` is True."""
+        max_attempts = self.max_attempts if retry else 0
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, error = ? "
+                "WHERE username = ?",
+                (max_attempts, PENDING, FAILED, str(error), username.lower()))
+
+    def progress(self):
+        """Return a dict of the number of accounts with each status (pending/claimed/...)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            return dict(rows.fetchall())
+
+    def get(self, username=None, user_id=None):
+        """Return the stored Tweepy User for a screen name (without "@") or unique identifier.
+
+        Raises:
+            ValueError: if the user's results haven't been stored.
+
+        """
+        with self._lock:
+            if user_id is not None:
+                row = self._conn.execute("SELECT json FROM users WHERE user_id = ?",
+                                         (str(user_id),)).fetchone()
+            else:
+                row = self._conn.execute("SELECT json FROM users WHERE username = ?",
+                                         (str(username).lower(),)).fetchone()
+        if row is None:
+            raise ValueError("User '{}' isn't in the work queue's results."
+                             "".format(username or user_id))
+        return tweepy.models.User.parse(None, json.loads(row[0]))
+
+    def top_tweets(self):
+        """Return a list of each stored account's top Tweets (list of get_tweets.Tweet), ranked."""
+        with self._lock:
+            # Accounts are merged in the order they were submitted
+            user_ids = [r[0] for r in self._conn.execute(
+                "SELECT user_id FROM users JOIN jobs ON jobs.username = users.username "
+                "ORDER BY jobs.id")]
+            rows = self._conn.execute("SELECT user_id, json FROM results ORDER BY user_id, rank")
+            results = {}
+            for user_id, tweet_json in rows.fetchall():
+                results.setdefault(user_id, []).append(json.loads(tweet_json))
+
+        ranked_tweets = []
+        for user_id in user_ids:
+            account = get_tweets.Account(user_id=user_id, resolver=self)
+            tweets = []
+            for tweet_json in results.get(user_id, []):
+                tweet = get_tweets.Tweet(tweepy.models.Status.parse(None, tweet_json), account)
+                tweet.rank = tweet_json["rank"]
+                tweets.append(tweet)
+            ranked_tweets.append(tweets)
+        return ranked_tweets
+
+    def leaderboard(self, top_num, per_account=None, normalise=False):
+        """Merge the stored results into the global top Tweets, as per
+        `leaderboard.fetch_leaderboard()` (but without any API requests).
+
+        Args:
+            top_num (int or None): the number of Tweets on the leaderboard, or None for every
+                stored Tweet.
+            per_account (int or None): the maximum number of Tweets from any one account, or None.
+            normalise (bool): whether Tweets are ranked by the metric per 1,000 account followers.
+
+        Returns:
+            list of get_tweets.Tweet: the leaderboard, highest scoring first.
+
+        """
+        return list(leaderboard.merge(self.top_tweets(), self.settings()["metric"], top_num,
+                                      per_account, normalise))
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+
+class _Transaction:
+    """A write transaction that locks the database immediately, so concurrent claims (from any
+    process) never overlap."""
+    def __init__(self, conn, lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._conn.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def work(path, worker=None, api=None, batch_size=20, max_workers=8):
+    """Claim and fetch accounts from a work queue until it's empty.
+
+    Each batch of claimed accounts is resolved in bulk and fetched concurrently (as per
+    `get_tweets.fetch_top_tweets_many()`), and each account's ranked top Tweets are stored.
+
+    Args:
+        path (str): the work queue's SQLite database file path.
+        worker (str or None): the worker's name (defaults to the host name and process ID).
+        api (tweepy.API or None): the worker's API, e.g. with its own credentials and rate limits
+            (defaults to `twitter_auth.get_api()`).
+        batch_size (int): the number of accounts claimed at once.
+        max_workers (int): the maximum number of accounts fetched at once.
+
+    Returns:
+        int: the number of accounts fetched.
+
+    """
+    worker = worker or "{}:{}".format(socket.gethostname(), multiprocessing.current_process().pid)
+    queue = WorkQueue(path)
+    settings = queue.settings()
+    resolver = users.UserResolver(api=api)
+    num_fetched = 0
+    try:
+        while True:
+            usernames = queue.claim(worker, batch_size)
+            if not usernames:
+                break
+
+            accounts = {}
+            for username, user in _resolve(queue, resolver, usernames).items():
+                if user is None:
+                    queue.fail(username, "Unable to resolve user.", retry=False)
+                else:
+                    accounts[username] = get_tweets.Account(user_id=user.id_str, resolver=resolver,
+                                                            api=api)
+
+            results = get_tweets.fetch_top_tweets_many(
+                list(accounts.values()), settings["num_days"], settings["metric"],
+                top_num=settings["top_num"], max_workers=max_workers)
+            for username, result in zip(accounts, results):
+                if result.ok:
+                    queue.complete(username, result.account.user, result.tweets)
+                    num_fetched += 1
+                else:
+                    logger.warning("Unable to fetch Tweets by '%s': %s", username, result.error,
+                                   extra={"account": username, "worker": worker})
+                    queue.fail(username, result.error)
+            telemetry.inc("worker_accounts_total", len(usernames), worker=worker)
+    finally:
+        queue.close()
+
+    logger.info("Worker %s fetched %d accounts", worker, num_fetched,
+                extra={"worker": worker, "accounts": num_fetched})
+    return num_fetched
+
+
+def _resolve(queue, resolver, usernames):
+    """Resolve a batch of claimed accounts, returning a dict of username: Tweepy User (or None,
+    if not found). If the batch can't be looked up (e.g. the API returns an error when none of
+    the users exist), each account is looked up separately, and those that fail are failed."""
+    try:
+        return dict(zip(usernames, resolver.resolve(usernames=usernames)))
+    except tweepy.TweepError as e:
+        logger.warning("Unable to look up %d users (looking up each user): %s", len(usernames),
+                       e, extra={"users": len(usernames)})
+
+    resolved = {}
+    for username in usernames:
+        try:
+            resolved[username] = resolver.resolve(usernames=[username])[0]
+        except tweepy.TweepError as e:
+            logger.warning("Unable to look up '%s': %s", username, e, extra={"account": username})
+            queue.fail(username, e, retry=False)
+    return resolved
+
+
+def run(path, num_workers, api_factory=None, batch_size=20, max_workers=8):
+    """Run `num_workers` worker processes (see `work()`) until the work queue is empty.
+
+    Args:
+        path (str): the work queue's SQLite database file path.
+        num_workers (int): the number of worker processes.
+        api_factory (callable or None): called (in each worker process) with the worker's index
+            to create its API, e.g. with its own credentials. Must be picklable (e.g. a
+            module-level function). Defaults to `credentials_api()`.
+        batch_size (int): the number of accounts each worker claims at once.
+        max_workers (int): the maximum number of accounts each worker fetches at once.
+
+    Returns:
+        dict: the queue's progress (see `WorkQueue.progress()`).
+
+    """
+    processes = [multiprocessing.Process(target=_work, args=(path, i, api_factory, batch_size,
+                                                             max_workers))
+                 for i in range(num_workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    queue = WorkQueue(path)
+    try:
+        return queue.progress()
+    finally:
+        queue.close()
+
+
+def credentials_api(index):
+    """Return a rate-limited API for worker `index`, using `WORKER_CREDENTIALS[index]` (cycled)
+    from `config.py` if configured, otherwise the default credentials."""
+    from top_tweets import config
+
+    credentials = getattr(config, "WORKER_CREDENTIALS", None)
+    if not credentials:
+        return twitter_auth.get_api()
+    return ratelimit.RateLimitScheduler(
+        twitter_auth.tweepy_auth(**credentials[index % len(credentials)]))
+
+
+def _work(path, index, api_factory, batch_size, max_workers):
+    api = (api_factory or credentials_api)(index)
+    work(path, "{}:{}".format(socket.gethostname(), index), api, batch_size, max_workers)
+
+
+def _tweet_json(tweet):
+    """Return the (Status) JSON of the fields of a `get_tweets.Tweet` used to rank and share it."""
+    return {
+        "id": int(tweet.id),
+        "id_str": tweet.id,
+        "created_at": tweet.publish_time.strftime(_DATE_FORMAT),
+        "is_quote_status": tweet.is_quote_tweet,
+        "entities": {"hashtags": [{"text": h} for h in tweet.hashtags]},
+        "favorite_count": tweet.likes,
+        "retweet_count": tweet.retweets,
+        "retweeted": tweet.retweeted,
+        "rank": tweet.rank,
+    }
+
+
+def main(argv=None):
+    """Submit, work on, run, or print the leaderboard of a work queue (see the module docstring)."""
+    from top_tweets import config
+
+    argv = sys.argv[1:] if argv is None else argv
+    assert len(argv) >= 2 and argv[0] in ("submit", "work", "run", "leaderboard"), \
+        "Usage: python -m top_tweets.workers submit path [num_days] [top_num] | " \
+        "work path [index] | run path num_workers | leaderboard path top_num [per_account]"
+
+    telemetry.configure_logging(json_format=getattr(config, "LOG_JSON", False))
+    command, path, args = argv[0], argv[1], [int(a) for a in argv[2:]]
+    if command == "submit":
+        queue = WorkQueue(path)
+        queue.submit(config.SOURCE_USERNAMES, args[0] if args else 7, "likes_retweets_combined",
+                     args[1] if len(args) > 1 else 10)
+        queue.close()
+    elif command == "work":
+        _work(path, args[0] if args else 0, None, 20, 8)
+    elif command == "run":
+        print(run(path, args[0]))
+    else:
+        queue = WorkQueue(path)
+        for rank, tweet in enumerate(queue.leaderboard(args[0], *args[1:2]), 1):
+            print("{}. @{} https://twitter.com/{}/status/{} ({})".format(
+                rank, tweet.account.username, tweet.account.username, tweet.id,
+                getattr(tweet, queue.settings()["metric"])))
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()